@@ -1,21 +1,44 @@
 import os
 import sys
-import base64
-import csv
 import time
+import heapq
+import random
+import sqlite3
+import argparse
 import logging
-from mistralai import Mistral
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-load_dotenv() 
+load_dotenv()  # before importing modules that read their settings from the environment
+from key_pool import KeyPool
+from ocr_cache import OCRCache, hash_file
+from batch_ledger import BatchLedger, SUCCESS, ERROR, FAILED, SKIPPED
+from pdf_scan import scan_pdfs
+from work_queue import WorkQueue, worker_id, DEFAULT_LEASE_SECONDS
+from rate_limit import RateLimiter, is_rate_limited, is_retryable, retry_after_seconds, retry_delay
+from ocr_encoding import ocr_process
+from pdf_split import (split_pdf, split_pdf_pages, offset_pages, merge_pages,
+                       OCR_PDF_CHUNK_CONCURRENCY, OCR_PDF_CHUNK_RETRIES)
+from pdf_text import split_text_layer, OCR_NATIVE_TEXT, PDF_PAGE_SOURCE
+from search_index import SearchIndex, OCR_SEARCH_DB
 
 
 # Configuration
 DOC_DIR = "docs_import"
 EXPORT_DIR = "docs_exports"
-DB_CSV = "processed_files.csv"
+DB_CSV = "processed_files.csv"  # legacy ledger, imported once into LEDGER_DB
+LEDGER_DB = "processed_files.sqlite3"
 LOG_FILE = "conversion.log"
 MAX_RETRIES = 5
 INITIAL_BACKOFF = 1  # in seconds
+MAX_BACKOFF = 120  # in seconds
+DEFAULT_WORKERS = 1
+DEFAULT_RPS = 1 / 3  # matches the old fixed 3 second pause between files
+PROGRESS_INTERVAL = 10  # in seconds
+DEFAULT_WATCH_INTERVAL = 30  # in seconds
+WATCH_SETTLE_SECONDS = 5  # files modified more recently may still be copying
+QUEUE_POLL_INTERVAL = 2  # in seconds, when the shared queue has nothing ready
+OCR_MODEL = "mistral-ocr-latest"
 
 # Initialize logging
 logging.basicConfig(
@@ -24,15 +47,19 @@ logging.basicConfig(
     format='%(asctime)s %(levelname)s: %(message)s',
 )
 
-# Ensure API key is set via environment variable
-API_KEY = os.getenv("MISTRAL_API_KEY")
-if not API_KEY:
-    print("Error: MISTRAL_API_KEY environment variable not set.")
+# Ensure at least one API key is set via environment variable
+# (MISTRAL_API_KEYS="key1:rps:max_in_flight,key2,..." or a single MISTRAL_API_KEY)
+key_pool = KeyPool.from_env()
+if not key_pool:
+    print("Error: MISTRAL_API_KEY or MISTRAL_API_KEYS environment variable not set.")
     sys.exit(1)
 
-client = Mistral(api_key=API_KEY)
+# Shared with main.py: identical PDFs are only sent to the API once
+ocr_cache = OCRCache()
 
-FIELDNAMES = ['filename', 'status', 'attempts', 'error']
+# Full-text index of the exported pages, searched by /api/search in main.py
+# (files exported before the index existed: python search_index.py sync)
+search_index = SearchIndex(OCR_SEARCH_DB) if OCR_SEARCH_DB else None
 
 
 def ensure_export_directory():
@@ -42,133 +69,605 @@ def ensure_export_directory():
         print(f"Created export directory: {EXPORT_DIR}")
 
 
-def load_processed():
-    """Load processed file records from CSV into a dict."""
-    processed = {}
-    if os.path.exists(DB_CSV):
-        with open(DB_CSV, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                processed[row['filename']] = row
-    return processed
+def open_ledger():
+    """Open the SQLite ledger, importing the legacy CSV ledger the first time."""
+    ledger = BatchLedger(LEDGER_DB)
+    if os.path.exists(DB_CSV) and ledger.is_empty():
+        def hash_for(filename):
+            path = os.path.join(DOC_DIR, filename)
+            return hash_file(path) if os.path.isfile(path) else None
 
+        imported = ledger.import_csv(DB_CSV, hash_for)
+        os.replace(DB_CSV, DB_CSV + '.imported')
+        print(f"Imported {imported} files from '{DB_CSV}' into '{LEDGER_DB}'.")
+    return ledger
 
-def append_to_db(record):
-    """Append a processing record to the CSV database."""
-    file_exists = os.path.exists(DB_CSV)
-    with open(DB_CSV, 'a', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(record)
 
+def scan_pdf_files(ledger, settle=0):
+    """Incrementally scan DOC_DIR and save the changes to the ledger.
 
-def get_pdf_files():
-    """List all PDF files in the DOC_DIR folder and its subdirectories."""
+    Only new or modified files (by size and mtime) are hashed. Renamed or
+    moved files keep their ledger record and their markdown is moved along,
+    so they are not OCR'd again. Returns the ScanResult.
+    """
     if not os.path.isdir(DOC_DIR):
         print(f"Error: Directory '{DOC_DIR}' not found.")
         sys.exit(1)
-    
-    pdf_files = []
-    for root, dirs, files in os.walk(DOC_DIR):
-        for file in files:
-            if file.lower().endswith('.pdf'):
-                # Get relative path from DOC_DIR
-                rel_path = os.path.relpath(os.path.join(root, file), DOC_DIR)
-                pdf_files.append(rel_path)
-    
-    return pdf_files
+
+    scan = scan_pdfs(DOC_DIR, ledger.scan_index(), hash_file, min_age=settle)
+    for old_path, new_path in scan.renamed:
+        move_output(old_path, new_path)
+    ledger.save_scan(scan.updated, scan.removed, scan.renamed, output_path_for)
+    return scan
+
+
+def move_output(old_pdf, new_pdf):
+    """Move the markdown of a renamed PDF to match its new location."""
+    old_output, new_output = output_path_for(old_pdf), output_path_for(new_pdf)
+    if not os.path.exists(old_output) or os.path.exists(new_output):
+        return
+    os.makedirs(os.path.dirname(new_output) or '.', exist_ok=True)
+    os.replace(old_output, new_output)
+    logging.info(f"{old_pdf} renamed to {new_pdf}; moved {old_output} to {new_output}")
+    if search_index is not None:
+        search_index.move(os.path.relpath(old_output, EXPORT_DIR), os.path.relpath(new_output, EXPORT_DIR))
+
+
+def index_output(output_path, pages):
+    """Add the pages of a published markdown file to the search index.
+
+    Indexing errors are logged only; the conversion itself has succeeded.
+    """
+    if search_index is None:
+        return
+    try:
+        stat = os.stat(output_path)
+        search_index.index_document(os.path.relpath(output_path, EXPORT_DIR), pages,
+                                    (stat.st_size, stat.st_mtime_ns))
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"Could not index {output_path}: {e}")
 
 
-def encode_pdf(pdf_path):
-    """Encode the PDF file to a base64 string."""
+def pending_files(scan, settled):
+    """(path, sha256) pairs from a scan that are not in settled (converted or given up on)."""
+    return sorted((path, entry[2]) for path, entry in scan.index.items()
+                  if (path, entry[2]) not in settled)
+
+
+def watch_scan(work, ledger, settle):
+    """One watch-mode rescan: queue new or modified files. Returns (scan, files added).
+
+    Files whose retries ran out stay skipped until their content changes;
+    otherwise every scan would pay for the same failing file again. A fresh
+    run (without --watch, or a restart) retries them once more.
+    """
+    scan = scan_pdf_files(ledger, settle)
+    # Worker results are written in the background; the failures must be visible now
+    ledger.flush()
+    return scan, work.add(pending_files(scan, ledger.completed() | ledger.failed()))
+
+
+def ocr_document(limiter=None, file_path=None, pdf_bytes=None, file_name=None):
+    """Send a PDF (path or bytes) to Mistral OCR, waiting on the limiter first.
+
+    The limiter bounds the whole batch; the key pool then routes the call to the
+    least-loaded healthy key and fails over to another key on 401/429. A 429
+    that still escapes is reported to the limiter here, and only here, so one
+    rate-limit response slows the batch down exactly once.
+    """
+    if limiter is not None:
+        limiter.acquire()
     try:
-        with open(pdf_path, "rb") as pdf_file:
-            return base64.b64encode(pdf_file.read()).decode('utf-8')
+        return key_pool.run(
+            ocr_process,
+            model=OCR_MODEL,
+            mime_type="application/pdf",
+            include_image_base64=False,
+            file_path=file_path,
+            data=pdf_bytes,
+            file_name=file_name
+        )
     except Exception as e:
-        logging.error(f"Failed to encode {pdf_path}: {e}")
-        return None
+        if limiter is not None and is_rate_limited(e):
+            limiter.on_rate_limited(retry_after_seconds(e))
+        raise
+    finally:
+        if limiter is not None:
+            limiter.release()
+
+
+def ocr_chunk(first_page, pdf_bytes, limiter=None):
+    """OCR one page chunk and return its pages numbered as in the full document."""
+    response = ocr_document(limiter, pdf_bytes=pdf_bytes, file_name=f"pages-{first_page + 1}.pdf")
+    return offset_pages(response, first_page)
+
 
+def ocr_pdf_chunks(chunks, limiter=None):
+    """
+    OCR page chunks concurrently, retrying only the chunks that failed.
 
-def convert_pdf_to_markdown(pdf_filename):
-    """Perform OCR on the PDF and write the output as a markdown file in the export directory."""
+    Retries wait as the server does (rate_limit.retry_delay: capped, jittered
+    exponential backoff, at least Retry-After on a 429) and never before the
+    limiter's rate-limit pause ends; authentication errors are not retried.
+    """
+    results = {}
+    pending = chunks
+    for attempt in range(OCR_PDF_CHUNK_RETRIES + 1):
+        failed = []
+        delay = 0.0
+        with ThreadPoolExecutor(max_workers=OCR_PDF_CHUNK_CONCURRENCY) as pool:
+            futures = [(pool.submit(ocr_chunk, first_page, pdf_bytes, limiter), first_page, pdf_bytes)
+                       for first_page, pdf_bytes in pending]
+            for future, first_page, pdf_bytes in futures:
+                try:
+                    results[first_page] = future.result()
+                except Exception as e:
+                    if attempt == OCR_PDF_CHUNK_RETRIES or not is_retryable(e):
+                        raise
+                    logging.warning(f"Chunk starting at page {first_page + 1} failed "
+                                    f"(attempt {attempt + 1}): {e}")
+                    failed.append((first_page, pdf_bytes))
+                    delay = max(delay, retry_delay(attempt, e))
+        if not failed:
+            break
+        if limiter is not None:
+            delay = max(delay, limiter.pause_remaining())
+        time.sleep(delay)
+        pending = failed
+    return merge_pages(results.values())
+
+
+def output_path_for(pdf_filename):
+    """Markdown path in the export directory for a PDF relative to DOC_DIR."""
+    return os.path.join(EXPORT_DIR, pdf_filename.rsplit('.', 1)[0] + '.md')
+
+
+def convert_pdf_to_markdown(pdf_filename, limiter=None, file_hash=None, commit=None):
+    """Perform OCR on the PDF and write the output as a markdown file in the export directory.
+
+    Returns the number of pages written. When a RateLimiter is given, the API
+    call waits for a token and an in-flight slot first.
+
+    The markdown is written to a temporary file and moved into place in one
+    step. With commit, the move is done by commit(pages, output_path, publish),
+    which returns False when the result must be discarded (the shared queue
+    lease was lost); None is returned then.
+    """
     full_path = os.path.join(DOC_DIR, pdf_filename)
-    b64 = encode_pdf(full_path)
-    if not b64:
-        raise RuntimeError("PDF encoding failed.")
-
-    # Call Mistral OCR
-    response = client.ocr.process(
-        model="mistral-ocr-latest",
-        document={
-            "type": "document_url",
-            "document_url": f"data:application/pdf;base64,{b64}"
-        },
-        include_image_base64=False
-    )
+    cache_key = OCRCache.make_key(file_hash or hash_file(full_path), OCR_MODEL, False, PDF_PAGE_SOURCE)
+    pages = ocr_cache.get(cache_key)
+    if pages is None:
+        # Pages with a usable text layer are extracted locally; only scanned
+        # pages are sent to the API
+        layer = split_text_layer(full_path) if OCR_NATIVE_TEXT else None
+        if layer is not None and layer[0]:
+            pages, scanned, _ = layer
+            logging.info(f"{pdf_filename}: {len(pages)} page(s) from the text layer, {len(scanned)} to OCR")
+            if scanned:
+                pages = merge_pages([pages, ocr_pdf_chunks(split_pdf_pages(full_path, scanned), limiter)])
+        else:
+            # Large PDFs are split into page chunks that are OCR'd concurrently
+            chunks = split_pdf(full_path)
+            if chunks:
+                pages = ocr_pdf_chunks(chunks, limiter)
+            else:
+                pages = offset_pages(ocr_document(limiter, file_path=full_path), 0)
+        ocr_cache.set(cache_key, pages)
+    else:
+        logging.info(f"{pdf_filename}: served from OCR cache")
 
     # Create output directory structure
-    output_name = pdf_filename.rsplit('.', 1)[0] + '.md'
-    output_path = os.path.join(EXPORT_DIR, output_name)
+    output_path = output_path_for(pdf_filename)
     
     # Ensure the output directory exists
     output_dir = os.path.dirname(output_path)
     if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    with open(output_path, 'w', encoding='utf-8') as md_file:
-        for page in response.pages:
-            md_file.write(f"## Page {page.index + 1}\n\n")
-            md_file.write(page.markdown + "\n\n")
+    part_path = f"{output_path}.{os.getpid()}-{threading.get_ident()}.part"
+    try:
+        with open(part_path, 'w', encoding='utf-8') as md_file:
+            for page in pages:
+                md_file.write(f"## Page {page['index'] + 1}\n\n")
+                md_file.write(page['markdown'] + "\n\n")
+
+        def publish():
+            os.replace(part_path, output_path)
+            index_output(output_path, pages)
+
+        if commit is None:
+            publish()
+        elif not commit(len(pages), output_path, publish):
+            print(f"Discarded {output_path}: {pdf_filename} was leased to another worker.")
+            return None
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
     
     print(f"Saved markdown file: {output_path}")
+    return len(pages)
+
+
+class RetryQueue:
+    """Thread-safe work queue where failed files are rescheduled for later.
+
+    A file waiting out its backoff sits in a heap keyed by its ready time, so
+    the other workers keep pulling files that are ready now. An open queue
+    (watch mode) accepts new files through add() until close() is called.
+    """
+
+    def __init__(self, items, closed=True):
+        self._heap = [(0.0, seq, item, 0) for seq, item in enumerate(items)]
+        self._seq = len(self._heap)
+        self._outstanding = len(self._heap)
+        self._items = set(items)
+        self._closed = closed
+        self._cond = threading.Condition()
+
+    def get(self):
+        """Return (item, previous_attempts), or None once closed and every file is settled."""
+        with self._cond:
+            while True:
+                if self._outstanding == 0 and self._closed:
+                    return None
+                if self._heap:
+                    ready_at, _, item, attempts = self._heap[0]
+                    wait = ready_at - time.monotonic()
+                    if wait <= 0:
+                        heapq.heappop(self._heap)
+                        return item, attempts
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+    def retry(self, item, attempts, delay):
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, self._seq, item, attempts))
+            self._seq += 1
+            self._cond.notify()
+
+    def done(self, item):
+        with self._cond:
+            self._outstanding -= 1
+            self._items.discard(item)
+            self._cond.notify_all()
+
+    def add(self, items):
+        """Queue items that are not already queued or in progress; returns how many were added."""
+        added = 0
+        with self._cond:
+            for item in items:
+                if item in self._items:
+                    continue
+                self._items.add(item)
+                heapq.heappush(self._heap, (0.0, self._seq, item, 0))
+                self._seq += 1
+                self._outstanding += 1
+                added += 1
+            self._cond.notify_all()
+        return added
 
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class Progress:
+    """Counts finished files and pages and reports throughput."""
+
+    def __init__(self, total):
+        self.total = total
+        self.succeeded = 0
+        self.failed = 0
+        self.pages = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, count):
+        with self._lock:
+            self.total += count
+
+    def record(self, success, pages=0):
+        with self._lock:
+            if success:
+                self.succeeded += 1
+                self.pages += pages
+            else:
+                self.failed += 1
+
+    def report(self, limiter=None):
+        with self._lock:
+            finished = self.succeeded + self.failed
+            elapsed = max(time.monotonic() - self.started, 1e-6)
+            line = (f"Progress: {finished}/{self.total} files "
+                    f"({self.succeeded} ok, {self.failed} failed) | "
+                    f"{self.succeeded / elapsed:.2f} files/s, {self.pages / elapsed:.2f} pages/s")
+        if limiter is not None:
+            line += f" | rate {limiter.rate:.2f} req/s"
+            pause = limiter.pause_remaining()
+            if pause > 0:
+                line += f", paused {pause:.0f}s (rate limited)"
+        print(line)
+
+
+def source_missing(error, pdf):
+    """True when the PDF was renamed or deleted after it was queued; retrying cannot help."""
+    return isinstance(error, FileNotFoundError) and not os.path.exists(os.path.join(DOC_DIR, pdf))
+
+
+def worker(work, limiter, progress, ledger):
+    """Pull files from the queue until it is drained."""
+    while True:
+        job = work.get()
+        if job is None:
+            return
+        item, attempts = job
+        pdf, file_hash = item
+        attempts += 1
+        full_path = os.path.join(DOC_DIR, pdf)
+        started = time.time()
+        try:
+            pages = convert_pdf_to_markdown(pdf, limiter, file_hash)
+        except Exception as e:
+            error_msg = str(e)
+            if source_missing(e, pdf):
+                ledger.record(pdf, file_hash, SKIPPED, error=error_msg, started=started)
+                print(f"Skipped: {pdf} no longer exists.")
+                progress.add(-1)
+                work.done(item)
+                continue
+            status = FAILED if attempts >= MAX_RETRIES else ERROR
+            ledger.record(pdf, file_hash, status, error=error_msg, started=started)
+            logging.error(f"{pdf} attempt {attempts} failed: {error_msg}")
+            print(f"Error converting {pdf} on attempt {attempts}: {error_msg}")
+            if attempts >= MAX_RETRIES:
+                print(f"Failed: {pdf} after {attempts} attempts.")
+                progress.record(False)
+                work.done(item)
+                continue
+            if is_rate_limited(e):
+                # ocr_document already paused every worker; the file waits out the pause
+                delay = limiter.pause_remaining()
+            else:
+                delay = min(MAX_BACKOFF, INITIAL_BACKOFF * 2 ** (attempts - 1))
+                delay *= random.uniform(0.5, 1.5)
+            print(f"Requeued {pdf}, retrying in {delay:.1f} seconds...")
+            work.retry(item, attempts, delay)
+            continue
+
+        limiter.on_success()
+        ledger.record(pdf, file_hash, SUCCESS, pages=pages, output_path=output_path_for(pdf),
+                      size=os.path.getsize(full_path), started=started)
+        print(f"Success: {pdf} (attempt {attempts}, {pages} pages)")
+        progress.record(True, pages)
+        work.done(item)
+
+
+def queue_worker(queue, owner, limiter, progress, ledger, watch, stop):
+    """Lease files from the shared queue until it is drained (or until stopped in watch mode)."""
+    while not stop.is_set():
+        task = queue.lease(owner)
+        if task is None:
+            if not watch and queue.drained():
+                return
+            stop.wait(QUEUE_POLL_INTERVAL)
+            continue
+        pdf, file_hash, attempts = task
+        progress.add(1)
+        started = time.time()
+
+        def commit(pages, output_path, publish):
+            return queue.complete(pdf, file_hash, owner, pages, output_path, publish)
+
+        try:
+            pages = convert_pdf_to_markdown(pdf, limiter, file_hash, commit)
+        except Exception as e:
+            error_msg = str(e)
+            if source_missing(e, pdf):
+                ledger.record(pdf, file_hash, SKIPPED, error=error_msg, started=started)
+                print(f"Skipped: {pdf} no longer exists.")
+                queue.fail(pdf, file_hash, owner, error_msg)
+                progress.add(-1)
+                continue
+            final = attempts >= MAX_RETRIES
+            ledger.record(pdf, file_hash, FAILED if final else ERROR, error=error_msg, started=started)
+            logging.error(f"{pdf} attempt {attempts} failed: {error_msg}")
+            print(f"Error converting {pdf} on attempt {attempts}: {error_msg}")
+            if final:
+                print(f"Failed: {pdf} after {attempts} attempts.")
+                queue.fail(pdf, file_hash, owner, error_msg)
+                progress.record(False)
+                continue
+            if is_rate_limited(e):
+                delay = limiter.pause_remaining()
+            else:
+                delay = min(MAX_BACKOFF, INITIAL_BACKOFF * 2 ** (attempts - 1))
+                delay *= random.uniform(0.5, 1.5)
+            # Back in the shared queue, so any worker may pick it up after the delay
+            queue.fail(pdf, file_hash, owner, error_msg, retry_in=delay)
+            progress.add(-1)
+            continue
+
+        if pages is None:
+            progress.add(-1)
+            continue
+        limiter.on_success()
+        ledger.record(pdf, file_hash, SUCCESS, pages=pages, output_path=output_path_for(pdf),
+                      size=os.path.getsize(os.path.join(DOC_DIR, pdf)), started=started)
+        print(f"Success: {pdf} (attempt {attempts}, {pages} pages)")
+        progress.record(True, pages)
+
+
+def print_queue_status(queue):
+    """Print progress aggregated over every worker using the shared queue."""
+    status = queue.progress()
+    counts = status['counts']
+    print(f"Queue '{queue.path}': {counts['done']} done, {counts['pending']} pending, "
+          f"{counts['leased']} leased, {counts['failed']} failed | {status['pages']} pages | "
+          f"last 5 min: {status['files_per_second']:.2f} files/s, {status['pages_per_second']:.2f} pages/s")
+    for owner, leased in status['leases'].items():
+        print(f"  {owner}: {leased} leased")
+
+
+def run_queue(args, ledger):
+    """Coordinator/worker mode: convert files from a shared SQLite work queue.
+
+    With --enqueue this process scans DOC_DIR and adds files to the queue (and
+    keeps doing so with --watch). Its --workers threads then lease files from
+    the queue, as do the workers of every other process pointed at it; each
+    process can use its own MISTRAL_API_KEY(S). DOC_DIR and EXPORT_DIR must be
+    the same shared directories for all of them.
+    """
+    queue = WorkQueue(args.queue, lease_seconds=args.lease)
+    settle = WATCH_SETTLE_SECONDS if args.watch else 0
+
+    def enqueue():
+        scan = scan_pdf_files(ledger, settle)
+        added = queue.enqueue(pending_files(scan, ledger.completed()))
+        print(f"Scan: {scan.summary()}. Queued {added} new file(s).")
+
+    if args.enqueue:
+        enqueue()
+    workers = max(0, args.workers)
+    limiter = RateLimiter(args.rps, max_in_flight=args.max_in_flight or max(1, workers),
+                          initial_backoff=INITIAL_BACKOFF, max_backoff=MAX_BACKOFF)
+    progress = Progress(0)
+    stop = threading.Event()
+    queue.start_keeper()
+    threads = [threading.Thread(target=queue_worker, args=(queue, worker_id(n), limiter, progress, ledger,
+                                                            args.watch, stop), daemon=True)
+               for n in range(workers)]
+    for t in threads:
+        t.start()
+    print(f"Using {workers} worker(s) on queue '{args.queue}', up to {args.rps:.2f} requests/s.")
+    print_queue_status(queue)
+
+    next_report = time.monotonic() + PROGRESS_INTERVAL
+    next_scan = time.monotonic() + args.watch_interval
+    try:
+        while any(t.is_alive() for t in threads) or (args.watch and args.enqueue):
+            if threads:
+                for t in threads:
+                    t.join(min(PROGRESS_INTERVAL, args.watch_interval) / len(threads))
+            else:
+                time.sleep(min(PROGRESS_INTERVAL, args.watch_interval))
+            if time.monotonic() >= next_report:
+                if threads:
+                    progress.report(limiter)
+                print_queue_status(queue)
+                next_report = time.monotonic() + PROGRESS_INTERVAL
+            if args.watch and args.enqueue and time.monotonic() >= next_scan:
+                enqueue()
+                next_scan = time.monotonic() + args.watch_interval
+    except KeyboardInterrupt:
+        print("\nStopping; finishing files already being converted (Ctrl+C again to abort)...")
+        stop.set()
+        for t in threads:
+            t.join()
+
+    print_queue_status(queue)
+    queue.close()
+    return progress
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Batch OCR conversion of PDFs to Markdown.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"number of files converted concurrently (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--rps', type=float, default=DEFAULT_RPS,
+                        help="maximum OCR requests per second (default: %(default).2f)")
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                        help="maximum concurrent OCR requests (default: same as --workers)")
+    parser.add_argument('--watch', action='store_true',
+                        help="keep running and convert new or modified files as they appear "
+                             "(files that failed every retry wait until they change or the next run)")
+    parser.add_argument('--watch-interval', type=float, default=DEFAULT_WATCH_INTERVAL,
+                        help="seconds between directory scans in watch mode (default: %(default)s)")
+    parser.add_argument('--queue', metavar='PATH', default=None,
+                        help="shared SQLite work queue; lets several processes or hosts convert together")
+    parser.add_argument('--enqueue', action='store_true',
+                        help="with --queue: scan the import directory and add its files to the queue "
+                             "(use --workers 0 for a coordinator that only enqueues)")
+    parser.add_argument('--lease', type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="with --queue: seconds before a crashed worker's file returns to the queue "
+                             "(default: %(default)s)")
+    parser.add_argument('--status', action='store_true',
+                        help="with --queue: print progress across all workers and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.queue and args.status:
+        queue = WorkQueue(args.queue)
+        print_queue_status(queue)
+        queue.close()
+        return
 
-def main():
     # Ensure export directory exists
     ensure_export_directory()
     
-    processed = load_processed()
-    all_files = get_pdf_files()
-    total = len(all_files)
-    succeeded = sum(1 for r in processed.values() if r['status'] == 'success')
-    to_do = [f for f in all_files if processed.get(f, {}).get('status') != 'success']
+    ledger = open_ledger()
+    if args.queue:
+        progress = run_queue(args, ledger)
+        ledger.close()
+        print(f"\nThis process converted {progress.succeeded} file(s) ({progress.failed} failed).")
+        return
+    settle = WATCH_SETTLE_SECONDS if args.watch else 0
+    scan = scan_pdf_files(ledger, settle)
+    to_do = pending_files(scan, ledger.completed())
+    total = len(scan.index)
 
-    print(f"Found {total} PDF files in '{DOC_DIR}/'. {succeeded} already converted. {len(to_do)} remaining.")
+    print(f"Scanned '{DOC_DIR}/': {scan.summary()}.")
+    print(f"Found {total} PDF files in '{DOC_DIR}/'. {total - len(to_do)} already converted. {len(to_do)} remaining.")
     print(f"Output will be saved to '{EXPORT_DIR}/' directory.")
 
-    converted_count = 0
-    for idx, pdf in enumerate(to_do, start=1):
-        print(f"[{idx}/{len(to_do)}] Processing: {pdf}")
-        attempts = 0
-        backoff = INITIAL_BACKOFF
-        success = False
-
-        while attempts < MAX_RETRIES and not success:
-            attempts += 1
-            try:
-                convert_pdf_to_markdown(pdf)
-                success = True
-                converted_count += 1
-                append_to_db({'filename': pdf, 'status': 'success', 'attempts': attempts, 'error': ''})
-                print(f"Success: {pdf} (attempt {attempts})")
-                print(f"Waiting for the next file...")
-                time.sleep(3)
-            except Exception as e:
-                error_msg = str(e)
-                append_to_db({'filename': pdf, 'status': 'error', 'attempts': attempts, 'error': error_msg})
-                logging.error(f"{pdf} attempt {attempts} failed: {error_msg}")
-                print(f"Error converting {pdf} on attempt {attempts}: {error_msg}")
-                if attempts < MAX_RETRIES:
-                    print(f"Retrying in {backoff} seconds...")
-                    time.sleep(backoff)
-                    backoff *= 2
-
-        if not success:
-            print(f"Failed: {pdf} after {attempts} attempts.")
-
-    print(f"\nConversion complete. Total successful conversions: {converted_count} out of {len(to_do)}.")
+    workers = max(1, args.workers)
+    limiter = RateLimiter(args.rps, max_in_flight=args.max_in_flight or workers,
+                          initial_backoff=INITIAL_BACKOFF, max_backoff=MAX_BACKOFF)
+    work = RetryQueue(to_do, closed=not args.watch)
+    progress = Progress(len(to_do))
+    print(f"Using {workers} worker(s), up to {args.rps:.2f} requests/s.")
+    if args.watch:
+        print(f"Watching '{DOC_DIR}/' every {args.watch_interval:.0f}s. Press Ctrl+C to stop.")
+
+    threads = [threading.Thread(target=worker, args=(work, limiter, progress, ledger), daemon=True)
+               for _ in range(workers)]
+    for t in threads:
+        t.start()
+    next_report = time.monotonic() + PROGRESS_INTERVAL
+    next_scan = time.monotonic() + args.watch_interval
+    while any(t.is_alive() for t in threads):
+        try:
+            for t in threads:
+                t.join(min(PROGRESS_INTERVAL, args.watch_interval) / len(threads))
+            if time.monotonic() >= next_report or not any(t.is_alive() for t in threads):
+                progress.report(limiter)
+                next_report = time.monotonic() + PROGRESS_INTERVAL
+            if args.watch and time.monotonic() >= next_scan:
+                scan, added = watch_scan(work, ledger, settle)
+                if added:
+                    progress.add(added)
+                    print(f"Scan: {scan.summary()}. Queued {added} file(s).")
+                next_scan = time.monotonic() + args.watch_interval
+        except KeyboardInterrupt:
+            if not args.watch:
+                raise
+            print("\nStopping watch mode; finishing queued files (Ctrl+C again to abort)...")
+            args.watch = False
+            work.close()
+
+    ledger.flush()
+    counts = ledger.counts()
+    ledger.close()
+
+    print(f"\nConversion complete. Total successful conversions: {progress.succeeded} out of {progress.total}.")
     print(f"All converted files are saved in '{EXPORT_DIR}/' directory.")
+    stats = ocr_cache.stats()
+    print(f"OCR cache: {stats['memory_hits'] + stats['disk_hits']} hits, {stats['misses']} misses.")
+    print("Ledger: " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())) + ".")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,253 @@
+"""
+سجل معالجة دفعات PDF في SQLite (وضع WAL) بدلاً من ملف CSV يُضاف إليه فقط
+
+- مفتاح كل سجل هو (المسار، بصمة المحتوى)، فالملف المعدّل يُعالج من جديد
+- تُجمع الكتابات في طابور وتُنفذ على دفعات داخل معاملة واحدة من خيط مخصص
+- استعلامات الاستئناف (الملفات المكتملة، العد حسب الحالة) تستخدم فهارس
+- استيراد لمرة واحدة من processed_files.csv القديم
+- فهرس المسح (الحجم، وقت التعديل، البصمة) لكل ملف، انظر pdf_scan
+
+عند توقف العملية فجأة تُفقد فقط السجلات التي لم تُكتب بعد (أقل من
+flush_interval ثانية)، فتُعالج ملفاتها مرة أخرى في التشغيل التالي.
+"""
+import csv
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# حالات السجل
+SUCCESS = "success"
+ERROR = "error"    # فشلت المحاولة وستُعاد
+FAILED = "failed"  # استُنفدت المحاولات
+SKIPPED = "skipped"  # لم يعد الملف موجوداً (حُذف أو أُعيدت تسميته قبل معالجته)
+
+LEDGER_BATCH_SIZE = 200
+LEDGER_FLUSH_INTERVAL = 1.0  # بالثواني
+
+_UPSERT = (
+    "INSERT INTO ledger (path, sha256, status, attempts, error, pages, output_path, size,"
+    " started, finished, duration, updated)"
+    " VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?)"
+    " ON CONFLICT(path, sha256) DO UPDATE SET"
+    " status = excluded.status,"
+    " attempts = ledger.attempts + 1,"
+    " error = excluded.error,"
+    " pages = COALESCE(excluded.pages, ledger.pages),"
+    " output_path = COALESCE(excluded.output_path, ledger.output_path),"
+    " size = COALESCE(excluded.size, ledger.size),"
+    " started = COALESCE(ledger.started, excluded.started),"
+    " finished = excluded.finished,"
+    " duration = excluded.duration,"
+    " updated = excluded.updated"
+)
+
+
+class BatchLedger:
+    """
+    سجل معالجة الملفات. record() لا ينتظر القرص؛ تُكتب السجلات على دفعات
+    من خيط الكتابة، و flush() تنتظر حتى تُكتب كل السجلات السابقة لها.
+    """
+
+    def __init__(self, path: str, batch_size: int = LEDGER_BATCH_SIZE,
+                 flush_interval: float = LEDGER_FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ledger ("
+            " path TEXT NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT NOT NULL DEFAULT '',"
+            " pages INTEGER,"
+            " output_path TEXT,"
+            " size INTEGER,"
+            " started REAL,"
+            " finished REAL,"
+            " duration REAL,"
+            " updated REAL NOT NULL,"
+            " PRIMARY KEY (path, sha256))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ledger_status ON ledger(status, path)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS scan_index ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " scanned REAL NOT NULL)"
+        )
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="ledger-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, path: str, sha256: str, status: str, error: str = "", pages: Optional[int] = None,
+               output_path: Optional[str] = None, size: Optional[int] = None,
+               started: Optional[float] = None, finished: Optional[float] = None):
+        """تسجيل نتيجة محاولة واحدة (يزيد عدد المحاولات بواحد)"""
+        finished = finished if finished is not None else time.time()
+        duration = finished - started if started is not None else None
+        self._queue.put((path, sha256 or "", status, error or "", pages, output_path, size,
+                         started, finished, duration, time.time()))
+
+    def flush(self):
+        """انتظار كتابة كل السجلات المرسلة حتى الآن"""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def completed(self) -> Set[Tuple[str, str]]:
+        """أزواج (المسار، البصمة) المكتملة بنجاح"""
+        with self._lock:
+            rows = self._db.execute("SELECT path, sha256 FROM ledger WHERE status = ?", (SUCCESS,)).fetchall()
+        return set(rows)
+
+    def failed(self) -> Set[Tuple[str, str]]:
+        """أزواج (المسار، البصمة) التي استُنفدت محاولاتها"""
+        with self._lock:
+            rows = self._db.execute("SELECT path, sha256 FROM ledger WHERE status = ?", (FAILED,)).fetchall()
+        return set(rows)
+
+    def counts(self) -> Dict[str, int]:
+        """عدد السجلات لكل حالة"""
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM ledger GROUP BY status").fetchall())
+
+    def get(self, path: str) -> List[Dict[str, Any]]:
+        """سجلات مسار معين (سجل لكل نسخة من محتواه)"""
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM ledger WHERE path = ? ORDER BY updated", (path,))
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def scan_index(self) -> Dict[str, Tuple[int, int, str]]:
+        """فهرس المسح الأخير: المسار -> (الحجم، وقت التعديل بالنانوثانية، البصمة)"""
+        with self._lock:
+            rows = self._db.execute("SELECT path, size, mtime_ns, sha256 FROM scan_index").fetchall()
+        return {path: (size, mtime_ns, sha256) for path, size, mtime_ns, sha256 in rows}
+
+    def save_scan(self, changed: Dict[str, Tuple[int, int, str]], removed: List[str],
+                  renamed: List[Tuple[str, str]] = (), output_path_for: Optional[Callable[[str], str]] = None):
+        """
+        حفظ تغييرات المسح في معاملة واحدة. سجلات الملفات المعاد تسميتها
+        تنتقل إلى المسار الجديد (ومسار الناتج إلى output_path_for(المسار الجديد))
+        حتى لا تُعالج مرة أخرى.
+        """
+        self.flush()
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany("DELETE FROM scan_index WHERE path = ?",
+                                     [(path,) for path in removed] + [(old,) for old, _ in renamed])
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO scan_index (path, size, mtime_ns, sha256, scanned)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    [(path, size, mtime_ns, sha256, now) for path, (size, mtime_ns, sha256) in changed.items()])
+                for old_path, new_path in renamed:
+                    sha256 = changed[new_path][2]
+                    output_path = output_path_for(new_path) if output_path_for else None
+                    self._db.execute(
+                        "UPDATE OR REPLACE ledger SET path = ?, output_path = COALESCE(?, output_path), updated = ?"
+                        " WHERE path = ? AND sha256 = ?",
+                        (new_path, output_path, now, old_path, sha256))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM ledger LIMIT 1").fetchone() is None
+
+    def import_csv(self, csv_path: str, hash_for: Callable[[str], Optional[str]]) -> int:
+        """
+        استيراد processed_files.csv القديم (صف لكل محاولة) في معاملة واحدة.
+
+        يُحتفظ بآخر حالة لكل ملف ومجموع محاولاته. hash_for(filename) تُرجع
+        بصمة الملف الحالي أو None إذا لم يعد موجوداً.
+        """
+        merged: Dict[str, Dict[str, Any]] = {}
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                entry = merged.setdefault(row['filename'], {"attempts": 0})
+                entry["status"] = row.get('status') or ERROR
+                entry["error"] = row.get('error') or ""
+                entry["attempts"] += 1
+
+        now = time.time()
+        rows = []
+        for filename, entry in merged.items():
+            rows.append((filename, hash_for(filename) or "", entry["status"], entry["attempts"],
+                         entry["error"], now))
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO ledger (path, sha256, status, attempts, error, updated)"
+                    " VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def close(self):
+        """كتابة ما تبقى من السجلات وإغلاق القاعدة"""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        with self._lock:
+            self._db.close()
+
+    def _write_loop(self):
+        pending: List[tuple] = []
+        waiters: List[threading.Event] = []
+        deadline = None
+        stop = False
+        while not stop:
+            # أقدم سجل غير مكتوب لا ينتظر أكثر من flush_interval
+            timeout = self.flush_interval if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    pending.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                    if len(pending) < self.batch_size and time.monotonic() < deadline:
+                        continue
+            except queue.Empty:
+                pass
+            deadline = None
+            if pending:
+                self._write(pending)
+                pending = []
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+
+    def _write(self, rows: List[tuple]):
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._db.executemany(_UPSERT, rows)
+                self._db.execute("COMMIT")
+            except sqlite3.Error as e:
+                logger.error(f"تعذر كتابة {len(rows)} سجل في {self.path}: {e}")
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
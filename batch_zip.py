@@ -0,0 +1,116 @@
+"""
+معالجة دفعات الملفات عبر /api/batch: أرشيف ZIP للنتائج يُبث أثناء المعالجة
+
+الطلب يُستقبل ويُحفظ كاملاً قبل أول بايت من الرد (فأخطاء المدخلات، مثل أرشيف
+تالف أو عدد ملفات زائد، تُرجع 400 بدلاً من أرشيف مبتور)؛ البث في المخرج فقط.
+
+- المدخلات ملفات PDF/صور متعددة و/أو أرشيفات ZIP (تُستخرج منها الملفات المدعومة
+  بمساراتها)
+- كل مستند مكتمل يُضاف إلى الأرشيف ويُرسل فوراً، بنفس تخطيط BatchPdfConv:
+  المسار نفسه بامتداد .md، وكل صفحة تحت عنوان "## Page N"
+- في آخر الأرشيف manifest.json بحالة كل ملف (مكتمل، فشل، متجاهل)
+
+الأرشيف يُكتب بواصفات البيانات (data descriptors) فلا يحتاج إلى الرجوع في
+المخرج، وذاكرته بقدر المستند الواحد.
+"""
+import io
+import os
+import json
+import time
+import zipfile
+import posixpath
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# الحد الأقصى لعدد الملفات في الدفعة الواحدة (بعد فك أرشيفات ZIP)
+OCR_BATCH_MAX_FILES = int(os.getenv("OCR_BATCH_MAX_FILES", "500"))
+# عدد المستندات المعالجة بالتوازي في الدفعة (مجمع العمال يحد الاستدعاءات الفعلية)
+OCR_BATCH_CONCURRENCY = int(os.getenv("OCR_BATCH_CONCURRENCY", "4"))
+
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed", "application/x-zip"}
+# امتدادات الملفات المدعومة داخل الأرشيف ونوع المحتوى المقابل
+SUPPORTED_EXTENSIONS = {".pdf": "application/pdf", ".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg"}
+MANIFEST_NAME = "manifest.json"
+
+# حالات الملف في البيان
+COMPLETED = "completed"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+def is_zip_upload(filename: Optional[str], content_type: Optional[str]) -> bool:
+    return content_type in ZIP_CONTENT_TYPES or (filename or "").lower().endswith(".zip")
+
+
+def safe_entry_path(name: str) -> Optional[str]:
+    """
+    مسار نسبي آمن لملف داخل الأرشيف أو اسم ملف مرفوع (بلا جذر ولا ..)،
+    أو None للمجلدات وملفات النظام المخفية.
+    """
+    name = name.replace("\\", "/")
+    if name.endswith("/"):
+        return None
+    parts = [part for part in posixpath.normpath("/" + name).split("/") if part not in ("", ".", "..")]
+    if not parts or parts[0] == "__MACOSX" or parts[-1].startswith("."):
+        return None
+    return "/".join(parts)
+
+
+def markdown_path(path: str, used: Set[str]) -> str:
+    """مسار ملف Markdown للنتيجة (مثل output_path_for في BatchPdfConv)، فريد داخل الأرشيف"""
+    base = path.rsplit(".", 1)[0]
+    candidate = base + ".md"
+    counter = 2
+    while candidate in used:
+        candidate = f"{base}-{counter}.md"
+        counter += 1
+    used.add(candidate)
+    return candidate
+
+
+def export_markdown(pages: Iterable[Dict[str, Any]]) -> str:
+    """نص ملف النتيجة بتنسيق BatchPdfConv"""
+    return "".join(f"## Page {page['index'] + 1}\n\n{page['markdown']}\n\n" for page in pages)
+
+
+class _Sink(io.RawIOBase):
+    """مخرج لا يدعم الرجوع (seek)، يجمع ما يكتبه zipfile حتى يُسحب ويُرسل"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._offset = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ZipStream:
+    """كتابة أرشيف ZIP تزايدياً: كل إضافة تُرجع البايتات الجاهزة للإرسال"""
+
+    def __init__(self):
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def add(self, name: str, data: str) -> bytes:
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        self._zip.writestr(info, data.encode("utf-8"))
+        return self._sink.drain()
+
+    def finish(self, manifest: List[Dict[str, Any]]) -> bytes:
+        """إضافة البيان وإغلاق الأرشيف (الدليل المركزي)"""
+        data = self.add(MANIFEST_NAME, json.dumps({"files": manifest}, ensure_ascii=False, indent=2))
+        self._zip.close()
+        return data + self._sink.drain()
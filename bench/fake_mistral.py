@@ -0,0 +1,202 @@
+"""
+خادم بديل محلي لـ Mistral OCR API لاختبارات الأداء دون استهلاك الحصة المدفوعة
+
+يحاكي نقاط SDK التي يستخدمها التطبيق:
+- POST /v1/ocr          (client.ocr.process)
+- POST /v1/files        (client.files.upload في وضع OCR_UPLOAD_MODE=files)
+- DELETE /v1/files/{id} (client.files.delete)
+
+مع توزيع زمني قابل للضبط، ونسب أخطاء 500 وردود 429، وعدد صفحات يُقرأ من
+ملف PDF المرسل نفسه (أو قيمة ثابتة). يُوجَّه التطبيق إليه عبر MISTRAL_SERVER_URL.
+
+    python bench/fake_mistral.py --port 8900 --latency lognormal:0.8,0.4 --rate-429 0.05
+"""
+import io
+import sys
+import math
+import time
+import uuid
+import base64
+import random
+import asyncio
+import argparse
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import uvicorn
+
+try:
+    from pypdf import PdfReader
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+SAMPLE_LINE = "هذا نص تجريبي مستخرج من صفحة مستند عربي. Sample OCR text line."
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """
+    تحويل وصف التوزيع إلى دالة تُرجع زمناً بالثواني:
+    fixed:S أو uniform:MIN,MAX أو lognormal:MEDIAN,SIGMA أو exp:MEAN
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2 and values[0] > 0:
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1])
+    if kind == "exp" and len(values) == 1 and values[0] > 0:
+        return lambda: random.expovariate(1 / values[0])
+    raise ValueError(f"توزيع زمني غير معروف: {spec}")
+
+
+def count_pages(data: bytes, default: int) -> int:
+    """عدد صفحات PDF من بايتاته، أو القيمة الافتراضية إذا تعذرت القراءة"""
+    if not PYPDF_AVAILABLE or not data.startswith(b"%PDF"):
+        return default
+    try:
+        return max(1, len(PdfReader(io.BytesIO(data)).pages))
+    except Exception:
+        return default
+
+
+def decode_data_url(url: str) -> bytes:
+    _, _, encoded = url.partition(",")
+    return base64.b64decode(encoded)
+
+
+def create_app(latency: str = "fixed:0", latency_per_page: float = 0.0, error_rate: float = 0.0,
+               rate_429: float = 0.0, retry_after: int = 1, pages: int = 1,
+               markdown_lines: int = 20, seed: Optional[int] = None) -> FastAPI:
+    """إنشاء تطبيق الخادم البديل بالإعدادات المعطاة"""
+    if seed is not None:
+        random.seed(seed)
+    sample_latency = parse_latency(latency)
+    files: Dict[str, bytes] = {}
+    stats: Dict[str, float] = {"ocr_requests": 0, "ocr_pages": 0, "rate_limited": 0, "errors": 0,
+                               "uploads": 0, "upload_bytes": 0, "deletes": 0, "busy_seconds": 0.0}
+    lock = threading.Lock()
+    app = FastAPI(title="Mistral OCR stand-in")
+
+    def count(key: str, amount: float = 1):
+        with lock:
+            stats[key] += amount
+
+    def page_body(index: int) -> Dict[str, Any]:
+        lines = [f"# صفحة {index + 1}"] + [SAMPLE_LINE] * markdown_lines
+        return {
+            "index": index,
+            "markdown": "\n\n".join(lines),
+            "images": [],
+            "dimensions": {"dpi": 200, "height": 2339, "width": 1654},
+        }
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def get_stats():
+        with lock:
+            return dict(stats)
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        with lock:
+            for key in stats:
+                stats[key] = 0
+        return {"status": "reset"}
+
+    @app.post("/v1/ocr")
+    async def ocr(request: Request):
+        body = await request.json()
+        document = body.get("document") or {}
+        data = b""
+        if document.get("type") == "document_url":
+            data = decode_data_url(document.get("document_url", ""))
+        elif document.get("type") == "file":
+            data = files.get(document.get("file_id"), b"")
+        page_count = count_pages(data, pages) if data else pages
+        if document.get("type") == "image_url":
+            page_count = 1
+
+        started = time.perf_counter()
+        await asyncio.sleep(sample_latency() + latency_per_page * page_count)
+        count("busy_seconds", time.perf_counter() - started)
+
+        roll = random.random()
+        if roll < rate_429:
+            count("rate_limited")
+            return JSONResponse({"message": "Rate limit exceeded"}, status_code=429,
+                                headers={"Retry-After": str(retry_after)})
+        if roll < rate_429 + error_rate:
+            count("errors")
+            return JSONResponse({"message": "Internal server error"}, status_code=500)
+
+        count("ocr_requests")
+        count("ocr_pages", page_count)
+        return {
+            "pages": [page_body(i) for i in range(page_count)],
+            "model": body.get("model", "mistral-ocr-latest"),
+            "usage_info": {"pages_processed": page_count, "doc_size_bytes": len(data) or None},
+        }
+
+    @app.post("/v1/files")
+    async def upload(request: Request):
+        form = await request.form()
+        upload_file = form.get("file")
+        content = await upload_file.read()
+        file_id = str(uuid.uuid4())
+        files[file_id] = content
+        count("uploads")
+        count("upload_bytes", len(content))
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": upload_file.filename or "document",
+            "purpose": form.get("purpose", "ocr"),
+            "sample_type": "ocr_input",
+            "source": "upload",
+        }
+
+    @app.delete("/v1/files/{file_id}")
+    async def delete(file_id: str):
+        files.pop(file_id, None)
+        count("deletes")
+        return {"id": file_id, "object": "file", "deleted": True}
+
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="خادم بديل لـ Mistral OCR API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default="lognormal:0.5,0.3",
+                        help="توزيع زمن الاستجابة: fixed:S | uniform:MIN,MAX | lognormal:MEDIAN,SIGMA | exp:MEAN")
+    parser.add_argument("--latency-per-page", type=float, default=0.05, help="ثوانٍ إضافية لكل صفحة")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="نسبة ردود 500")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="نسبة ردود 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="قيمة ترويسة Retry-After بالثواني")
+    parser.add_argument("--pages", type=int, default=1, help="عدد الصفحات إذا تعذر قراءته من المستند")
+    parser.add_argument("--markdown-lines", type=int, default=20, help="عدد الأسطر في نص كل صفحة")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = create_app(args.latency, args.latency_per_page, args.error_rate, args.rate_429,
+                     args.retry_after, args.pages, args.markdown_lines, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
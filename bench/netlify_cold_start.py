@@ -0,0 +1,157 @@
+"""
+زمن البدء البارد وزمن الاستدعاء الدافئ لدالة Netlify process-ocr مقابل fake_mistral.py
+
+- بارد: عمليات Python جديدة (كحاوية جديدة)، كل منها يحمّل الدالة ويستدعيها مرة
+  واحدة؛ يُقاس زمن تحميل الوحدة، وزمن أول استدعاء (استيراد mistralai وإنشاء
+  العميل والاتصال)، والزمن الكلي من بدء العملية حتى أول رد
+- دافئ: عملية واحدة تستدعي الدالة مرات متتالية بالعميل نفسه (كحاوية دافئة)
+
+    python bench/netlify_cold_start.py --cold 10 --warm 50
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import tempfile
+import subprocess
+from typing import Any, Dict, List
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUNCTION_PATH = os.path.join(REPO_DIR, "netlify", "functions", "process-ocr.py")
+
+
+def invoke_function(pdf_path: str, invocations: int) -> Dict[str, Any]:
+    """(داخل العملية الفرعية) تحميل الدالة واستدعاؤها؛ الأزمنة بالثواني"""
+    import importlib.util
+
+    started = time.perf_counter()
+    spec = importlib.util.spec_from_file_location("process_ocr", FUNCTION_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    loaded = time.perf_counter()
+    # يجب ألا يُستورد SDK قبل أول استدعاء فعلي
+    eager = sorted(name for name in ("mistralai", "httpx", "pydantic") if name in sys.modules)
+
+    with open(pdf_path, "rb") as f:
+        body = base64.b64encode(f.read()).decode("ascii")
+    event = {
+        "httpMethod": "POST",
+        "headers": {"content-type": "application/pdf"},
+        "queryStringParameters": {"filename": os.path.basename(pdf_path)},
+        "body": body,
+        "isBase64Encoded": True,
+    }
+    latencies: List[float] = []
+    for _ in range(invocations):
+        call_started = time.perf_counter()
+        result = module.handler(event, None)
+        if result["statusCode"] != 200:
+            raise RuntimeError(f"فشل الاستدعاء ({result['statusCode']}): {result['body']}")
+        latencies.append(time.perf_counter() - call_started)
+    return {"import": loaded - started, "latencies": latencies, "eager_imports": eager}
+
+
+def run_child(pdf_path: str, invocations: int, env: Dict[str, str]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", pdf_path,
+                           "--warm", str(invocations)],
+                          cwd=REPO_DIR, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip() or proc.stdout.strip())
+    outcome = json.loads(proc.stdout.strip().splitlines()[-1])
+    outcome["wall"] = wall
+    return outcome
+
+
+def interpreter_startup(env: Dict[str, str]) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], env=env, check=True)
+    return time.perf_counter() - started
+
+
+def stats_ms(values: List[float]) -> Dict[str, Any]:
+    from run_bench import percentile
+
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50) * 1000, 1),
+        "p95": round(percentile(values, 95) * 1000, 1),
+        "max": round(max(values) * 1000, 1),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="زمن البدء البارد والدافئ لدالة Netlify process-ocr")
+    parser.add_argument("--cold", type=int, default=10, help="عدد عمليات البدء البارد")
+    parser.add_argument("--warm", type=int, default=50, help="عدد الاستدعاءات الدافئة")
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--file-kb", type=int, default=200)
+    parser.add_argument("--latency", default="fixed:0.02", help="زمن استجابة الخادم البديل")
+    parser.add_argument("--latency-per-page", type=float, default=0.0)
+    parser.add_argument("--output", default=None, help="حفظ النتائج في ملف JSON")
+    parser.add_argument("--child", metavar="PDF", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    # معاملات الخادم البديل التي لا يحتاج هذا الاختبار إلى ضبطها
+    args.error_rate = args.rate_429 = 0.0
+    args.retry_after = 1
+    args.seed = None
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(invoke_function(args.child, args.warm)))
+        return 0
+
+    # run_bench يستورد httpx و pypdf، فلا يُحمّل في العملية الفرعية حتى لا يفسد القياس
+    from run_bench import fake_server, make_pdf
+
+    work_dir = tempfile.mkdtemp(prefix="netlify-bench-")
+    server = fake_server(args, work_dir)
+    try:
+        pdf_path = os.path.join(work_dir, "bench.pdf")
+        make_pdf(pdf_path, args.pages, args.file_kb, f"netlify-{time.time_ns()}")
+        env = dict(os.environ)
+        env.update({"MISTRAL_API_KEY": "bench-key", "MISTRAL_SERVER_URL": server.url,
+                    "OCR_MOCK_MODE": "false", "OCR_UPLOAD_MODE": "inline"})
+
+        print(f"بدء بارد: {args.cold} عملية...", flush=True)
+        interpreter = [interpreter_startup(env) for _ in range(args.cold)]
+        cold = [run_child(pdf_path, 1, env) for _ in range(args.cold)]
+        print(f"دافئ: {args.warm} استدعاء في عملية واحدة...", flush=True)
+        # الاستدعاء الأول بارد؛ يُستبعد من أزمنة الحاوية الدافئة
+        warm = run_child(pdf_path, args.warm + 1, env)
+    finally:
+        server.stop()
+
+    results = {
+        "interpreter": stats_ms(interpreter),
+        "import": stats_ms([run["import"] for run in cold]),
+        "first_call": stats_ms([run["latencies"][0] for run in cold]),
+        "cold_total": stats_ms([run["wall"] for run in cold]),
+        "warm_call": stats_ms(warm["latencies"][1:]),
+    }
+    eager = sorted({name for run in cold for name in run["eager_imports"]})
+
+    print()
+    print(f"{'phase':<13}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    print("-" * 48)
+    for phase, row in results.items():
+        print(f"{phase:<13}{row['count']:>5}{row['p50']:>10}{row['p95']:>10}{row['max']:>10}")
+    print(f"\nزمن الخادم البديل لكل طلب: {args.latency} (+{args.latency_per_page} لكل صفحة)")
+    if eager:
+        print(f"تحذير: وحدات ثقيلة تُستورد عند تحميل الدالة: {', '.join(eager)}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k not in ("output", "child")},
+                       "results": results, "eager_imports": eager}, f, ensure_ascii=False, indent=2)
+    return 1 if eager else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
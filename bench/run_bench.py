@@ -0,0 +1,390 @@
+"""
+اختبار أداء قابل للتكرار لخط معالجة OCR باستخدام الخادم البديل fake_mistral.py
+
+يشغّل الخادم البديل، ثم لكل مستوى تزامن:
+- api:   نسخة جديدة من التطبيق (uvicorn main:app) ويرسل /api/upload ثم /api/process-ocr
+- batch: BatchPdfConv.py على مجلد ملفات PDF مولدة بعدد العمال المحدد
+
+ويقيس الإنتاجية ونسب زمن الاستجابة (p50/p90/p99) وذروة الذاكرة (RSS) لكل عملية.
+يمكن حفظ النتائج كخط أساس ومقارنة التشغيلات اللاحقة به لكشف التراجع.
+
+    python bench/run_bench.py --target api --concurrency 1,4,16 --requests 40
+    python bench/run_bench.py --save-baseline local
+    python bench/run_bench.py --compare local
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+from pypdf import PdfWriter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+
+# مقاييس المقارنة: True إذا كانت القيمة الأعلى أفضل
+COMPARED_METRICS = {
+    "throughput_rps": True,
+    "pages_per_second": True,
+    "latency_p50": False,
+    "latency_p90": False,
+    "latency_p99": False,
+    "peak_rss_mb": False,
+}
+
+
+def make_pdf(path: str, pages: int, pad_kb: int, uid: str):
+    """إنشاء PDF بصفحات فارغة ومحتوى فريد (حتى لا يطابق التخزين المؤقت ملفاً سابقاً)"""
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=595, height=842)
+    writer.add_metadata({"/Title": uid, "/Subject": os.urandom(pad_kb * 512).hex()})
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+class Service:
+    """عملية فرعية تُنتظر جاهزيتها عبر HTTP وتُقاس ذروة ذاكرتها عند الإيقاف"""
+
+    def __init__(self, cmd: List[str], cwd: str, env: Dict[str, str], ready_url: Optional[str] = None,
+                 log_path: Optional[str] = None):
+        self.cmd = cmd
+        self.cwd = cwd
+        self.env = env
+        self.ready_url = ready_url
+        self.log_path = log_path or os.devnull
+        self.url = ready_url.rsplit("/", 1)[0] if ready_url else None
+        self.proc: Optional[subprocess.Popen] = None
+
+    def start(self, timeout: float = 30):
+        self._log = open(self.log_path, "ab")
+        self.proc = subprocess.Popen(self.cmd, cwd=self.cwd, env=self.env,
+                                     stdout=self._log, stderr=subprocess.STDOUT)
+        if self.ready_url is None:
+            return self
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"توقفت العملية قبل الجاهزية: {' '.join(self.cmd)} (انظر {self.log_path})")
+            try:
+                if httpx.get(self.ready_url, timeout=1).status_code < 500:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        self.stop()
+        raise RuntimeError(f"انتهت مهلة انتظار {self.ready_url}")
+
+    def wait(self) -> Optional[float]:
+        """انتظار انتهاء العملية وإرجاع ذروة RSS بالميغابايت"""
+        peak = None
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(self.proc.pid, 0)
+            self.proc.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss بالكيلوبايت على Linux وبالبايت على macOS
+            divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+            peak = usage.ru_maxrss / divisor
+        else:
+            self.proc.wait()
+        self._log.close()
+        return peak
+
+    def stop(self) -> Optional[float]:
+        if self.proc is None or self.proc.returncode is not None:
+            return None
+        self.proc.terminate()
+        return self.wait()
+
+
+def fake_server(args, log_dir: str) -> Service:
+    port = free_port()
+    cmd = [sys.executable, os.path.join(BENCH_DIR, "fake_mistral.py"), "--port", str(port),
+           "--latency", args.latency, "--latency-per-page", str(args.latency_per_page),
+           "--error-rate", str(args.error_rate), "--rate-429", str(args.rate_429),
+           "--retry-after", str(args.retry_after)]
+    if args.seed is not None:
+        cmd += ["--seed", str(args.seed)]
+    service = Service(cmd, REPO_DIR, dict(os.environ), f"http://127.0.0.1:{port}/health",
+                      os.path.join(log_dir, "fake_mistral.log"))
+    return service.start()
+
+
+def base_env(args, server_url: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "MISTRAL_API_KEY": "bench-key",
+        "MISTRAL_SERVER_URL": server_url,
+        "OCR_CACHE_PATH": "",
+        "OCR_JOBS_DB": "",
+        "OCR_UPLOAD_MODE": args.upload_mode,
+        "PYTHONUNBUFFERED": "1",
+    })
+    return env
+
+
+def upstream_stats(server_url: str, reset: bool = False) -> Dict[str, Any]:
+    if reset:
+        httpx.post(f"{server_url}/stats/reset")
+        return {}
+    return httpx.get(f"{server_url}/stats").json()
+
+
+async def drive_api(app_url: str, files: List[str], concurrency: int) -> Dict[str, Any]:
+    """إرسال الملفات عبر upload ثم process-ocr بعدد محدد من العملاء المتزامنين"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for path in files:
+        queue.put_nowait(path)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    async def client_loop(http: httpx.AsyncClient):
+        while True:
+            try:
+                path = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            name = os.path.basename(path)
+            started = time.perf_counter()
+            try:
+                with open(path, "rb") as f:
+                    response = await http.post(f"{app_url}/api/upload",
+                                               files={"file": (name, f, "application/pdf")})
+                if response.status_code == 200:
+                    response = await http.post(f"{app_url}/api/process-ocr",
+                                               data={"filename": response.json()["filename"]})
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == "200":
+                latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=None, limits=limits) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(http) for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+    return {"wall_seconds": wall, "latencies": latencies, "status_codes": statuses}
+
+
+def summarize(target: str, level: int, count: int, ok: int, pages: int, wall: float,
+              latencies: List[float], peak_rss: Optional[float], extra: Dict[str, Any]) -> Dict[str, Any]:
+    result = {
+        "target": target,
+        "concurrency": level,
+        "requests": count,
+        "ok": ok,
+        "failed": count - ok,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(ok / wall, 3) if wall else None,
+        "pages_per_second": round(pages / wall, 3) if wall else None,
+        "peak_rss_mb": round(peak_rss, 1) if peak_rss is not None else None,
+    }
+    for pct in (50, 90, 99):
+        value = percentile(latencies, pct)
+        result[f"latency_p{pct}"] = round(value, 3) if value is not None else None
+    result.update(extra)
+    return result
+
+
+def run_api(args, server_url: str, work_dir: str, level: int) -> Dict[str, Any]:
+    """تشغيل نسخة جديدة من التطبيق لكل مستوى تزامن حتى تكون ذروة الذاكرة خاصة به"""
+    level_dir = os.path.join(work_dir, f"api-{level}")
+    os.makedirs(level_dir)
+    # التطبيق يقرأ static/ ويكتب uploads/ نسبةً إلى مجلد العمل
+    os.symlink(os.path.join(REPO_DIR, "static"), os.path.join(level_dir, "static"))
+    files = []
+    for i in range(args.requests):
+        path = os.path.join(level_dir, f"bench-{level}-{i}.pdf")
+        make_pdf(path, args.pages, args.file_kb, f"api-{level}-{i}-{time.time_ns()}")
+        files.append(path)
+
+    port = free_port()
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", REPO_DIR,
+           "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    app = Service(cmd, level_dir, base_env(args, server_url), f"http://127.0.0.1:{port}/metrics",
+                  os.path.join(work_dir, f"app-{level}.log")).start()
+    upstream_stats(server_url, reset=True)
+    try:
+        outcome = asyncio.run(drive_api(f"http://127.0.0.1:{port}", files, level))
+    finally:
+        peak_rss = app.stop()
+    ok = outcome["status_codes"].get("200", 0)
+    return summarize("api", level, len(files), ok, ok * args.pages, outcome["wall_seconds"],
+                     outcome["latencies"], peak_rss,
+                     {"status_codes": outcome["status_codes"], "upstream": upstream_stats(server_url)})
+
+
+def run_batch(args, server_url: str, work_dir: str, workers: int) -> Dict[str, Any]:
+    """تشغيل BatchPdfConv.py على مجلد جديد من الملفات بعدد العمال المحدد"""
+    level_dir = os.path.join(work_dir, f"batch-{workers}")
+    doc_dir = os.path.join(level_dir, "docs_import")
+    os.makedirs(doc_dir)
+    for i in range(args.requests):
+        make_pdf(os.path.join(doc_dir, f"bench-{i}.pdf"), args.pages, args.file_kb,
+                 f"batch-{workers}-{i}-{time.time_ns()}")
+
+    cmd = [sys.executable, os.path.join(REPO_DIR, "BatchPdfConv.py"),
+           "--workers", str(workers), "--rps", str(args.batch_rps)]
+    upstream_stats(server_url, reset=True)
+    started = time.perf_counter()
+    batch = Service(cmd, level_dir, base_env(args, server_url),
+                    log_path=os.path.join(work_dir, f"batch-{workers}.log")).start()
+    peak_rss = batch.wait()
+    wall = time.perf_counter() - started
+
+    export_dir = os.path.join(level_dir, "docs_exports")
+    ok = len(os.listdir(export_dir)) if os.path.isdir(export_dir) else 0
+    # BatchPdfConv لا يعرض زمن كل ملف؛ متوسط الزمن لكل ملف يُقدّر من الإنتاجية
+    return summarize("batch", workers, args.requests, ok, ok * args.pages, wall, [], peak_rss,
+                     {"exit_code": batch.proc.returncode, "upstream": upstream_stats(server_url)})
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[str]:
+    """إرجاع وصف لكل مقياس تراجع بأكثر من threshold مقارنة بخط الأساس"""
+    previous = {(r["target"], r["concurrency"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get((result["target"], result["concurrency"]))
+        if old is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            new_value, old_value = result.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            if (change < -threshold) if higher_is_better else (change > threshold):
+                regressions.append(f"{result['target']} c={result['concurrency']} {metric}: "
+                                   f"{old_value} -> {new_value} ({change:+.0%})")
+    return regressions
+
+
+def print_table(results: List[Dict[str, Any]]):
+    header = f"{'target':<7}{'conc':>5}{'ok':>6}{'fail':>6}{'req/s':>9}{'pages/s':>9}" \
+             f"{'p50':>8}{'p90':>8}{'p99':>8}{'rss MB':>9}"
+    print(header)
+    print("-" * len(header))
+
+    def fmt(value, width):
+        return f"{'-' if value is None else value:>{width}}"
+
+    for r in results:
+        print(f"{r['target']:<7}{r['concurrency']:>5}{r['ok']:>6}{r['failed']:>6}"
+              f"{fmt(r['throughput_rps'], 9)}{fmt(r['pages_per_second'], 9)}"
+              f"{fmt(r['latency_p50'], 8)}{fmt(r['latency_p90'], 8)}{fmt(r['latency_p99'], 8)}"
+              f"{fmt(r['peak_rss_mb'], 9)}")
+
+
+def baseline_path(name: str) -> str:
+    return name if name.endswith(".json") else os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="اختبار أداء خط OCR مقابل خادم Mistral بديل")
+    parser.add_argument("--target", choices=["api", "batch", "all"], default="all")
+    parser.add_argument("--concurrency", default="1,4,16",
+                        help="مستويات التزامن مفصولة بفواصل (عملاء لـ api، عمال لـ batch)")
+    parser.add_argument("--requests", type=int, default=40, help="عدد المستندات لكل مستوى")
+    parser.add_argument("--pages", type=int, default=3, help="عدد صفحات كل PDF مولد")
+    parser.add_argument("--file-kb", type=int, default=200, help="الحجم التقريبي لكل PDF بالكيلوبايت")
+    parser.add_argument("--upload-mode", choices=["inline", "files"], default="inline")
+    parser.add_argument("--batch-rps", type=float, default=1000, help="قيمة --rps لـ BatchPdfConv")
+    parser.add_argument("--latency", default="lognormal:0.5,0.3")
+    parser.add_argument("--latency-per-page", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="حفظ النتائج في ملف JSON")
+    parser.add_argument("--save-baseline", metavar="NAME", default=None,
+                        help="حفظ النتائج كخط أساس في bench/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", default=None,
+                        help="مقارنة النتائج بخط أساس محفوظ والخروج برمز 1 عند التراجع")
+    parser.add_argument("--threshold", type=float, default=0.10, help="نسبة التراجع المسموحة (افتراضياً 10%%)")
+    parser.add_argument("--keep", action="store_true", help="الإبقاء على مجلد العمل المؤقت والسجلات")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+    targets = ["api", "batch"] if args.target == "all" else [args.target]
+
+    work_dir = tempfile.mkdtemp(prefix="ocr-bench-")
+    print(f"مجلد العمل: {work_dir}")
+    server = fake_server(args, work_dir)
+    results = []
+    try:
+        for target in targets:
+            for level in levels:
+                print(f"تشغيل {target} بتزامن {level}...", flush=True)
+                run = run_api if target == "api" else run_batch
+                results.append(run(args, server.url, work_dir, level))
+    finally:
+        server.stop()
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print()
+    print_table(results)
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "host": {"python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count()},
+        "config": {k: v for k, v in vars(args).items()
+                   if k not in ("output", "save_baseline", "compare", "keep")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        path = baseline_path(args.save_baseline)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nتم حفظ خط الأساس: {path}")
+    if args.compare:
+        with open(baseline_path(args.compare), encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("\nتحذير: إعدادات التشغيل تختلف عن خط الأساس؛ المقارنة قد لا تكون دقيقة.")
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\nتراجع مقارنة بـ {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nلا تراجع مقارنة بـ {args.compare} (الحد {args.threshold:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,15 @@
-import base64
-from mistralai import Mistral
+import os
 
-with open("document.pdf", "rb") as f:
-    pdf_bytes = f.read()
+from mistral_client import get_client
+from ocr_encoding import data_url_from_file
 
-b64 = base64.b64encode(pdf_bytes).decode()
-client = Mistral(api_key="97ZQlsV45YrDusgZRwjArWGbh3nerFPb")
+client = get_client(os.environ["MISTRAL_API_KEY"])
 
 resp = client.ocr.process(
     model="mistral-ocr-latest",
     document={
         "type": "document_url",
-        "document_url": f"data:application/pdf;base64,{b64}"
+        "document_url": data_url_from_file("document.pdf", "application/pdf")
     },
     include_image_base64=True,
 )
@@ -0,0 +1,111 @@
+"""
+تجهيز الصور قبل إرسالها إلى OCR: تصغير، تدوير حسب EXIF، تدرج رمادي، وإعادة ضغط
+
+صور الهواتف (12 ميغابكسل وأكثر) لا تحتاج كل هذه الدقة لاستخراج النص، فيُحدّ
+الضلع الأطول بما يعادل دقة مسح محددة (DPI) لصفحة A4، مما يقلل حجم الطلب
+وزمن رفعه دون التأثير على جودة التعرف.
+"""
+import io
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# إعدادات التجهيز (قابلة للتعديل عبر متغيرات البيئة)
+OCR_IMAGE_PREPROCESS = os.getenv("OCR_IMAGE_PREPROCESS", "true").lower() in ("1", "true", "yes")
+OCR_IMAGE_DPI = int(os.getenv("OCR_IMAGE_DPI", "200"))
+OCR_IMAGE_GRAYSCALE = os.getenv("OCR_IMAGE_GRAYSCALE", "true").lower() in ("1", "true", "yes")
+OCR_IMAGE_JPEG_QUALITY = int(os.getenv("OCR_IMAGE_JPEG_QUALITY", "85"))
+OCR_IMAGE_WORKERS = int(os.getenv("OCR_IMAGE_WORKERS", "2"))
+
+# الضلع الأطول لصفحة A4 بالبوصة
+PAGE_LONG_EDGE_INCHES = 11.69
+# وسم اتجاه الصورة في EXIF (1 = الاتجاه الطبيعي)
+EXIF_ORIENTATION = 0x0112
+
+
+def max_edge_for_dpi(dpi: int) -> int:
+    """أقصى طول للضلع الأطول بالبكسل يعادل مسح صفحة A4 بدقة dpi"""
+    return int(dpi * PAGE_LONG_EDGE_INCHES)
+
+
+def preprocess_image(file_path: str, dpi: int = OCR_IMAGE_DPI, grayscale: bool = OCR_IMAGE_GRAYSCALE,
+                     jpeg_quality: int = OCR_IMAGE_JPEG_QUALITY) -> Tuple[Optional[bytes], str]:
+    """
+    تجهيز صورة وإرجاع (البايتات، نوع MIME).
+
+    تُرجع None بدلاً من البايتات إذا لم يكن الناتج أصغر من الملف الأصلي،
+    ليُرسل الأصل كما هو، إلا إذا كان للصورة وسم اتجاه EXIF: الأصل يصل إلى OCR
+    مائلاً، فيُرسل الناتج المدوّر دائماً. تعمل في عملية منفصلة فلا تعتمد على حالة التطبيق.
+    """
+    original_size = os.path.getsize(file_path)
+    with Image.open(file_path) as source:
+        source_format = source.format
+        rotated = source.getexif().get(EXIF_ORIENTATION, 1) != 1
+        # تطبيق اتجاه EXIF على البكسلات ثم إسقاط EXIF عند الحفظ
+        image = ImageOps.exif_transpose(source)
+
+        max_edge = max_edge_for_dpi(dpi)
+        if max(image.size) > max_edge:
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        if grayscale:
+            image = image.convert("L")
+        elif image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        output = io.BytesIO()
+        if source_format == "PNG":
+            # لقطات الشاشة والمستندات الممسوحة تنضغط بـ PNG أفضل من JPEG
+            image.save(output, format="PNG", optimize=True)
+            mime_type = "image/png"
+        else:
+            image.save(output, format="JPEG", quality=jpeg_quality, optimize=True)
+            mime_type = "image/jpeg"
+
+    data = output.getvalue()
+    if len(data) >= original_size and not rotated:
+        return None, mime_type
+    return data, mime_type
+
+
+class ImagePreprocessor:
+    """تشغيل preprocess_image في مجمع عمليات حتى لا يُشغل المعالج حلقة الأحداث"""
+
+    def __init__(self, enabled: bool = OCR_IMAGE_PREPROCESS, workers: int = OCR_IMAGE_WORKERS):
+        self.enabled = enabled
+        self.workers = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def run(self, file_path: str) -> Tuple[Optional[bytes], str]:
+        """تجهيز الصورة وتسجيل الحجم قبل وبعد. عند الفشل تُرجع None ليُرسل الأصل"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        original_size = os.path.getsize(file_path)
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            data, mime_type = await loop.run_in_executor(self._executor, preprocess_image, file_path)
+        except Exception as e:
+            logger.warning(f"تعذر تجهيز الصورة {file_path}، سيُرسل الأصل: {e}")
+            return None, ""
+
+        elapsed = (time.perf_counter() - started) * 1000
+        if data is None:
+            logger.info(f"تجهيز الصورة: {original_size} بايت، لا تحسن في الحجم ({elapsed:.0f} ms)")
+        else:
+            ratio = 100 * len(data) / original_size
+            logger.info(f"تجهيز الصورة: من {original_size} إلى {len(data)} بايت ({ratio:.0f}%، {elapsed:.0f} ms)")
+        return data, mime_type
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,224 @@
+"""
+مجمع مفاتيح Mistral API بميزانية معدل مستقلة لكل مفتاح وتحويل تلقائي عند الفشل
+
+- لكل مفتاح دلو رموز (طلبات في الثانية) وحد للطلبات المتزامنة
+- يُوجَّه كل استدعاء إلى المفتاح السليم الأقل حملاً
+- المفتاح الذي يُرجع 401 أو 429 يُستبعد مؤقتاً ويُعاد الاستدعاء على مفتاح آخر
+
+الإعداد عبر MISTRAL_API_KEYS (مفصولة بفواصل)، ولكل مفتاح حدود اختيارية:
+    MISTRAL_API_KEYS="key1:5:8,key2:2"   # المفتاح:طلبات في الثانية:حد التزامن
+وإذا لم يُحدد يُستخدم MISTRAL_API_KEY وحده بالحدود الافتراضية.
+
+مع SharedState (عدة عمال) يكون دلو الرموز وحالة الاستبعاد لكل مفتاح مشتركين
+بين العمال، بينما حد التزامن يبقى لكل عامل.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+
+from mistral_client import get_client
+from rate_limit import TokenBucket, error_status_code, retry_after_seconds
+
+if TYPE_CHECKING:
+    from shared_state import SharedState
+
+logger = logging.getLogger(__name__)
+
+# إعدادات المجمع (قابلة للتعديل عبر متغيرات البيئة)
+MISTRAL_KEY_RPS = float(os.getenv("MISTRAL_KEY_RPS", "5"))
+MISTRAL_KEY_MAX_IN_FLIGHT = int(os.getenv("MISTRAL_KEY_MAX_IN_FLIGHT", "8"))
+# مدة استبعاد مفتاح أرجع 401 (بالثواني)
+MISTRAL_KEY_UNAUTHORIZED_EJECT = float(os.getenv("MISTRAL_KEY_UNAUTHORIZED_EJECT", "600"))
+MISTRAL_KEY_MAX_BACKOFF = float(os.getenv("MISTRAL_KEY_MAX_BACKOFF", "60"))
+# أقصى انتظار لمفتاح متاح قبل رفع KeyPoolExhausted
+MISTRAL_KEY_WAIT_TIMEOUT = float(os.getenv("MISTRAL_KEY_WAIT_TIMEOUT", "30"))
+
+PLACEHOLDER_KEY = "your_mistral_api_key_here"
+
+
+class KeyPoolExhausted(Exception):
+    """لا يوجد مفتاح متاح خلال مهلة الانتظار (كل المفاتيح مستبعدة أو مشغولة)"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+class ApiKey:
+    """مفتاح واحد مع ميزانيته وحالته الصحية"""
+
+    def __init__(self, key: str, rps: float = MISTRAL_KEY_RPS, max_in_flight: int = MISTRAL_KEY_MAX_IN_FLIGHT):
+        self.key = key
+        # معرّف الحالة المشتركة (لا يُخزن المفتاح نفسه في الملف)
+        self.id = hashlib.sha256(key.encode()).hexdigest()[:16]
+        self.label = f"...{key[-4:]}" if len(key) > 8 else "***"
+        self.rps = rps
+        self.max_in_flight = max(1, max_in_flight)
+        self.bucket = TokenBucket(rps)
+        self.in_flight = 0
+        self.ejected_until = 0.0
+        self.ejected_reason = ""
+        self.backoff = 1.0
+        self.last_used = 0.0
+        self.counters = {"requests": 0, "errors": 0, "unauthorized": 0, "rate_limited": 0}
+        self._client: Any = None
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            self._client = get_client(self.key)
+        return self._client
+
+    def load(self) -> tuple:
+        # عند تساوي الحمل يُفضَّل المفتاح الأقدم استخداماً فتتوزع الطلبات المتتالية
+        return self.in_flight / self.max_in_flight, self.last_used
+
+
+def parse_keys(value: str) -> List[ApiKey]:
+    """تحويل "key1:5:8,key2" إلى قائمة ApiKey"""
+    keys = []
+    for entry in value.replace("\n", ",").split(","):
+        parts = [part.strip() for part in entry.strip().split(":")]
+        if not parts[0] or parts[0] == PLACEHOLDER_KEY:
+            continue
+        rps = float(parts[1]) if len(parts) > 1 and parts[1] else MISTRAL_KEY_RPS
+        max_in_flight = int(parts[2]) if len(parts) > 2 and parts[2] else MISTRAL_KEY_MAX_IN_FLIGHT
+        keys.append(ApiKey(parts[0], rps, max_in_flight))
+    return keys
+
+
+class KeyPool:
+    """توزيع الاستدعاءات على عدة مفاتيح (آمن للخيوط)"""
+
+    def __init__(self, keys: List[ApiKey], wait_timeout: float = MISTRAL_KEY_WAIT_TIMEOUT,
+                 shared: Optional["SharedState"] = None):
+        self.keys = keys
+        self.wait_timeout = wait_timeout
+        self.shared = shared
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_env(cls, shared: Optional["SharedState"] = None) -> "KeyPool":
+        value = os.getenv("MISTRAL_API_KEYS") or os.getenv("MISTRAL_API_KEY") or ""
+        return cls(parse_keys(value), shared=shared)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def acquire(self, timeout: Optional[float] = None) -> ApiKey:
+        """
+        حجز المفتاح السليم الأقل حملاً الذي لديه رمز متاح، مع الانتظار حتى
+        timeout. يرفع KeyPoolExhausted إذا لم يتوفر مفتاح خلال المهلة.
+        """
+        if not self.keys:
+            raise KeyPoolExhausted("لم يتم إعداد أي مفتاح Mistral API", 60)
+        timeout = self.wait_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self.shared is not None:
+                    self._sync_ejections(now)
+                healthy = [k for k in self.keys if k.ejected_until <= now]
+                if not healthy:
+                    wait = min(k.ejected_until for k in self.keys) - now
+                    if now + wait > deadline:
+                        reasons = ", ".join(f"{k.label}: {k.ejected_reason}" for k in self.keys)
+                        raise KeyPoolExhausted(f"كل مفاتيح Mistral API مستبعدة مؤقتاً ({reasons})", wait)
+                    self._cond.wait(wait)
+                    continue
+
+                wait = None
+                for key in sorted(healthy, key=ApiKey.load):
+                    if key.in_flight >= key.max_in_flight:
+                        continue
+                    token_wait = self._take_token(key)
+                    if token_wait == 0:
+                        key.in_flight += 1
+                        key.last_used = now
+                        key.counters["requests"] += 1
+                        return key
+                    wait = token_wait if wait is None else min(wait, token_wait)
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise KeyPoolExhausted("كل مفاتيح Mistral API مشغولة", wait or 1)
+                # ينتظر رمزاً أو تحرير مقعد (release تُنبّه الانتظار)
+                self._cond.wait(min(wait or remaining, remaining))
+
+    def release(self, key: ApiKey, error: Optional[Exception] = None):
+        """تحرير المفتاح وتحديث حالته الصحية حسب نتيجة الاستدعاء"""
+        with self._cond:
+            key.in_flight -= 1
+            status = error_status_code(error) if error is not None else None
+            if error is None:
+                key.backoff = 1.0
+            elif status == 401:
+                key.counters["unauthorized"] += 1
+                self._eject(key, MISTRAL_KEY_UNAUTHORIZED_EJECT, "401")
+            elif status == 429:
+                key.counters["rate_limited"] += 1
+                delay = retry_after_seconds(error) or key.backoff
+                key.backoff = min(MISTRAL_KEY_MAX_BACKOFF, key.backoff * 2)
+                self._eject(key, delay, "429")
+            else:
+                key.counters["errors"] += 1
+            self._cond.notify_all()
+
+    def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        استدعاء func(client, *args, **kwargs) بمفتاح من المجمع. عند 401 أو 429
+        يُعاد الاستدعاء على مفتاح آخر (مرة واحدة لكل مفتاح على الأكثر).
+        """
+        attempts = 0
+        while True:
+            key = self.acquire()
+            attempts += 1
+            try:
+                result = func(key.client, *args, **kwargs)
+            except Exception as e:
+                self.release(key, e)
+                if error_status_code(e) in (401, 429) and attempts < len(self.keys):
+                    logger.warning(f"المفتاح {key.label} أرجع {error_status_code(e)}، التحويل إلى مفتاح آخر")
+                    continue
+                raise
+            self.release(key)
+            return result
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._cond:
+            return [{
+                "key": key.label,
+                "in_flight": key.in_flight,
+                "max_in_flight": key.max_in_flight,
+                "rps": key.rps,
+                "ejected_seconds": round(max(0.0, key.ejected_until - now), 1),
+                "ejected_reason": key.ejected_reason if key.ejected_until > now else "",
+                **key.counters,
+            } for key in self.keys]
+
+    def _take_token(self, key: ApiKey) -> float:
+        if self.shared is not None:
+            return self.shared.take_token(key.id, key.rps, key.bucket.capacity)
+        return key.bucket.try_acquire()
+
+    def _sync_ejections(self, now: float):
+        """تطبيق الاستبعادات التي سجلها عمال آخرون"""
+        ejections = self.shared.key_ejections()
+        for key in self.keys:
+            if key.id in ejections:
+                remaining, reason = ejections[key.id]
+                if now + remaining > key.ejected_until:
+                    key.ejected_until = now + remaining
+                    key.ejected_reason = reason
+
+    def _eject(self, key: ApiKey, seconds: float, reason: str):
+        key.ejected_until = time.monotonic() + seconds
+        key.ejected_reason = reason
+        if self.shared is not None:
+            self.shared.eject_key(key.id, seconds, reason)
+        logger.warning(f"استبعاد المفتاح {key.label} لمدة {seconds:.0f} ثانية ({reason})")
@@ -1,137 +1,538 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, Response
 import uvicorn
 import os
-import base64
+import re
 import json
 import asyncio
-from typing import Optional, Dict, Any
+import hashlib
+import time
+import zipfile
+import threading
+import aiofiles
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, Callable, AsyncIterator, BinaryIO, List, Tuple
 import logging
 from dotenv import load_dotenv
-from mistralai import Mistral
-from PIL import Image
-import io
 
-# تحميل متغيرات البيئة
+# تحميل متغيرات البيئة (قبل استيراد الوحدات التي تقرأ إعداداتها منها)
 load_dotenv()
 
+from mistral_client import close_clients
+from key_pool import KeyPool, KeyPoolExhausted
+from ocr_pool import OCRWorkerPool, OCRPoolFull
+from ocr_cache import OCRCache, hash_file
+from pdf_split import (split_pdf, split_pdf_pages, offset_pages, merge_pages, count_pdf_pages,
+                       OCR_PDF_CHUNK_PAGES, OCR_PDF_CHUNK_CONCURRENCY, OCR_PDF_CHUNK_RETRIES,
+                       OCR_STREAM_CHUNK_PAGES)
+from pdf_text import split_text_layer, OCR_NATIVE_TEXT, PDF_PAGE_SOURCE
+from rate_limit import error_status_code, is_retryable, retry_delay
+from ocr_encoding import ocr_process, mime_type_for
+from image_preprocess import ImagePreprocessor
+from static_pages import StaticPages
+from single_flight import SingleFlight
+from shared_state import SharedState, OCR_SHARED_DB
+from work_queue import worker_id
+from search_index import SearchIndex, OCR_SEARCH_DB
+from upload_store import UploadStore, UploadQuotaExceeded
+from batch_zip import (ZipStream, is_zip_upload, safe_entry_path, markdown_path, export_markdown,
+                       SUPPORTED_EXTENSIONS, OCR_BATCH_MAX_FILES, OCR_BATCH_CONCURRENCY)
+import batch_zip
+from ocr_jobs import JobStore, JobRunner, JobQueueFull, COMPLETED, FAILED
+from response_stream import (join_pages, negotiate_encoding, ordered_pages, encode_pages, sse_event,
+                             MEDIA_TYPES)
+import metrics
+from metrics import (UPLOAD_BYTES, UPLOAD_SECONDS, PREPROCESS_SECONDS, ENCODE_SECONDS, API_SECONDS,
+                     PAGES, EXTRACT_SECONDS, RESPONSE_BYTES, REQUEST_SECONDS, MOCK_FALLBACKS,
+                     UNAUTHORIZED, RETRIES, ERRORS, REJECTED, KEYS_EXHAUSTED, IN_FLIGHT,
+                     TEXT_LAYER_SECONDS, PDF_PAGE_SOURCES, COALESCED)
+
 # إعداد التسجيل
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# إعداد Mistral AI
-MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
-if not MISTRAL_API_KEY or MISTRAL_API_KEY == "your_mistral_api_key_here":
-    logger.warning("MISTRAL_API_KEY غير محدد أو غير صحيح. سيتم استخدام وضع المحاكاة للاختبار.")
-    MISTRAL_API_KEY = None
-    client = None
-else:
-    client = Mistral(api_key=MISTRAL_API_KEY)
+# التسجيل التشخيصي المكلف (بنية الاستجابة، كل صفحة) يعمل فقط في وضع التصحيح
+DEBUG = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+
+# وضع المحاكاة صريح: نتائج ثابتة دون استدعاء API (للتطوير والعروض فقط)
+OCR_MOCK_MODE = os.getenv("OCR_MOCK_MODE", "false").lower() in ("1", "true", "yes")
+
+# حالة مشتركة بين عمال الخادم (uvicorn --workers N): أقفال OCR لكل محتوى،
+# عدد الرفعات، وميزانيات المفاتيح. بدون OCR_SHARED_DB تبقى داخل العملية
+shared_state = SharedState(OCR_SHARED_DB) if OCR_SHARED_DB else None
+
+# إعداد Mistral AI: مجمع مفاتيح (MISTRAL_API_KEYS أو MISTRAL_API_KEY) لكل منها
+# ميزانية معدل وعميل مشترك بمجمع اتصالات دائم (keep-alive)
+key_pool = KeyPool.from_env(shared_state)
+if OCR_MOCK_MODE:
+    logger.warning("OCR_MOCK_MODE مفعل: كل طلبات OCR تُرجع نتائج محاكاة.")
+elif not key_pool:
+    logger.warning("لم يتم إعداد MISTRAL_API_KEY أو MISTRAL_API_KEYS: طلبات OCR سترجع 503 "
+                   "(لتجربة الواجهة دون مفتاح فعّل OCR_MOCK_MODE=true).")
+
+OCR_MODEL = "mistral-ocr-latest"
+
+# مجمع العمال المحدود لاستدعاءات OCR (حتى لا تتوقف حلقة الأحداث)
+ocr_pool = OCRWorkerPool()
+
+# التخزين المؤقت لنتائج OCR حسب بصمة الملف
+ocr_cache = OCRCache()
+
+# مقاييس لحظية تُقرأ من المجمع والتخزين المؤقت عند كل طلب لـ /metrics
+POOL_STATE = metrics.gauge("ocr_pool_state", "حالة مجمع عمال OCR", ["state"])
+CACHE_EVENTS = metrics.gauge("ocr_cache_events", "عدادات التخزين المؤقت لنتائج OCR", ["event"])
+UPLOAD_STATE = metrics.gauge("ocr_upload_store", "المساحة المستخدمة للملفات المرفوعة وعدادات التنظيف", ["field"])
+KEY_STATE = metrics.gauge("mistral_key_state", "حالة كل مفتاح في مجمع المفاتيح", ["key", "field"])
+
+def collect_runtime_metrics():
+    for state, value in ocr_pool.stats().items():
+        POOL_STATE.set(value, state=state)
+    for event, value in ocr_cache.stats().items():
+        CACHE_EVENTS.set(value, event=event)
+    for field, value in upload_store.stats().items():
+        UPLOAD_STATE.set(value, field=field)
+    for stats in key_pool.stats():
+        for field in ("in_flight", "ejected_seconds", "requests", "errors", "unauthorized", "rate_limited"):
+            KEY_STATE.set(stats[field], key=stats["key"], field=field)
+
+metrics.REGISTRY.add_collector(collect_runtime_metrics)
+
+def file_type_of(file_path: str) -> str:
+    """تسمية نوع الملف في المقاييس"""
+    return "pdf" if file_path.lower().endswith(".pdf") else "image"
+
+# تجهيز الصور (تصغير وتدرج رمادي) في مجمع عمليات قبل الإرسال
+image_preprocessor = ImagePreprocessor()
+
+# فهرس البحث في نتائج BatchPdfConv (docs_exports)
+search_index = SearchIndex(OCR_SEARCH_DB) if OCR_SEARCH_DB else None
+
+# مخزن حالة مهام OCR غير المتزامنة
+job_store = JobStore()
+job_runner: Optional[JobRunner] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """تهيئة الموارد عند بدء التشغيل وتحريرها عند الإيقاف"""
+    global job_runner
+    # مهام بقيت منتظرة أو جارية من تشغيل سابق لن ينفذها أحد
+    recovered = await asyncio.to_thread(job_store.recover)
+    if recovered:
+        logger.warning(f"{recovered} مهمة لم تكتمل قبل إعادة التشغيل عُلّمت فاشلة")
+    job_runner = JobRunner(job_store, run_ocr_job)
+    job_runner.start()
+    if shared_state is not None:
+        # أقفال OCR الجارية تُجدد حتى لا ينتهي قفل عملية أطول من OCR_FLIGHT_TTL
+        shared_state.start_keeper()
+    # الملف الذي يجري OCR لمحتواه لا يُحذف حتى لو تجاوز مدة الاحتفاظ
+    janitor = asyncio.create_task(upload_store.run_janitor(is_active=upload_in_use, on_reap=clear_upload_ref))
+    yield
+    janitor.cancel()
+    await job_runner.stop()
+    ocr_pool.shutdown()
+    image_preprocessor.shutdown()
+    close_clients()
+    ocr_cache.close()
+    job_store.close()
+    if shared_state is not None:
+        shared_state.close()
+    if search_index is not None:
+        search_index.close()
 
 app = FastAPI(
     title="Arabic OCR Web Application",
     description="تطبيق OCR احترافي يدعم العربية والإنجليزية",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # إعداد الملفات الثابتة
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# مجلد للملفات المؤقتة
-UPLOAD_DIR = "uploads"
-if not os.path.exists(UPLOAD_DIR):
-    os.makedirs(UPLOAD_DIR)
+# الملفات المرفوعة: مجلدات فرعية حسب البصمة، حصة مساحة، وتنظيف دوري لما لم يُعالج
+upload_store = UploadStore()
+
+# الحد الأقصى لحجم الملف المرفوع وحجم الدفعة عند الكتابة
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "200"))
+MAX_UPLOAD_BYTES = int(MAX_UPLOAD_MB * 1024 * 1024)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# الملفات المرفوعة تُحفظ باسم مشتق من محتواها (<sha256>.<ext>): رفع الملف نفسه
+# مرتين يشير إلى النسخة نفسها، ورفع ملفين مختلفين بالاسم نفسه لا يتداخلان
+UPLOAD_EXTENSIONS = {"application/pdf": ".pdf", "image/png": ".png", "image/jpeg": ".jpg", "image/jpg": ".jpg"}
+UPLOAD_NAME = re.compile(r"^[0-9a-f]{64}\.(pdf|png|jpg|jpeg)$")
+
+# عدد الرفعات التي لم تُعالج بعد لكل ملف: يُحذف الملف بعد معالجة آخرها
+# (في shared_state عند تعدد العمال، فقد يُرفع الملف على عامل ويُعالج على آخر)
+# الدوال أدناه متزامنة (قاعدة SQLite في الوضع المشترك، أو قاموس يُعدّل من خيوط
+# الدفعات)، فتُستدعى من حلقة الأحداث عبر asyncio.to_thread
+upload_refs: Dict[str, int] = {}
+upload_refs_lock = threading.Lock()
+
+# عمليات OCR الجارية حسب بصمة المحتوى (الطلبات المتزامنة لنفس الملف تشترك فيها)
+ocr_flights = SingleFlight()
+
+# مدة انتظار تحرير قفل OCR الذي يحجزه عامل آخر قبل إعادة المحاولة
+FLIGHT_POLL_SECONDS = 0.25
+
+def add_upload_ref(filename: str):
+    if shared_state is not None:
+        shared_state.add_upload_ref(filename)
+        return
+    with upload_refs_lock:
+        upload_refs[filename] = upload_refs.get(filename, 0) + 1
+
+def clear_upload_ref(filename: str):
+    """نسيان رفعات ملف حذفه التنظيف"""
+    if shared_state is not None:
+        shared_state.clear_upload_ref(filename)
+        return
+    with upload_refs_lock:
+        upload_refs.pop(filename, None)
+
+def drop_upload_ref(filename: str) -> int:
+    """إنقاص عدد رفعات الملف؛ تُرجع المتبقي (0: لا أحد ينتظره)"""
+    if shared_state is not None:
+        return shared_state.drop_upload_ref(filename)
+    with upload_refs_lock:
+        refs = upload_refs.pop(filename, 0) - 1
+        if refs > 0:
+            upload_refs[filename] = refs
+            return refs
+        return 0
+
+def upload_in_use(filename: str) -> bool:
+    """هل يجري OCR لمحتوى هذا الملف، في هذا العامل أو بقفل يحجزه عامل آخر؟"""
+    file_hash = filename[:64]
+    if ocr_flights.get(file_hash) is not None:
+        return True
+    return shared_state is not None and shared_state.claimed(file_hash)
+
+@asynccontextmanager
+async def cross_process_flight(file_hash: str, file_type: str):
+    """
+    قفل OCR لهذا المحتوى بين عمال الخادم: إذا كان عامل آخر يعالجه يُنتظر حتى
+    ينتهي، ثم يجد المستدعي النتيجة في التخزين المؤقت المشترك.
+    """
+    if shared_state is None:
+        yield
+        return
+    owner = worker_id()
+    waited = False
+    while not await asyncio.to_thread(shared_state.claim, file_hash, owner):
+        if not waited:
+            waited = True
+            COALESCED.inc(file_type=file_type)
+            logger.info(f"OCR لنفس المحتوى جارٍ في عامل آخر، بانتظار نتيجته ({file_hash[:12]})")
+        await asyncio.sleep(FLIGHT_POLL_SECONDS)
+    try:
+        yield
+    finally:
+        await asyncio.to_thread(shared_state.release, file_hash, owner)
+
+def find_upload(filename: str) -> Optional[str]:
+    """مسار ملف مرفوع من اسمه المُرجع من /api/upload، مع تجديد وقت استخدامه حتى لا يحذفه التنظيف"""
+    file_path = upload_store.path_for(filename) if UPLOAD_NAME.match(filename) else None
+    if file_path is not None:
+        upload_store.touch(file_path)
+    return file_path
+
+def upload_path(filename: str) -> str:
+    """مثل find_upload مع 404 إذا كان الاسم غير صالح أو الملف غير موجود"""
+    file_path = find_upload(filename)
+    if file_path is None:
+        raise HTTPException(status_code=404, detail="الملف غير موجود")
+    return file_path
+
+def upload_hash(file_path: str) -> Optional[str]:
+    """بصمة الملف من اسمه إن كان مسمى بمحتواه"""
+    name = os.path.basename(file_path)
+    return name[:64] if UPLOAD_NAME.match(name) else None
+
+# الصفحات والأصول الثابتة تُقدم من الذاكرة بنسخ مضغوطة مسبقاً و ETag
+static_pages = StaticPages("static")
+for url in ("/landing.html", "/index.html", "/about.html", "/privacy.html"):
+    static_pages.add(url, url.lstrip("/"), "text/html; charset=utf-8")
+static_pages.add("/tansees_logo.svg", "tansees_logo.svg", "image/svg+xml", versioned=True)
+static_pages.add("/owwwais_logo.svg", "owwwais_logo.svg", "image/svg+xml", versioned=True)
+static_pages.add("/sw.js", "sw.js", "application/javascript")
+static_pages.load()
 
 @app.get("/", response_class=HTMLResponse)
-async def read_root():
+async def read_root(request: Request):
     """الصفحة الرئيسية للتطبيق - توجيه إلى صفحة الهبوط"""
-    with open("static/landing.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    return static_pages.response("/landing.html", request)
 
 @app.get("/landing.html", response_class=HTMLResponse)
-async def landing_page():
+async def landing_page(request: Request):
     """صفحة الهبوط"""
-    with open("static/landing.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    return static_pages.response("/landing.html", request)
 
 @app.get("/index.html", response_class=HTMLResponse)
-async def app_page():
+async def app_page(request: Request):
     """صفحة التطبيق الرئيسية"""
-    with open("static/index.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    return static_pages.response("/index.html", request)
 
 @app.get("/about.html", response_class=HTMLResponse)
-async def about_page():
+async def about_page(request: Request):
     """صفحة من نحن"""
-    with open("static/about.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    return static_pages.response("/about.html", request)
 
 @app.get("/privacy.html", response_class=HTMLResponse)
-async def privacy_page():
+async def privacy_page(request: Request):
     """صفحة سياسة الخصوصية"""
-    with open("static/privacy.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    return static_pages.response("/privacy.html", request)
 
 @app.get("/tansees_logo.svg")
-async def tansees_logo():
+async def tansees_logo(request: Request):
     """شعار تنصيص"""
-    from fastapi.responses import FileResponse
-    return FileResponse("static/tansees_logo.svg", media_type="image/svg+xml")
+    return static_pages.response("/tansees_logo.svg", request)
 
 @app.get("/owwwais_logo.svg")
-async def owwwais_logo():
+async def owwwais_logo(request: Request):
     """شعار المطور"""
-    from fastapi.responses import FileResponse
-    return FileResponse("static/owwwais_logo.svg", media_type="image/svg+xml")
+    return static_pages.response("/owwwais_logo.svg", request)
 
 @app.get("/sw.js")
-async def service_worker():
-    """تقديم ملف Service Worker"""
-    from fastapi.responses import FileResponse
-    return FileResponse("static/sw.js", media_type="application/javascript")
+async def service_worker(request: Request):
+    """تقديم ملف Service Worker (يُعاد التحقق منه دائماً حتى تصل تحديثاته)"""
+    return static_pages.response("/sw.js", request)
+
+class UploadTooLarge(Exception):
+    """يُرفع عند تجاوز الملف المرفوع للحد الأقصى المسموح"""
+
+async def save_upload(file: UploadFile, file_path: str) -> tuple:
+    """
+    كتابة الملف المرفوع إلى القرص على دفعات دون تحميله كاملاً في الذاكرة،
+    مع حساب بصمة SHA-256 أثناء الكتابة. تُرجع (الحجم، البصمة).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                await buffer.write(chunk)
+    except BaseException:
+        # حذف الملف الجزئي عند الفشل أو تجاوز الحجم
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+        raise
+    return size, digest.hexdigest()
 
 @app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(request: Request, file: UploadFile = File(...)):
     """رفع ملف للمعالجة"""
     try:
+        # رفض الطلبات الكبيرة مبكراً اعتماداً على Content-Length
+        content_length = request.headers.get("content-length")
+        expected_size = int(content_length) if content_length and content_length.isdigit() else None
+        if expected_size is not None and expected_size > MAX_UPLOAD_BYTES + UPLOAD_CHUNK_SIZE:
+            raise UploadTooLarge()
+        
         # التحقق من نوع الملف
         allowed_types = ["application/pdf", "image/png", "image/jpeg", "image/jpg"]
         if file.content_type not in allowed_types:
             raise HTTPException(status_code=400, detail="نوع الملف غير مدعوم")
         
-        # حفظ الملف
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # حفظ الملف على دفعات في ملف مؤقت (يُحجز له مكان ضمن الحصة)، ثم نقله إلى اسمه المشتق من بصمته
+        temp_path = upload_store.reserve(expected_size)
+        started = time.perf_counter()
+        try:
+            size, file_hash = await save_upload(file, temp_path)
+            filename = file_hash + UPLOAD_EXTENSIONS[file.content_type]
+            upload_store.commit(temp_path, filename, expected_size, size)
+        except BaseException:
+            upload_store.discard(temp_path, expected_size)
+            raise
+        await asyncio.to_thread(add_upload_ref, filename)
+        file_type = "pdf" if file.content_type == "application/pdf" else "image"
+        UPLOAD_SECONDS.observe(time.perf_counter() - started, file_type=file_type)
+        UPLOAD_BYTES.observe(size, file_type=file_type)
         
-        logger.info(f"تم رفع الملف: {file.filename}")
-        return {"filename": file.filename, "status": "uploaded"}
+        logger.info(f"تم رفع الملف: {file.filename} -> {filename} ({size} بايت)")
+        return {"filename": filename, "original_filename": file.filename, "status": "uploaded",
+                "size": size, "sha256": file_hash}
     
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"حجم الملف يتجاوز الحد المسموح ({MAX_UPLOAD_MB:g} ميغابايت)")
+    except UploadQuotaExceeded as e:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(e)},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"خطأ في رفع الملف: {str(e)}")
         raise HTTPException(status_code=500, detail="خطأ في رفع الملف")
 
+def store_file(src: BinaryIO, extension: str, expected_size: Optional[int]) -> Tuple[str, str, int]:
+    """
+    نسخ ملف (مرفوع ضمن دفعة أو من داخل أرشيف ZIP) إلى التخزين على دفعات مع
+    حساب بصمته، مثل /api/upload. تُرجع (الاسم، المسار، الحجم).
+    """
+    temp_path = upload_store.reserve(expected_size)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, "wb") as buffer:
+            for chunk in iter(lambda: src.read(UPLOAD_CHUNK_SIZE), b""):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                buffer.write(chunk)
+        filename = digest.hexdigest() + extension
+        file_path = upload_store.commit(temp_path, filename, expected_size, size)
+    except BaseException:
+        upload_store.discard(temp_path, expected_size)
+        raise
+    add_upload_ref(filename)
+    return filename, file_path, size
+
+def ingest_batch(files: List[UploadFile]) -> List[Dict[str, Any]]:
+    """
+    حفظ ملفات الدفعة (وما في أرشيفات ZIP منها) في التخزين. تُرجع سجلاً لكل
+    ملف بمساره النسبي؛ ما لم يُحفظ يحمل حالته وسببه في البيان.
+    """
+    entries: List[Dict[str, Any]] = []
+    
+    def add(path: str, src: BinaryIO, expected_size: Optional[int]):
+        if len(entries) >= OCR_BATCH_MAX_FILES:
+            raise HTTPException(status_code=400, detail=f"عدد الملفات يتجاوز الحد المسموح ({OCR_BATCH_MAX_FILES})")
+        entry: Dict[str, Any] = {"path": path}
+        entries.append(entry)
+        content_type = SUPPORTED_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if content_type is None:
+            entry.update(status=batch_zip.SKIPPED, error="نوع الملف غير مدعوم")
+            return
+        try:
+            entry["filename"], entry["file_path"], entry["size"] = store_file(
+                src, UPLOAD_EXTENSIONS[content_type], expected_size)
+        except UploadTooLarge:
+            entry.update(status=batch_zip.FAILED, error=f"حجم الملف يتجاوز الحد المسموح ({MAX_UPLOAD_MB:g} ميغابايت)")
+        except (UploadQuotaExceeded, RuntimeError, zipfile.BadZipFile, OSError) as e:
+            entry.update(status=batch_zip.FAILED, error=str(e))
+    
+    try:
+        for upload in files:
+            if is_zip_upload(upload.filename, upload.content_type):
+                try:
+                    with zipfile.ZipFile(upload.file) as archive:
+                        for info in archive.infolist():
+                            path = safe_entry_path(info.filename)
+                            if path is not None:
+                                with archive.open(info) as src:
+                                    add(path, src, info.file_size)
+                except zipfile.BadZipFile:
+                    raise HTTPException(status_code=400, detail=f"أرشيف ZIP غير صالح: {upload.filename}")
+            else:
+                add(safe_entry_path(os.path.basename(upload.filename or "")) or "file", upload.file, upload.size)
+    except BaseException:
+        for entry in entries:
+            if "file_path" in entry:
+                remove_upload(entry["file_path"])
+        raise
+    return entries
+
+async def ocr_pages(file_path: str, file_hash: Optional[str]) -> list:
+    """صفحات نتيجة الملف مرتبة، مع انتظار الدور عند انشغال مجمع العمال"""
+    while True:
+        try:
+            return merge_pages([[page async for page in stream_ocr_pages(file_path, file_hash)]])
+        except OCRPoolFull as e:
+            await asyncio.sleep(e.retry_after)
+
+async def batch_results(entries: List[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """
+    معالجة ملفات الدفعة بالتوازي (OCR_BATCH_CONCURRENCY) وبث أرشيف النتائج:
+    كل مستند يُضاف فور اكتماله، والبيان في النهاية.
+    """
+    archive = ZipStream()
+    used: set = set()
+    semaphore = asyncio.Semaphore(max(1, OCR_BATCH_CONCURRENCY))
+    
+    async def run(entry: Dict[str, Any]):
+        try:
+            async with semaphore:
+                return entry, await ocr_pages(entry["file_path"], upload_hash(entry["file_path"])), None
+        except Exception as e:
+            return entry, None, e
+        finally:
+            await asyncio.to_thread(remove_upload, entry["file_path"])
+    
+    tasks = [asyncio.create_task(run(entry)) for entry in entries if "file_path" in entry]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            entry, pages, error = await next_done
+            if error is not None:
+                logger.error(f"فشلت معالجة {entry['path']} في الدفعة: {error}")
+                entry.update(status=batch_zip.FAILED, error=str(error))
+                continue
+            entry.update(status=batch_zip.COMPLETED, output=markdown_path(entry["path"], used), pages=len(pages))
+            yield archive.add(entry["output"], export_markdown(pages))
+        manifest = [{key: entry.get(key) for key in ("path", "output", "status", "pages", "size", "filename", "error")}
+                    for entry in entries]
+        yield archive.finish(manifest)
+    finally:
+        # انقطاع العميل يلغي ما لم يكتمل (وتُحذف ملفاته)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+@app.post("/api/batch")
+async def process_batch(files: List[UploadFile] = File(...)):
+    """
+    معالجة دفعة ملفات (PDF وصور و/أو أرشيفات ZIP) في طلب واحد. تُحفظ كل الملفات
+    أولاً (المدخلات لا تُبث)، ثم يُبث أرشيف ZIP فيه نتيجة كل مستند بمساره
+    (بامتداد .md) فور اكتمالها، ثم manifest.json بحالة كل ملف.
+    """
+    entries = await asyncio.to_thread(ingest_batch, files)
+    if not entries:
+        raise HTTPException(status_code=400, detail="لا توجد ملفات في الدفعة")
+    logger.info(f"بدء معالجة دفعة من {len(entries)} ملف")
+    return StreamingResponse(
+        batch_results(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="ocr_results.zip"', "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/process-ocr")
-async def process_ocr(filename: str = Form(...)):
-    """معالجة OCR للملف"""
+async def process_ocr(request: Request, filename: str = Form(...),
+                      output_format: str = Form("json", alias="format")):
+    """
+    معالجة OCR للملف.
+
+    format=json (الافتراضي) يُرجع النص كاملاً داخل JSON. format=markdown أو ndjson
+    يبث النتيجة صفحة بصفحة بترتيب المستند (مضغوطة بـ br أو gzip حسب Accept-Encoding).
+    """
     try:
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="الملف غير موجود")
+        file_path = upload_path(filename)
+        if output_format != "json" and output_format not in MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail=f"صيغة غير مدعومة: {output_format}")
         
         logger.info(f"بدء معالجة OCR للملف: {filename}")
         
+        if output_format in MEDIA_TYPES:
+            return await stream_ocr_response(file_path, upload_hash(file_path), output_format,
+                                             negotiate_encoding(request.headers.get("accept-encoding")))
+        
         # معالجة OCR باستخدام Mistral AI
-        extracted_text = await perform_ocr(file_path)
+        extracted_text = await perform_ocr(file_path, upload_hash(file_path))
         
         # تنظيف الملف بعد المعالجة
-        try:
-            os.remove(file_path)
-            logger.info(f"تم حذف الملف المؤقت: {filename}")
-        except Exception as e:
-            logger.warning(f"فشل في حذف الملف المؤقت: {e}")
+        await asyncio.to_thread(remove_upload, file_path)
         
         return {
             "filename": filename,
@@ -140,139 +541,438 @@ async def process_ocr(filename: str = Form(...)):
             "message": "تم استخراج النص بنجاح"
         }
     
+    except HTTPException:
+        raise
+    except (OCRPoolFull, KeyPoolExhausted) as e:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(e)},
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         logger.error(f"خطأ في معالجة OCR: {str(e)}")
         raise HTTPException(status_code=500, detail=f"خطأ في معالجة OCR: {str(e)}")
 
-async def perform_ocr(file_path: str) -> str:
-    """تنفيذ OCR على الملف"""
+async def stream_ocr_response(file_path: str, file_hash: Optional[str], output_format: str,
+                              encoding: Optional[str]) -> StreamingResponse:
+    """
+    بث النتيجة بدفعات (chunked) دون تجميعها في الذاكرة. يُنتظر أول جزء قبل
+    إرسال الترويسات حتى تُرجع الأخطاء المبكرة (503، 500) بحالتها الصحيحة.
+    """
+    started = time.perf_counter()
+    file_type = file_type_of(file_path)
+    if file_hash is None:
+        file_hash = await asyncio.to_thread(hash_file, file_path)
+    stats: Dict[str, int] = {}
+    body = encode_pages(ordered_pages(stream_ocr_pages(file_path, file_hash)), output_format, encoding, stats)
+    try:
+        first = await body.__anext__()
+    except StopAsyncIteration:
+        first = b""
+    except Exception as e:
+        await body.aclose()
+        await asyncio.to_thread(remove_upload, file_path)
+        if not isinstance(e, (OCRPoolFull, KeyPoolExhausted)):
+            ERRORS.inc(file_type=file_type, stage="process")
+        raise
+    
+    async def chunks():
+        try:
+            if first:
+                yield first
+            async for chunk in body:
+                yield chunk
+            REQUEST_SECONDS.observe(time.perf_counter() - started, file_type=file_type)
+            RESPONSE_BYTES.observe(stats["bytes"], file_type=file_type)
+        except Exception as e:
+            ERRORS.inc(file_type=file_type, stage="process")
+            logger.error(f"خطأ أثناء بث نتيجة OCR: {str(e)}")
+            raise
+        finally:
+            await body.aclose()
+            await asyncio.to_thread(remove_upload, file_path)
+    
+    headers = {"X-Accel-Buffering": "no", "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(chunks(), media_type=MEDIA_TYPES[output_format], headers=headers)
+
+def remove_upload(file_path: str):
+    """حذف الملف المؤقت بعد انتهاء معالجته (إلا إذا كانت رفعة أخرى له ما زالت تنتظر)"""
+    if drop_upload_ref(os.path.basename(file_path)) > 0:
+        return
+    try:
+        upload_store.remove(file_path)
+        logger.info(f"تم حذف الملف المؤقت: {os.path.basename(file_path)}")
+    except Exception as e:
+        logger.warning(f"فشل في حذف الملف المؤقت: {e}")
+
+async def run_ocr_job(job_id: str, filename: str, on_pages: Callable[..., None]) -> str:
+    """تنفيذ مهمة OCR في الخلفية (يستدعيها JobRunner)"""
+    file_path = find_upload(filename)
+    if file_path is None:
+        raise FileNotFoundError("الملف غير موجود")
+    
+    if file_path.lower().endswith('.pdf'):
+        on_pages(total=await asyncio.to_thread(count_pdf_pages, file_path))
+    else:
+        on_pages(total=1)
+    
+    file_hash = upload_hash(file_path)
+    while True:
+        try:
+            extracted_text = await perform_ocr(file_path, file_hash, on_pages)
+            break
+        except OCRPoolFull as e:
+            # المهام تنتظر دورها بدلاً من الفشل عند انشغال المجمع
+            logger.info(f"المهمة {job_id} تنتظر {e.retry_after} ثانية لانشغال المجمع")
+            await asyncio.sleep(e.retry_after)
+    
+    await asyncio.to_thread(remove_upload, file_path)
+    return extracted_text
+
+async def perform_ocr(file_path: str, file_hash: Optional[str] = None,
+                      on_pages: Optional[Callable[..., None]] = None) -> str:
+    """
+    تنفيذ OCR على الملف (البصمة تُحسب هنا فقط إذا لم تكن معروفة من اسمه).
+
+    الطلبات المتزامنة لنفس المحتوى تنتظر عملية OCR واحدة وتتشارك نتيجتها؛
+    تقدم الصفحات (on_pages) يصل فقط لمن بدأ العملية.
+    """
+    file_extension = os.path.splitext(file_path)[1].lower()
+    if file_extension in ['.pdf', '.png', '.jpg', '.jpeg'] and file_hash is None:
+        file_hash = await asyncio.to_thread(hash_file, file_path)
+    if file_hash is None:
+        return await run_ocr(file_path, file_hash, on_pages)
+    if ocr_flights.get(file_hash) is not None:
+        COALESCED.inc(file_type=file_type_of(file_path))
+        logger.info(f"الانضمام إلى OCR جارٍ لنفس المحتوى: {os.path.basename(file_path)}")
+    return await ocr_flights.run(file_hash, lambda: run_ocr_once(file_path, file_hash, on_pages))
+
+async def run_ocr_once(file_path: str, file_hash: str,
+                       on_pages: Optional[Callable[..., None]] = None) -> str:
+    """run_ocr تحت قفل المحتوى بين العمال (من ينتظر يجد النتيجة مخزنة)"""
+    async with cross_process_flight(file_hash, file_type_of(file_path)):
+        return await run_ocr(file_path, file_hash, on_pages)
+
+async def run_ocr(file_path: str, file_hash: Optional[str],
+                  on_pages: Optional[Callable[..., None]] = None) -> str:
+    """تنفيذ OCR فعلياً حسب نوع الملف مع تسجيل المقاييس"""
+    started = time.perf_counter()
+    file_type = file_type_of(file_path)
     try:
         file_extension = os.path.splitext(file_path)[1].lower()
-        
         if file_extension == '.pdf':
-            return await process_pdf_ocr(file_path)
+            extracted_text = await process_pdf_ocr(file_path, file_hash, on_pages)
         elif file_extension in ['.png', '.jpg', '.jpeg']:
-            return await process_image_ocr(file_path)
+            extracted_text = await process_image_ocr(file_path, file_hash)
         else:
             raise ValueError(f"نوع الملف غير مدعوم: {file_extension}")
+        
+        REQUEST_SECONDS.observe(time.perf_counter() - started, file_type=file_type)
+        RESPONSE_BYTES.observe(len(extracted_text.encode("utf-8")), file_type=file_type)
+        return extracted_text
     
     except Exception as e:
+        if not isinstance(e, (OCRPoolFull, KeyPoolExhausted)):
+            ERRORS.inc(file_type=file_type, stage="process")
         logger.error(f"خطأ في perform_ocr: {str(e)}")
         raise e
 
-async def process_pdf_ocr(file_path: str) -> str:
+async def process_pdf_ocr(file_path: str, file_hash: str,
+                          on_pages: Optional[Callable[..., None]] = None) -> str:
     """معالجة OCR لملف PDF"""
     try:
         logger.info(f"معالجة PDF: {file_path}")
         
-        # إذا لم يكن هناك API key صحيح، استخدم وضع المحاكاة
-        if not client:
-            logger.info("استخدام وضع المحاكاة للاختبار")
-            await asyncio.sleep(2)  # محاكاة وقت المعالجة
-            return simulate_ocr_result("PDF")
+        if OCR_MOCK_MODE:
+            return await simulate_ocr("pdf")
         
-        # قراءة الملف كـ base64
-        with open(file_path, "rb") as f:
-            pdf_bytes = f.read()
+        # التحقق من التخزين المؤقت قبل استدعاء API
+        cache_key = OCRCache.make_key(file_hash, OCR_MODEL, False, PDF_PAGE_SOURCE)
+        pages = await asyncio.to_thread(ocr_cache.get, cache_key)
+        if pages is not None:
+            logger.info(f"نتيجة مخزنة مؤقتاً للملف: {file_path}")
+            return join_pages(pages)
         
-        b64 = base64.b64encode(pdf_bytes).decode()
-        
-        # استدعاء Mistral OCR
-        response = client.ocr.process(
-            model="mistral-ocr-latest",
-            document={
-                "type": "document_url",
-                "document_url": f"data:application/pdf;base64,{b64}"
-            },
-            include_image_base64=False
-        )
+        # صفحات النص المضمن تُستخرج محلياً، والصفحات الممسوحة فقط تذهب إلى OCR
+        layer = await native_text_pages(file_path, OCR_PDF_CHUNK_PAGES)
+        if layer is not None:
+            pages, chunks = layer
+            if on_pages:
+                on_pages(done=len(pages))
+            if chunks:
+                pages = merge_pages([pages, await ocr_pdf_chunks(chunks, on_pages)])
+        else:
+            # الملفات الكبيرة تُقسم إلى مجموعات صفحات تُعالج بالتوازي
+            chunks = await asyncio.to_thread(split_pdf, file_path)
+            if chunks:
+                pages = await ocr_pdf_chunks(chunks, on_pages)
+            else:
+                pages = await ocr_pdf_chunk(0, file_path=file_path)
         
         # تجميع النص من جميع الصفحات
-        extracted_text = ""
-        for page in response.pages:
-            extracted_text += page.markdown + "\n\n"
+        await asyncio.to_thread(ocr_cache.set, cache_key, pages)
+        started = time.perf_counter()
+        extracted_text = join_pages(pages)
+        EXTRACT_SECONDS.observe(time.perf_counter() - started, file_type="pdf")
+        PAGES.observe(len(pages), file_type="pdf")
         
         logger.info(f"تم استخراج {len(extracted_text)} حرف من PDF")
-        return extracted_text.strip()
+        return extracted_text
     
     except Exception as e:
         logger.error(f"خطأ في معالجة PDF: {str(e)}")
-        if "401" in str(e) or "Unauthorized" in str(e):
-            logger.warning("API key غير صحيح. استخدام وضع المحاكاة.")
-            return simulate_ocr_result("PDF")
         raise e
 
-def encode_image(image_path: str) -> Optional[str]:
-    """تحويل الصورة إلى base64 مع معالجة محسنة للأخطاء"""
-    try:
-        # التحقق من وجود الملف أولاً
-        if not os.path.exists(image_path):
-            logger.error(f"خطأ: الملف {image_path} غير موجود.")
-            return None
-        
-        # التحقق من حجم الملف
-        file_size = os.path.getsize(image_path)
-        logger.info(f"حجم الملف: {file_size} بايت")
-        
-        if file_size == 0:
-            logger.error("خطأ: الملف فارغ")
-            return None
-        
-        with open(image_path, "rb") as image_file:
-            image_data = image_file.read()
-            base64_data = base64.b64encode(image_data).decode('utf-8')
-            logger.info(f"تم تحويل {len(base64_data)} حرف إلى base64")
-            return base64_data
-            
-    except FileNotFoundError:
-        logger.error(f"خطأ: الملف {image_path} غير موجود.")
+async def native_text_pages(file_path: str, chunk_pages: int) -> Optional[tuple]:
+    """
+    (صفحات النص المضمن، مجموعات الصفحات التي تحتاج OCR)، أو None إذا لم توجد
+    صفحة بنص صالح فيُعالج الملف كاملاً بالمسار المعتاد.
+    """
+    if not OCR_NATIVE_TEXT:
         return None
-    except PermissionError:
-        logger.error(f"خطأ: لا توجد صلاحية لقراءة الملف {image_path}")
+    started = time.perf_counter()
+    layer = await asyncio.to_thread(split_text_layer, file_path)
+    if layer is None or not layer[0]:
+        TEXT_LAYER_SECONDS.observe(time.perf_counter() - started, file_type="pdf")
         return None
+    native, scanned, rejected = layer
+    chunks = await asyncio.to_thread(split_pdf_pages, file_path, scanned, chunk_pages) if scanned else []
+    TEXT_LAYER_SECONDS.observe(time.perf_counter() - started, file_type="pdf")
+    PDF_PAGE_SOURCES.inc(len(native), source="text_layer")
+    for reason, count in rejected.items():
+        PDF_PAGE_SOURCES.inc(count, source=reason)
+    return native, chunks
+
+async def ocr_pdf_chunk(first_page: int, pdf_bytes: Optional[bytes] = None,
+                        file_path: Optional[str] = None, admitted: bool = False) -> list:
+    """استدعاء Mistral OCR لمجموعة صفحات (بايتات) أو لملف كامل وإرجاع الصفحات بأرقامها في المستند الأصلي"""
+    response = await call_ocr(
+        "pdf",
+        admitted=admitted,
+        mime_type="application/pdf",
+        include_image_base64=False,
+        file_path=file_path,
+        data=pdf_bytes,
+        file_name=f"pages-{first_page + 1}.pdf"
+    )
+    return offset_pages(response, first_page)
+
+async def call_ocr(file_type: str, admitted: bool = False, **kwargs) -> Any:
+    """
+    الترميز واستدعاء Mistral OCR داخل مجمع العمال مع تسجيل مقاييس كل مرحلة.
+    admitted: الاستدعاء جزء من مستند قبله المجمع، فينتظر مكاناً بدلاً من الرفض.
+    """
+    timings: Dict[str, float] = {}
+    run = ocr_pool.run_admitted if admitted else ocr_pool.run
+    IN_FLIGHT.inc(file_type=file_type)
+    try:
+        # المفتاح يُحجز داخل خيط المجمع؛ عند 401/429 يُعاد الاستدعاء بمفتاح آخر
+        return await run(key_pool.run, ocr_process, model=OCR_MODEL, timings=timings, **kwargs)
+    except OCRPoolFull:
+        REJECTED.inc(file_type=file_type)
+        raise
+    except KeyPoolExhausted:
+        KEYS_EXHAUSTED.inc(file_type=file_type)
+        raise
     except Exception as e:
-        logger.error(f"خطأ في تحويل الصورة إلى base64: {type(e).__name__}: {e}")
-        return None
+        if error_status_code(e) == 401:
+            UNAUTHORIZED.inc(file_type=file_type)
+        ERRORS.inc(file_type=file_type, stage="api")
+        raise
+    finally:
+        IN_FLIGHT.dec(file_type=file_type)
+        if "encode" in timings:
+            ENCODE_SECONDS.observe(timings["encode"], file_type=file_type)
+            API_SECONDS.observe(timings["api"], file_type=file_type)
+
+async def iter_pdf_chunks(chunks: list, on_pages: Optional[Callable[..., None]] = None) -> AsyncIterator[list]:
+    """
+    معالجة مجموعات الصفحات بالتوازي وإرجاع صفحات كل مجموعة فور اكتمالها
+    (بغض النظر عن ترتيبها)، مع إعادة محاولة المجموعات الفاشلة فقط.
 
-async def process_image_ocr(file_path: str) -> str:
+    المستند يُقبل أو يُرفض (OCRPoolFull) مرة واحدة قبل أي استدعاء، ثم تنتظر
+    مجموعاته مكاناً في المجمع فلا يُلغى في منتصفه بعد دفع ثمن مجموعات منه.
+    """
+    try:
+        ocr_pool.admit()
+    except OCRPoolFull:
+        REJECTED.inc(file_type="pdf")
+        raise
+    semaphore = asyncio.Semaphore(OCR_PDF_CHUNK_CONCURRENCY)
+    
+    async def run_chunk(first_page: int, pdf_bytes: bytes, attempt: int, delay: float = 0):
+        if delay:
+            await asyncio.sleep(delay)
+        async with semaphore:
+            try:
+                pages = await ocr_pdf_chunk(first_page, pdf_bytes, admitted=True)
+                return first_page, pdf_bytes, attempt, pages, None
+            except Exception as e:
+                return first_page, pdf_bytes, attempt, None, e
+    
+    tasks = {asyncio.create_task(run_chunk(first_page, pdf_bytes, 0)) for first_page, pdf_bytes in chunks}
+    try:
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                first_page, pdf_bytes, attempt, pages, error = task.result()
+                if error is None:
+                    if on_pages:
+                        on_pages(done=len(pages))
+                    yield pages
+                    continue
+                # لا فائدة من إعادة المحاولة عند نفاد المفاتيح أو خطأ المصادقة
+                if (isinstance(error, KeyPoolExhausted) or not is_retryable(error)
+                        or attempt == OCR_PDF_CHUNK_RETRIES):
+                    raise error
+                logger.warning(f"فشلت مجموعة الصفحات من {first_page + 1} (المحاولة {attempt + 1}): {error}")
+                RETRIES.inc(file_type="pdf")
+                delay = retry_delay(attempt, error)
+                tasks.add(asyncio.create_task(run_chunk(first_page, pdf_bytes, attempt + 1, delay)))
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def ocr_pdf_chunks(chunks: list, on_pages: Optional[Callable[..., None]] = None) -> list:
+    """معالجة جميع المجموعات ودمج صفحاتها بترتيب المستند"""
+    return merge_pages([pages async for pages in iter_pdf_chunks(chunks, on_pages)])
+
+async def stream_ocr_pages(file_path: str, file_hash: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    إرجاع صفحات النتيجة واحدة تلو الأخرى فور توفرها.
+
+    تُقسم ملفات PDF إلى مجموعات صغيرة (OCR_STREAM_CHUNK_PAGES) حتى تصل
+    الصفحات الأولى بعد زمن مجموعة واحدة بدلاً من زمن المستند كاملاً.
+    """
+    file_extension = os.path.splitext(file_path)[1].lower()
+    if file_extension in ['.png', '.jpg', '.jpeg']:
+        yield {"index": 0, "markdown": await perform_ocr(file_path, file_hash)}
+        return
+    if file_extension != '.pdf':
+        raise ValueError(f"نوع الملف غير مدعوم: {file_extension}")
+    
+    if OCR_MOCK_MODE:
+        yield {"index": 0, "markdown": await simulate_ocr("pdf")}
+        return
+    
+    cache_key = OCRCache.make_key(file_hash, OCR_MODEL, False, PDF_PAGE_SOURCE)
+    pages = await asyncio.to_thread(ocr_cache.get, cache_key)
+    if pages is not None:
+        logger.info(f"نتيجة مخزنة مؤقتاً للملف: {file_path}")
+        for page in pages:
+            yield page
+        return
+    
+    # OCR جارٍ لنفس المحتوى: انتظار نتيجته بدلاً من استدعاء API مرة أخرى
+    if ocr_flights.get(file_hash) is not None:
+        COALESCED.inc(file_type="pdf")
+        text = await ocr_flights.join(file_hash)
+        for page in (await asyncio.to_thread(ocr_cache.get, cache_key)) or [{"index": 0, "markdown": text}]:
+            yield page
+        return
+    
+    # OCR يجري في مهمة مستقلة: انقطاع هذا العميل يوقف قراءته فقط، أما العملية
+    # فتكتمل وتُخزن نتيجتها المدفوعة للمنتظرين وللطلبات اللاحقة. الملف محجوز
+    # للمهمة، وهذا المستدعي لا يحرر حجزه (ولو انقطع) قبل اكتمال حجزها
+    queue: asyncio.Queue = asyncio.Queue()
+    pinned = asyncio.ensure_future(asyncio.to_thread(add_upload_ref, os.path.basename(file_path)))
+    flight = ocr_flights.spawn(file_hash, lambda: produce_ocr_pages(file_path, file_hash, cache_key, queue, pinned))
+    try:
+        await asyncio.shield(pinned)
+    except asyncio.CancelledError:
+        await pinned
+        raise
+    while (page := await queue.get()) is not None:
+        yield page
+    await asyncio.shield(flight)
+
+async def produce_ocr_pages(file_path: str, file_hash: str, cache_key: str, queue: asyncio.Queue,
+                            pinned: asyncio.Future) -> str:
+    """
+    OCR لملف PDF وتخزين نتيجته؛ كل صفحة تُوضع في queue فور وصولها ثم None
+    في النهاية (نجاحاً أو فشلاً). تُرجع النص الكامل للمنتظرين، وتحرر حجز
+    الملف (pinned) بعد اكتماله.
+    """
+    await pinned
+    try:
+        # عامل آخر قد يعالج المحتوى نفسه: انتظار قفله ثم إعادة فحص التخزين المؤقت
+        async with cross_process_flight(file_hash, "pdf"):
+            pages = await asyncio.to_thread(ocr_cache.get, cache_key)
+            if pages is not None:
+                for page in pages:
+                    queue.put_nowait(page)
+            else:
+                pages = []
+                async for page in ocr_pdf_pages(file_path):
+                    pages.append(page)
+                    queue.put_nowait(page)
+                pages = merge_pages([pages])
+                PAGES.observe(len(pages), file_type="pdf")
+                await asyncio.to_thread(ocr_cache.set, cache_key, pages)
+        return join_pages(pages)
+    finally:
+        queue.put_nowait(None)
+        await asyncio.to_thread(remove_upload, file_path)
+
+async def ocr_pdf_pages(file_path: str) -> AsyncIterator[Dict[str, Any]]:
+    """صفحات PDF بترتيب وصولها: النص المضمن أولاً ثم مجموعات OCR"""
+    layer = await native_text_pages(file_path, OCR_STREAM_CHUNK_PAGES)
+    if layer is not None:
+        # صفحات النص المضمن جاهزة فوراً قبل بدء OCR للصفحات الممسوحة
+        native, chunks = layer
+        for page in native:
+            yield page
+    else:
+        chunks = await asyncio.to_thread(split_pdf, file_path, OCR_STREAM_CHUNK_PAGES)
+    if chunks:
+        async for chunk_pages in iter_pdf_chunks(chunks):
+            for page in chunk_pages:
+                yield page
+    elif layer is None:
+        for page in await ocr_pdf_chunk(0, file_path=file_path):
+            yield page
+
+async def process_image_ocr(file_path: str, file_hash: str) -> str:
     """معالجة OCR للصورة باستخدام الطريقة المحسنة"""
     try:
         logger.info(f"معالجة الصورة: {file_path}")
         
-        # إذا لم يكن هناك API key صحيح، استخدم وضع المحاكاة
-        if not client:
-            logger.info("استخدام وضع المحاكاة للاختبار")
-            await asyncio.sleep(2)  # محاكاة وقت المعالجة
-            return simulate_ocr_result("صورة")
+        if OCR_MOCK_MODE:
+            return await simulate_ocr("image")
         
-        # تحويل الصورة إلى base64 باستخدام الدالة المحسنة
-        logger.info("بدء تحويل الصورة إلى base64...")
-        base64_image = encode_image(file_path)
-        if not base64_image:
-            logger.error("فشل في تحويل الصورة إلى base64")
-            raise ValueError("فشل في تحويل الصورة إلى base64")
-        logger.info("تم تحويل الصورة إلى base64 بنجاح")
+        # التحقق من التخزين المؤقت قبل استدعاء API
+        cache_key = OCRCache.make_key(file_hash, OCR_MODEL, True)
+        pages = await asyncio.to_thread(ocr_cache.get, cache_key)
+        if pages is not None:
+            logger.info(f"نتيجة مخزنة مؤقتاً للملف: {file_path}")
+            return join_pages(pages)
         
         # تحديد نوع الصورة
-        file_extension = os.path.splitext(file_path)[1].lower()
-        mime_type = {
-            '.png': 'image/png',
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg'
-        }.get(file_extension, 'image/jpeg')
+        mime_type = mime_type_for(file_path)
+        
+        # تصغير الصورة وإعادة ضغطها لتقليل حجم الطلب
+        image_bytes = None
+        if image_preprocessor.enabled:
+            started = time.perf_counter()
+            image_bytes, processed_mime_type = await image_preprocessor.run(file_path)
+            PREPROCESS_SECONDS.observe(time.perf_counter() - started, file_type="image")
+            if image_bytes is not None:
+                mime_type = processed_mime_type
         
         # استدعاء Mistral OCR للصور باستخدام الطريقة الصحيحة
         logger.info(f"بدء استدعاء Mistral OCR API للصورة بنوع: {mime_type}")
         
         try:
-            # استخدام الطريقة الصحيحة كما في المثال الرسمي
-            response = client.ocr.process(
-                model="mistral-ocr-latest",
-                document={
-                    "type": "image_url",
-                    "image_url": f"data:{mime_type};base64,{base64_image}"
-                },
-                include_image_base64=True
+            # الترميز (أو الرفع عبر Files API) والاستدعاء يتمان داخل مجمع العمال
+            response = await call_ocr(
+                "image",
+                mime_type=mime_type,
+                include_image_base64=True,
+                file_path=None if image_bytes is not None else file_path,
+                data=image_bytes,
+                file_name=os.path.basename(file_path)
             )
             logger.info("تم استدعاء Mistral OCR API بنجاح")
             
@@ -286,52 +986,64 @@ async def process_image_ocr(file_path: str) -> str:
             logger.error("لم يتم الحصول على استجابة صحيحة من API")
             raise ValueError("لم يتم الحصول على استجابة صحيحة من API")
         
-        # تجميع النص من الاستجابة
-        extracted_text = ""
+        # تجميع النص من الاستجابة (الأجزاء تُجمع في قائمة وتُدمج مرة واحدة)
+        started = time.perf_counter()
+        parts = []
         
-        # طباعة بنية الاستجابة للتشخيص
-        logger.info(f"نوع الاستجابة: {type(response)}")
-        logger.info(f"خصائص الاستجابة: {dir(response)}")
+        # طباعة بنية الاستجابة للتشخيص (مكلفة، في وضع التصحيح فقط)
+        if DEBUG:
+            logger.info(f"نوع الاستجابة: {type(response)}")
+            logger.info(f"خصائص الاستجابة: {dir(response)}")
         
         # محاولة استخراج النص بطرق مختلفة
         if hasattr(response, 'pages') and response.pages:
             logger.info(f"وُجدت {len(response.pages)} صفحة في الاستجابة")
+            PAGES.observe(len(response.pages), file_type="image")
             for i, page in enumerate(response.pages):
-                logger.info(f"معالجة الصفحة {i+1}")
+                if DEBUG:
+                    logger.info(f"معالجة الصفحة {i+1}")
                 if hasattr(page, 'markdown') and page.markdown:
-                    extracted_text += page.markdown + "\n\n"
+                    parts.append(page.markdown)
                 elif hasattr(page, 'text') and page.text:
-                    extracted_text += page.text + "\n\n"
+                    parts.append(page.text)
                 elif hasattr(page, 'content') and page.content:
-                    extracted_text += str(page.content) + "\n\n"
+                    parts.append(str(page.content))
                 else:
                     logger.warning(f"الصفحة {i+1} لا تحتوي على نص")
-                    logger.info(f"خصائص الصفحة {i+1}: {dir(page)}")
+                    if DEBUG:
+                        logger.info(f"خصائص الصفحة {i+1}: {dir(page)}")
         
         elif hasattr(response, 'text') and response.text:
             logger.info("استخراج النص من خاصية text")
-            extracted_text = response.text
+            parts.append(response.text)
         elif hasattr(response, 'content') and response.content:
             logger.info("استخراج النص من خاصية content")
-            extracted_text = str(response.content)
+            parts.append(str(response.content))
         elif hasattr(response, 'markdown') and response.markdown:
             logger.info("استخراج النص من خاصية markdown")
-            extracted_text = response.markdown
+            parts.append(response.markdown)
         else:
             logger.error("لم يتم العثور على نص في الاستجابة")
             logger.error(f"محتوى الاستجابة: {response}")
-            extracted_text = "لم يتم العثور على نص في الصورة"
+            parts.append("لم يتم العثور على نص في الصورة")
         
+        extracted_text = join_pages({"markdown": part} for part in parts)
         logger.info(f"تم استخراج {len(extracted_text)} حرف من الصورة")
-        return extracted_text.strip()
+        EXTRACT_SECONDS.observe(time.perf_counter() - started, file_type="image")
+        await asyncio.to_thread(ocr_cache.set, cache_key, [{"index": 0, "markdown": extracted_text}])
+        return extracted_text
     
     except Exception as e:
         logger.error(f"خطأ في معالجة الصورة: {str(e)}")
-        if "401" in str(e) or "Unauthorized" in str(e):
-            logger.warning("API key غير صحيح. استخدام وضع المحاكاة.")
-            return simulate_ocr_result("صورة")
         raise e
 
+async def simulate_ocr(file_type: str) -> str:
+    """نتيجة وضع المحاكاة (OCR_MOCK_MODE) دون استدعاء API"""
+    logger.info("استخدام وضع المحاكاة للاختبار")
+    MOCK_FALLBACKS.inc(file_type=file_type, reason="mock_mode")
+    await asyncio.sleep(2)  # محاكاة وقت المعالجة
+    return simulate_ocr_result("PDF" if file_type == "pdf" else "صورة")
+
 def simulate_ocr_result(file_type: str) -> str:
     """محاكاة نتيجة OCR للاختبار"""
     if file_type == "PDF":
@@ -382,28 +1094,124 @@ def simulate_ocr_result(file_type: str) -> str:
 async def test_ocr():
     """اختبار بسيط لـ OCR"""
     try:
-        # البحث عن صورة في مجلد uploads للاختبار
-        if os.path.exists(UPLOAD_DIR):
-            files = [f for f in os.listdir(UPLOAD_DIR) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-            if files:
-                test_file = files[0]
-                file_path = os.path.join(UPLOAD_DIR, test_file)
-                logger.info(f"اختبار OCR على الملف: {test_file}")
-                
-                result = await perform_ocr(file_path)
-                return {
-                    "status": "success",
-                    "test_file": test_file,
-                    "extracted_text": result[:500] + "..." if len(result) > 500 else result,
-                    "text_length": len(result)
-                }
-            else:
-                return {"status": "no_test_files", "message": "لا توجد صور للاختبار في مجلد uploads"}
+        # البحث عن صورة بين الملفات المرفوعة للاختبار (يتوقف عند أول صورة)
+        file_path = await asyncio.to_thread(upload_store.first_file, ('.png', '.jpg', '.jpeg'))
+        if file_path is not None:
+            test_file = os.path.basename(file_path)
+            logger.info(f"اختبار OCR على الملف: {test_file}")
+            
+            result = await perform_ocr(file_path)
+            return {
+                "status": "success",
+                "test_file": test_file,
+                "extracted_text": result[:500] + "..." if len(result) > 500 else result,
+                "text_length": len(result)
+            }
         else:
-            return {"status": "no_upload_dir", "message": "مجلد uploads غير موجود"}
+            return {"status": "no_test_files", "message": "لا توجد صور للاختبار في مجلد uploads"}
     except Exception as e:
         logger.error(f"خطأ في اختبار OCR: {str(e)}")
         return {"status": "error", "message": str(e)}
 
+@app.get("/api/process-ocr/stream")
+async def process_ocr_stream(filename: str):
+    """
+    معالجة OCR مع بث كل صفحة فور جاهزيتها عبر Server-Sent Events.
+
+    الأحداث: page ({"index", "markdown"}) ثم done أو error.
+    """
+    file_path = upload_path(filename)
+    file_hash = upload_hash(file_path)
+    logger.info(f"بدء معالجة OCR (بث) للملف: {filename}")
+    
+    async def events():
+        count = 0
+        try:
+            async for page in stream_ocr_pages(file_path, file_hash):
+                count += 1
+                yield sse_event("page", page)
+            yield sse_event("done", {"filename": filename, "pages": count})
+        except (OCRPoolFull, KeyPoolExhausted) as e:
+            yield sse_event("error", {"detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"خطأ في معالجة OCR (بث): {str(e)}")
+            yield sse_event("error", {"detail": f"خطأ في معالجة OCR: {str(e)}"})
+        finally:
+            await asyncio.to_thread(remove_upload, file_path)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(filename: str = Form(...)):
+    """إنشاء مهمة OCR في الخلفية وإرجاع معرّفها فوراً"""
+    upload_path(filename)
+    try:
+        job = await job_runner.submit(filename)
+    except JobQueueFull as e:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(e)},
+            headers={"Retry-After": str(ocr_pool.retry_after)}
+        )
+    logger.info(f"تم إنشاء المهمة {job['job_id']} للملف: {filename}")
+    return {"job_id": job["job_id"], "status": job["status"]}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """حالة المهمة وتقدم الصفحات"""
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="المهمة غير موجودة")
+    job.pop("result", None)
+    job.pop("worker", None)
+    return job
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """نتيجة المهمة بعد اكتمالها (نفس شكل استجابة /api/process-ocr)"""
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="المهمة غير موجودة")
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=f"خطأ في معالجة OCR: {job['error']}")
+    if job["status"] != COMPLETED:
+        return JSONResponse(status_code=202, content={"job_id": job_id, "status": job["status"]})
+    return {
+        "filename": job["filename"],
+        "status": "completed",
+        "extracted_text": job["result"],
+        "message": "تم استخراج النص بنجاح"
+    }
+
+@app.get("/api/search")
+async def search(q: str, limit: int = 20, offset: int = 0):
+    """
+    البحث في صفحات ملفات Markdown المفهرسة (نتائج BatchPdfConv) مع تطبيع
+    العربية؛ كل الكلمات مطلوبة، و* في آخر الكلمة للبحث بالبادئة.
+    """
+    if search_index is None:
+        raise HTTPException(status_code=503, detail="فهرس البحث غير مفعل (OCR_SEARCH_DB)")
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="نص البحث فارغ")
+    started = time.perf_counter()
+    results = await asyncio.to_thread(search_index.search, q, limit, offset)
+    return {"query": q, "results": results, "took_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """مقاييس خط معالجة OCR بتنسيق Prometheus"""
+    # الجامعون يقرؤون إحصائيات قاعدة التخزين المؤقت، فلا تُنفذ في حلقة الأحداث
+    content = await asyncio.to_thread(metrics.REGISTRY.render)
+    return Response(content=content, media_type=metrics.CONTENT_TYPE)
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """إحصائيات التخزين المؤقت لنتائج OCR (الإصابات والإخفاقات)"""
+    return await asyncio.to_thread(ocr_cache.stats)
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
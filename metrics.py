@@ -0,0 +1,200 @@
+"""
+مقاييس بتنسيق Prometheus النصي دون اعتماديات إضافية
+
+عدادات (Counter) ومقاييس لحظية (Gauge) ومدرجات تكرارية (Histogram) بتسميات،
+تُعرض عبر نقطة /metrics.
+"""
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# حدود المدرجات الافتراضية
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 5 * 1024 ** 2, 10 * 1024 ** 2,
+                 50 * 1024 ** 2, 100 * 1024 ** 2, 200 * 1024 ** 2)
+PAGE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """عداد تراكمي لا يتناقص"""
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Gauge(_Metric):
+    """قيمة لحظية قابلة للزيادة والنقصان"""
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Histogram(_Metric):
+    """مدرج تكراري بحدود ثابتة (مجموع، عدد، وعدادات تراكمية لكل حد)"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = TIME_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [عدادات الحدود..., المجموع, العدد]
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            for i, bound in enumerate(self.buckets):
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(state[i])}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(state[-1])}")
+        return lines
+
+
+class Registry:
+    """سجل المقاييس وتحويلها إلى نص Prometheus"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        """دالة تُستدعى قبل كل عرض لتحديث المقاييس المحسوبة من مصادر أخرى"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Iterable[str] = (),
+              buckets: Optional[Iterable[float]] = None) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets or TIME_BUCKETS))
+
+
+# مقاييس خط معالجة OCR (التسمية file_type: pdf أو image)
+UPLOAD_BYTES = histogram("ocr_upload_bytes", "حجم الملفات المرفوعة بالبايت", ["file_type"], BYTES_BUCKETS)
+UPLOAD_SECONDS = histogram("ocr_upload_seconds", "زمن استقبال الملف وكتابته", ["file_type"])
+PREPROCESS_SECONDS = histogram("ocr_preprocess_seconds", "زمن تجهيز الصورة قبل الإرسال", ["file_type"])
+ENCODE_SECONDS = histogram("ocr_encode_seconds", "زمن ترميز المستند (base64 أو الرفع عبر Files API)", ["file_type"])
+API_SECONDS = histogram("ocr_api_seconds", "زمن استدعاء Mistral OCR API", ["file_type"])
+PAGES = histogram("ocr_pages", "عدد الصفحات لكل مستند", ["file_type"], PAGE_BUCKETS)
+EXTRACT_SECONDS = histogram("ocr_extract_seconds", "زمن تجميع النص من الاستجابة", ["file_type"])
+RESPONSE_BYTES = histogram("ocr_response_bytes", "حجم النص المستخرج بالبايت", ["file_type"], BYTES_BUCKETS)
+REQUEST_SECONDS = histogram("ocr_request_seconds", "الزمن الكلي لمعالجة المستند", ["file_type"])
+TEXT_LAYER_SECONDS = histogram("ocr_text_layer_seconds", "زمن فحص واستخراج طبقة النص المضمنة في PDF", ["file_type"])
+
+MOCK_FALLBACKS = counter("ocr_mock_fallbacks_total", "نتائج وضع المحاكاة (OCR_MOCK_MODE) المُرجعة بدل OCR الفعلي",
+                         ["file_type", "reason"])
+UNAUTHORIZED = counter("ocr_unauthorized_total", "ردود 401 من Mistral API", ["file_type"])
+RETRIES = counter("ocr_retries_total", "إعادة محاولات استدعاء API", ["file_type"])
+ERRORS = counter("ocr_errors_total", "أخطاء المعالجة حسب المرحلة", ["file_type", "stage"])
+REJECTED = counter("ocr_rejected_total", "طلبات رُفضت لامتلاء مجمع العمال", ["file_type"])
+COALESCED = counter("ocr_coalesced_total", "طلبات انضمت إلى OCR جارٍ لنفس المحتوى بدل استدعاء جديد", ["file_type"])
+KEYS_EXHAUSTED = counter("ocr_keys_exhausted_total", "طلبات رُفضت لعدم توفر مفتاح API سليم", ["file_type"])
+PDF_PAGE_SOURCES = counter("ocr_pdf_pages_total", "صفحات PDF حسب مصدر النص (text_layer أو سبب إرسالها إلى OCR)",
+                           ["source"])
+IN_FLIGHT = gauge("ocr_in_flight", "استدعاءات OCR قيد التنفيذ", ["file_type"])
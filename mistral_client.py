@@ -0,0 +1,98 @@
+"""
+مصنع عميل Mistral مشترك: عميل واحد لكل عملية (أو حاوية دافئة) لكل مفتاح API
+
+يُعاد استخدام اتصالات HTTP (keep-alive) بين الاستدعاءات بدلاً من مصافحة TLS
+جديدة في كل مرة، مع التحكم في حجم المجمع والمهل وإعادة المحاولة.
+تُستورد mistralai و httpx عند أول استخدام فقط لتقليل زمن البدء البارد.
+"""
+import os
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# إعدادات الاتصال (قابلة للتعديل عبر متغيرات البيئة)
+MISTRAL_SERVER_URL = os.getenv("MISTRAL_SERVER_URL") or None
+MISTRAL_POOL_SIZE = int(os.getenv("MISTRAL_POOL_SIZE", "20"))
+MISTRAL_KEEPALIVE_SECONDS = float(os.getenv("MISTRAL_KEEPALIVE_SECONDS", "60"))
+MISTRAL_CONNECT_TIMEOUT = float(os.getenv("MISTRAL_CONNECT_TIMEOUT", "10"))
+MISTRAL_READ_TIMEOUT = float(os.getenv("MISTRAL_READ_TIMEOUT", "300"))
+MISTRAL_HTTP2 = os.getenv("MISTRAL_HTTP2", "false").lower() in ("1", "true", "yes")
+# إعادة المحاولة داخل SDK (0 = معطلة؛ حدود المعدل تُعالج في rate_limit)
+MISTRAL_RETRY_MAX_ELAPSED_MS = int(os.getenv("MISTRAL_RETRY_MAX_ELAPSED_MS", "0"))
+
+_clients: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _build_client(api_key: str) -> Any:
+    import httpx
+    from mistralai import Mistral
+
+    limits = httpx.Limits(
+        max_connections=MISTRAL_POOL_SIZE,
+        max_keepalive_connections=MISTRAL_POOL_SIZE,
+        keepalive_expiry=MISTRAL_KEEPALIVE_SECONDS,
+    )
+    timeout = httpx.Timeout(MISTRAL_READ_TIMEOUT, connect=MISTRAL_CONNECT_TIMEOUT)
+    http2 = MISTRAL_HTTP2
+    if http2 and not _http2_available():
+        logger.warning("MISTRAL_HTTP2 مفعّل لكن حزمة h2 غير مثبتة. سيتم استخدام HTTP/1.1.")
+        http2 = False
+
+    options: Dict[str, Any] = {
+        "api_key": api_key,
+        "client": httpx.Client(limits=limits, timeout=timeout, http2=http2, follow_redirects=True),
+        "async_client": httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2, follow_redirects=True),
+        "timeout_ms": int(MISTRAL_READ_TIMEOUT * 1000),
+    }
+    if MISTRAL_SERVER_URL:
+        options["server_url"] = MISTRAL_SERVER_URL
+    if MISTRAL_RETRY_MAX_ELAPSED_MS > 0:
+        from mistralai.utils import BackoffStrategy, RetryConfig
+        from rate_limit import RETRY_INITIAL_SECONDS, RETRY_MAX_SECONDS
+
+        options["retry_config"] = RetryConfig(
+            "backoff",
+            BackoffStrategy(int(RETRY_INITIAL_SECONDS * 1000), int(RETRY_MAX_SECONDS * 1000), 2.0,
+                            MISTRAL_RETRY_MAX_ELAPSED_MS),
+            retry_connection_errors=True,
+        )
+    return Mistral(**options)
+
+
+def get_client(api_key: str) -> Any:
+    """إرجاع عميل Mistral المشترك لهذا المفتاح (يُنشأ مرة واحدة لكل عملية)"""
+    client = _clients.get(api_key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = _build_client(api_key)
+            _clients[api_key] = client
+            logger.info(f"تم إنشاء عميل Mistral (مجمع {MISTRAL_POOL_SIZE} اتصال)")
+    return client
+
+
+def close_clients():
+    """إغلاق اتصالات جميع العملاء (عند إيقاف التطبيق)"""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        http_client: Optional[Any] = getattr(getattr(client, "sdk_configuration", None), "client", None)
+        if http_client is not None:
+            try:
+                http_client.close()
+            except Exception as e:
+                logger.warning(f"تعذر إغلاق عميل HTTP: {e}")
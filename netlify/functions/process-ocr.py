@@ -1,98 +1,16 @@
-import json
-import base64
 import os
+import sys
 from typing import Dict, Any
 
-# محاولة استيراد Mistral
-try:
-    from mistralai import Mistral
-    MISTRAL_AVAILABLE = True
-    MistralClient = Mistral
-except ImportError:
-    MISTRAL_AVAILABLE = False
-    MistralClient = None
+# الوحدات المشتركة مع التطبيق الرئيسي (في جذر المستودع، انظر included_files في netlify.toml)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from netlify_ocr import handle_ocr
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Netlify Function لمعالجة OCR
-    """
-    try:
-        # التحقق من طريقة الطلب
-        if event['httpMethod'] != 'POST':
-            return {
-                'statusCode': 405,
-                'body': json.dumps({'error': 'Method not allowed'})
-            }
-        
-        # الحصول على API Key من متغيرات البيئة
-        api_key = os.environ.get('MISTRAL_API_KEY')
-        
-        if not api_key or not MISTRAL_AVAILABLE:
-            # استخدام وضع المحاكاة
-            extracted_text = simulate_ocr_result()
-        else:
-            # معالجة OCR باستخدام Mistral
-            try:
-                if MistralClient:
-                    client = MistralClient(api_key=api_key)
-                
-                # معالجة الملف
-                body = json.loads(event.get('body', '{}'))
-                filename = body.get('filename', '')
-                
-                # في بيئة Netlify Functions، يجب استخدام API مباشرة
-                extracted_text = simulate_ocr_result()
-                
-            except Exception as e:
-                extracted_text = simulate_ocr_result()
-        
-        # إرجاع النتيجة
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-            },
-            'body': json.dumps({
-                'filename': 'processed_file',
-                'status': 'completed',
-                'extracted_text': extracted_text,
-                'message': 'تم استخراج النص بنجاح'
-            }, ensure_ascii=False)
-        }
-        
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-            },
-            'body': json.dumps({
-                'error': str(e),
-                'message': 'خطأ في معالجة OCR'
-            })
-        }
-
-def simulate_ocr_result() -> str:
-    """محاكاة نتيجة OCR للاختبار"""
-    return """# نتيجة استخراج النص
-
-## العنوان الرئيسي
-هذا نص تجريبي تم استخراجه من الصورة أو المستند باستخدام تقنية التعرف البصري على الحروف (OCR).
-
-### الفقرة الأولى
-هذا مثال على نص يمكن أن يستبدل في نفس المساحة، لقد تم توليد هذا النص من مولد النص العربى، حيث يمكنك أن تولد مثل هذا النص أو العديد من النصوص الأخرى إضافة إلى زيادة عدد الحروف التى يولدها التطبيق.
 
-### الفقرة الثانية
-إذا كنت تحتاج إلى عدد أكبر من الفقرات يتيح لك مولد النص العربى زيادة عدد الفقرات كما تريد، النص لن يبدو مقسماً ولا يحوي أخطاء لغوية، مولد النص العربى مفيد لمصممي المواقع على وجه الخصوص.
-
-### قائمة العناصر
-- عنصر أول في القائمة
-- عنصر ثاني في القائمة
-- عنصر ثالث في القائمة
-- عنصر رابع في القائمة
-
----
-
-**ملاحظة:** هذا نص تجريبي. في البيئة الإنتاجية، سيتم استخدام Mistral AI لاستخراج النص الفعلي."""
+    الملف يُرسل مع الطلب نفسه (multipart أو جسم خام أو JSON بترميز base64)،
+    ويُعاد النص المستخرج فعلياً من Mistral OCR.
+    """
+    return handle_ocr(event)
@@ -0,0 +1,227 @@
+"""
+معالجة OCR داخل Netlify Functions (upload و process-ocr)
+
+لا تخزين مشترك بين استدعاءات الدوال، لذا يصل الملف مع الطلب نفسه:
+- multipart/form-data بالحقل file (كما ترسله الواجهة إلى /api/upload)
+- جسم خام بنوع الملف (application/pdf، image/png، image/jpeg) مع ?filename=
+- JSON: {"file": "<base64>", "filename": "...", "mime_type": "..."}
+
+زمن البدء البارد: هذه الوحدة تستورد المكتبة القياسية فقط، و mistralai و httpx
+تُستوردان عند أول استدعاء OCR فعلي (mistral_client). العميل يُحفظ على مستوى
+الوحدة فيُعاد استخدامه (مع اتصالاته المفتوحة) في كل استدعاء لاحق داخل الحاوية الدافئة.
+"""
+import os
+import json
+import time
+import base64
+import binascii
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from ocr_encoding import MIME_TYPES, mime_type_for, ocr_process
+
+logger = logging.getLogger(__name__)
+
+# إعدادات الدوال (قابلة للتعديل عبر متغيرات البيئة)
+MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "")
+OCR_MODEL = os.getenv("OCR_MODEL", "mistral-ocr-latest")
+OCR_MOCK_MODE = os.getenv("OCR_MOCK_MODE", "false").lower() in ("1", "true", "yes")
+# حد حجم الملف: جسم الطلب في Netlify Functions محدود بـ 6MB بعد ترميز base64
+FUNCTION_MAX_UPLOAD_MB = float(os.getenv("FUNCTION_MAX_UPLOAD_MB", "4.5"))
+
+MB = 1024 * 1024
+SUPPORTED_MIME_TYPES = set(MIME_TYPES.values())
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "POST, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type",
+}
+
+# بصمات بداية الملفات لتحديد النوع عندما لا يُرسل أو يُرسل عاماً (octet-stream)
+_MAGIC = (
+    (b"%PDF", "application/pdf"),
+    (b"\x89PNG", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+)
+
+
+class RequestError(Exception):
+    """طلب غير صالح يُرد عليه برمز الحالة المحدد"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def response(status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    return {
+        "statusCode": status,
+        "headers": {"Content-Type": "application/json; charset=utf-8", **CORS_HEADERS, **(headers or {})},
+        "body": json.dumps(body, ensure_ascii=False),
+    }
+
+
+def sniff_mime_type(data: bytes) -> Optional[str]:
+    for magic, mime_type in _MAGIC:
+        if data.startswith(magic):
+            return mime_type
+    return None
+
+
+def resolve_mime_type(data: bytes, declared: Optional[str], filename: str) -> str:
+    """نوع الملف من محتواه، ثم من النوع المعلن، ثم من الامتداد"""
+    mime_type = sniff_mime_type(data[:8])
+    if mime_type is None:
+        declared = (declared or "").split(";")[0].strip().lower()
+        mime_type = declared if declared in SUPPORTED_MIME_TYPES else mime_type_for(filename)
+    if mime_type not in SUPPORTED_MIME_TYPES:
+        raise RequestError(415, "نوع الملف غير مدعوم. الأنواع المدعومة: PDF, PNG, JPG, JPEG")
+    return mime_type
+
+
+def _decode_base64(text: str) -> bytes:
+    try:
+        return base64.b64decode(text, validate=False)
+    except (binascii.Error, ValueError):
+        raise RequestError(400, "محتوى base64 غير صالح")
+
+
+def _raw_body(event: Dict[str, Any]) -> bytes:
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        return _decode_base64(body)
+    # الجسم النصي (غير base64) سلسلة فكتها Netlify من UTF-8؛ إعادة ترميزها بـ UTF-8
+    # تعيد بايتاته الأصلية. المحتوى الثنائي يصل دائماً بـ isBase64Encoded
+    return body.encode("utf-8")
+
+
+def _check_size(size: int):
+    if size == 0:
+        raise RequestError(400, "الملف فارغ")
+    if size > FUNCTION_MAX_UPLOAD_MB * MB:
+        raise RequestError(413, f"حجم الملف يتجاوز الحد المسموح في الدوال ({FUNCTION_MAX_UPLOAD_MB:g}MB)")
+
+
+def read_upload(event: Dict[str, Any]) -> Tuple[str, str, bytes]:
+    """استخراج (اسم الملف، نوعه، محتواه) من حدث Netlify"""
+    headers = {key.lower(): value for key, value in (event.get("headers") or {}).items()}
+    content_type = headers.get("content-type", "")
+    query = event.get("queryStringParameters") or {}
+    filename = query.get("filename") or ""
+    declared = None
+
+    if content_type.startswith("multipart/form-data"):
+        # حزمة email (نحو 15ms) تُستورد لهذا النوع فقط
+        from email.parser import BytesParser
+        from email.policy import HTTP
+
+        raw = _raw_body(event)
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + raw)
+        part = next((part for part in message.iter_parts()
+                     if part.get_param("name", header="content-disposition") == "file"), None)
+        if part is None:
+            raise RequestError(400, "الحقل file غير موجود في الطلب")
+        data = part.get_payload(decode=True) or b""
+        filename = part.get_filename() or filename
+        declared = part.get_content_type()
+    elif content_type.startswith("application/json"):
+        try:
+            body = json.loads(_raw_body(event) or b"{}")
+        except ValueError:
+            raise RequestError(400, "جسم JSON غير صالح")
+        if not isinstance(body, dict) or not body.get("file") or not isinstance(body["file"], str):
+            # الواجهة القديمة ترسل اسم الملف فقط بعد رفعه، ولا تخزين بين الدوال
+            raise RequestError(400, "أرسل محتوى الملف بترميز base64 في الحقل file "
+                                    "(لا يمكن معالجة ملف رُفع في طلب سابق داخل Netlify Functions)")
+        encoded = body["file"]
+        if encoded.startswith("data:"):
+            header, _, encoded = encoded.partition(",")
+            declared = header[5:].split(";")[0]
+        # رفض الملف الكبير قبل فك ترميزه
+        _check_size(len(encoded) * 3 // 4)
+        data = _decode_base64(encoded)
+        if not all(isinstance(body.get(key), (str, type(None))) for key in ("filename", "mime_type")):
+            raise RequestError(400, "الحقلان filename و mime_type يجب أن يكونا نصاً")
+        filename = body.get("filename") or filename
+        declared = body.get("mime_type") or declared
+    else:
+        data = _raw_body(event)
+        declared = content_type
+
+    _check_size(len(data))
+    filename = os.path.basename(filename.replace("\\", "/")) or "document"
+    return filename, resolve_mime_type(data, declared, filename), data
+
+
+def run_ocr(data: bytes, mime_type: str, filename: str) -> Tuple[str, int]:
+    """استدعاء Mistral OCR بعميل الحاوية المشترك؛ تُرجع (النص، عدد الصفحات)"""
+    # استيراد متأخر: mistralai و httpx لا تُحمّلان إلا عند أول استدعاء
+    from mistral_client import get_client
+
+    client = get_client(MISTRAL_API_KEY)
+    result = ocr_process(client, model=OCR_MODEL, mime_type=mime_type, include_image_base64=False,
+                         data=data, file_name=filename)
+    pages = getattr(result, "pages", None) or []
+    text = "\n\n".join(markdown for markdown in
+                       ((getattr(page, "markdown", "") or "").strip() for page in pages) if markdown)
+    return text, len(pages)
+
+
+def simulate_ocr_result(filename: str) -> str:
+    """نتيجة وضع المحاكاة (OCR_MOCK_MODE) دون استدعاء API"""
+    return (f"# محاكاة نتيجة OCR\n\n"
+            f"هذا نص محاكى للملف {filename}. فعّل MISTRAL_API_KEY وعطّل OCR_MOCK_MODE "
+            f"لاستخراج النص الفعلي.")
+
+
+def handle_ocr(event: Dict[str, Any]) -> Dict[str, Any]:
+    """معالجة طلب دالة: قراءة الملف من الطلب واستخراج نصه"""
+    method = event.get("httpMethod", "POST")
+    if method == "OPTIONS":
+        return {"statusCode": 204, "headers": CORS_HEADERS, "body": ""}
+    if method != "POST":
+        return response(405, {"error": "Method not allowed"})
+
+    try:
+        filename, mime_type, data = read_upload(event)
+    except RequestError as e:
+        return response(e.status, {"error": str(e), "message": str(e)})
+
+    if OCR_MOCK_MODE:
+        return response(200, {
+            "filename": filename,
+            "status": "completed",
+            "extracted_text": simulate_ocr_result(filename),
+            "message": "تم استخراج النص (وضع المحاكاة)",
+        })
+    if not MISTRAL_API_KEY:
+        return response(503, {"error": "MISTRAL_API_KEY غير مضبوط",
+                              "message": "خدمة OCR غير مهيأة (لتجربة الواجهة فعّل OCR_MOCK_MODE=true)"})
+
+    started = time.perf_counter()
+    try:
+        text, pages = run_ocr(data, mime_type, filename)
+    except ImportError as e:
+        logger.error(f"مكتبة Mistral غير مثبتة: {e}")
+        return response(503, {"error": str(e), "message": "مكتبة Mistral غير مثبتة في الدالة"})
+    except Exception as e:
+        # rate_limit تُحمّل عند الخطأ فقط
+        from rate_limit import error_status_code, retry_after_seconds
+
+        status = error_status_code(e)
+        logger.error(f"فشل OCR للملف {filename}: {e}")
+        if status == 429:
+            retry_after = retry_after_seconds(e)
+            return response(503, {"error": "تم تجاوز حد المعدل", "message": "يرجى المحاولة لاحقاً"},
+                            {"Retry-After": str(max(1, int(retry_after or 1)))})
+        return response(502, {"error": str(e), "message": "خطأ في معالجة OCR"})
+
+    logger.info(f"OCR للملف {filename}: {pages} صفحة في {time.perf_counter() - started:.2f} ث")
+    return response(200, {
+        "filename": filename,
+        "status": "completed",
+        "extracted_text": text,
+        "pages": pages,
+        "message": "تم استخراج النص بنجاح",
+    })
@@ -0,0 +1,234 @@
+"""
+تخزين مؤقت لنتائج OCR معنون بالمحتوى (بصمة SHA-256 للملف)
+
+طبقتان:
+- ذاكرة LRU داخل العملية لأسرع استجابة
+- قاعدة SQLite على القرص تبقى بعد إعادة التشغيل، مع حد للحجم ومدة صلاحية
+
+الحجم الكلي وعدد العناصر على القرص تحفظهما مشغلات (triggers) في ocr_cache_meta،
+فلا يحتاج كل تخزين إلى جمع أحجام الجدول، ويبقى المجموع صحيحاً لكل العمليات
+التي تشترك في الملف (عمال الخادم و BatchPdfConv).
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# إعدادات التخزين المؤقت (قابلة للتعديل عبر متغيرات البيئة)
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", "ocr_cache.sqlite3")
+OCR_CACHE_MEMORY_MB = float(os.getenv("OCR_CACHE_MEMORY_MB", "64"))
+OCR_CACHE_MAX_MB = float(os.getenv("OCR_CACHE_MAX_MB", "1024"))
+OCR_CACHE_TTL = int(os.getenv("OCR_CACHE_TTL", str(30 * 24 * 3600)))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path: str) -> str:
+    """حساب بصمة SHA-256 للملف على دفعات دون تحميله كاملاً في الذاكرة"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OCRCache:
+    """
+    تخزين مؤقت بطبقتين لنتائج OCR.
+
+    القيم يجب أن تكون قابلة للتحويل إلى JSON؛ يخزن التطبيق قائمة الصفحات
+    بالشكل [{"index": 0, "markdown": "..."}] حتى يتشارك main.py و
+    BatchPdfConv.py نفس النتائج للملف نفسه.
+    """
+
+    def __init__(self, path: Optional[str] = OCR_CACHE_PATH,
+                 memory_bytes: int = int(OCR_CACHE_MEMORY_MB * 1024 * 1024),
+                 max_disk_bytes: int = int(OCR_CACHE_MAX_MB * 1024 * 1024),
+                 ttl: int = OCR_CACHE_TTL):
+        self.path = path
+        self.memory_bytes = memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memory_size = 0
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+
+        self._db = None
+        if path:
+            try:
+                # timeout: انتظار قفل الكتابة الذي يحجزه عامل آخر بدلاً من الفشل فوراً
+                self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    self._create_schema()
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+                self._db.execute("COMMIT")
+            except sqlite3.Error as e:
+                logger.warning(f"تعذر فتح قاعدة التخزين المؤقت {path}: {e}. سيتم استخدام الذاكرة فقط.")
+                self._db = None
+
+    def _create_schema(self):
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ocr_cache_accessed ON ocr_cache(accessed)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ocr_cache_created ON ocr_cache(created)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_cache_meta ("
+            " id INTEGER PRIMARY KEY CHECK (id = 0),"
+            " items INTEGER NOT NULL,"
+            " size INTEGER NOT NULL)"
+        )
+        # قاعدة أُنشئت قبل المشغلات: المجموع يُحسب مرة واحدة
+        self._db.execute(
+            "INSERT OR IGNORE INTO ocr_cache_meta (id, items, size)"
+            " SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM ocr_cache"
+        )
+        self._db.execute(
+            "CREATE TRIGGER IF NOT EXISTS ocr_cache_added AFTER INSERT ON ocr_cache BEGIN"
+            " UPDATE ocr_cache_meta SET items = items + 1, size = size + NEW.size WHERE id = 0; END"
+        )
+        self._db.execute(
+            "CREATE TRIGGER IF NOT EXISTS ocr_cache_removed AFTER DELETE ON ocr_cache BEGIN"
+            " UPDATE ocr_cache_meta SET items = items - 1, size = size - OLD.size WHERE id = 0; END"
+        )
+        self._db.execute(
+            "CREATE TRIGGER IF NOT EXISTS ocr_cache_resized AFTER UPDATE OF size ON ocr_cache BEGIN"
+            " UPDATE ocr_cache_meta SET size = size - OLD.size + NEW.size WHERE id = 0; END"
+        )
+
+    @staticmethod
+    def make_key(file_hash: str, model: str, include_image_base64: bool, source: str = "ocr") -> str:
+        """
+        بناء مفتاح التخزين من بصمة الملف واسم النموذج وإعداد الصور ومصدر
+        الصفحات: "ocr" لنتيجة OCR كاملة، أو PDF_PAGE_SOURCE (pdf_text) عندما
+        تُستخرج صفحات النص المضمن محلياً.
+        """
+        key = f"{file_hash}:{model}:{int(bool(include_image_base64))}"
+        return key if source == "ocr" else f"{key}:{source}"
+
+    def get(self, key: str) -> Optional[Any]:
+        """إرجاع القيمة المخزنة أو None إذا لم تكن موجودة أو انتهت صلاحيتها"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, size, created = entry
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return value
+                self._drop_memory(key)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, size, created FROM ocr_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    raw, size, created = row
+                    if now - created <= self.ttl:
+                        self._db.execute("UPDATE ocr_cache SET accessed = ? WHERE key = ?", (now, key))
+                        value = json.loads(raw)
+                        self._remember(key, value, size, created)
+                        self._counters["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM ocr_cache WHERE key = ?", (key,))
+
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        """تخزين قيمة في الطبقتين مع تطبيق حدود الحجم"""
+        raw = json.dumps(value, ensure_ascii=False)
+        size = len(raw.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._counters["sets"] += 1
+            self._remember(key, value, size, now)
+            if self._db is None:
+                return
+            try:
+                # upsert وليس REPLACE: الحذف الضمني في REPLACE لا يشغّل مشغل الحذف
+                self._db.execute(
+                    "INSERT INTO ocr_cache (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size,"
+                    " created = excluded.created, accessed = excluded.accessed",
+                    (key, raw, size, now, now),
+                )
+                self._evict_disk(now)
+            except sqlite3.OperationalError as e:
+                # النتيجة مدفوعة: تبقى في الذاكرة بدلاً من إفشال الطلب
+                logger.warning(f"تعذر حفظ نتيجة OCR في التخزين المؤقت على القرص: {e}")
+
+    def _remember(self, key: str, value: Any, size: int, created: float):
+        """إضافة عنصر إلى طبقة الذاكرة وإخراج الأقدم استخداماً عند تجاوز الحد"""
+        if size > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._drop_memory(key)
+        self._memory[key] = (value, size, created)
+        self._memory_size += size
+        while self._memory_size > self.memory_bytes and self._memory:
+            oldest = next(iter(self._memory))
+            self._drop_memory(oldest)
+            self._counters["evictions"] += 1
+
+    def _drop_memory(self, key: str):
+        _, size, _ = self._memory.pop(key)
+        self._memory_size -= size
+
+    def _evict_disk(self, now: float):
+        """حذف العناصر منتهية الصلاحية ثم الأقل استخداماً حتى يعود الحجم تحت الحد"""
+        self._db.execute("DELETE FROM ocr_cache WHERE created < ?", (now - self.ttl,))
+        total = self._db.execute("SELECT size FROM ocr_cache_meta WHERE id = 0").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        excess = total - self.max_disk_bytes
+        freed = 0
+        stale = []
+        for key, size in self._db.execute("SELECT key, size FROM ocr_cache ORDER BY accessed"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany("DELETE FROM ocr_cache WHERE key = ?", stale)
+        self._counters["evictions"] += len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        """عدادات الإصابة والإخفاق وأحجام الطبقتين"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats["memory_items"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_size
+            if self._db is not None:
+                items, size = self._db.execute(
+                    "SELECT items, size FROM ocr_cache_meta WHERE id = 0"
+                ).fetchone()
+                stats["disk_items"] = items
+                stats["disk_bytes"] = size
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,133 @@
+"""
+تجهيز المستندات لاستدعاء Mistral OCR بأقل عدد من النسخ في الذاكرة
+
+- وضع inline: يُبنى data URL من خريطة ذاكرة للملف في مرور واحد؛ ذروة الذاكرة
+  نسختان من الناتج المرمز (المخزن ثم النص النهائي)
+- وضع files: يُرفع الملف عبر Files API كتدفق ثم يُشار إليه بمعرّفه دون base64
+"""
+import os
+import mmap
+import time
+import logging
+import binascii
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# طريقة إرسال المستند: inline (data URL) أو files (Files API)
+OCR_UPLOAD_MODE = os.getenv("OCR_UPLOAD_MODE", "inline").lower()
+
+# حجم الدفعة عند الترميز (يجب أن يكون من مضاعفات 3 حتى لا يظهر حشو في المنتصف)
+ENCODE_CHUNK_SIZE = 3 * 256 * 1024
+
+MIME_TYPES = {
+    '.pdf': 'application/pdf',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+}
+
+
+def mime_type_for(file_path: str) -> str:
+    """تحديد نوع MIME من امتداد الملف"""
+    return MIME_TYPES.get(os.path.splitext(file_path)[1].lower(), 'application/octet-stream')
+
+
+def build_data_url(data, mime_type: str) -> str:
+    """
+    ترميز بيانات (bytes أو mmap أو memoryview) إلى data URL.
+
+    يُحجز مخزن الناتج مرة واحدة بحجمه النهائي ويُملأ على دفعات، بدلاً من
+    نسخ base64 ثم decode ثم f-string (ثلاث نسخ بحجم الناتج).
+
+    ذروة الذاكرة نسختان بحجم الناتج (نحو 2 × 4/3 من حجم الملف): SDK يحتاج
+    str، وتحويل المخزن إليه بـ decode ينسخه، ثم يُحرر المخزن فور العودة.
+    لا توجد طريقة في Python لبناء str من base64 دون وسيط بايتات.
+    """
+    prefix = f"data:{mime_type};base64,".encode("ascii")
+    size = len(data)
+    out = bytearray(len(prefix) + 4 * ((size + 2) // 3))
+    out[:len(prefix)] = prefix
+    pos = len(prefix)
+    view = memoryview(data)
+    try:
+        for start in range(0, size, ENCODE_CHUNK_SIZE):
+            encoded = binascii.b2a_base64(view[start:start + ENCODE_CHUNK_SIZE], newline=False)
+            out[pos:pos + len(encoded)] = encoded
+            pos += len(encoded)
+    finally:
+        view.release()
+    return out.decode("ascii")
+
+
+def data_url_from_file(file_path: str, mime_type: Optional[str] = None) -> str:
+    """بناء data URL لملف عبر خريطة ذاكرة دون قراءته كاملاً إلى bytes"""
+    mime_type = mime_type or mime_type_for(file_path)
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"الملف فارغ: {file_path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return build_data_url(mapped, mime_type)
+
+
+@contextmanager
+def ocr_document(client: Any, mime_type: str, file_path: Optional[str] = None,
+                 data: Optional[bytes] = None, file_name: Optional[str] = None,
+                 mode: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    تجهيز قيمة document لـ client.ocr.process من مسار ملف أو من بايتات.
+
+    في وضع files يُحذف الملف المرفوع من حساب Mistral عند الخروج.
+    """
+    mode = (mode or OCR_UPLOAD_MODE).lower()
+    if mode == "files":
+        name = file_name or (os.path.basename(file_path) if file_path else "document")
+        if file_path:
+            with open(file_path, "rb") as content:
+                uploaded = client.files.upload(
+                    file={"file_name": name, "content": content, "content_type": mime_type},
+                    purpose="ocr"
+                )
+        else:
+            uploaded = client.files.upload(
+                file={"file_name": name, "content": data, "content_type": mime_type},
+                purpose="ocr"
+            )
+        try:
+            yield {"type": "file", "file_id": uploaded.id}
+        finally:
+            try:
+                client.files.delete(file_id=uploaded.id)
+            except Exception as e:
+                logger.warning(f"تعذر حذف الملف المرفوع {uploaded.id}: {e}")
+        return
+
+    url = data_url_from_file(file_path, mime_type) if file_path else build_data_url(data, mime_type)
+    if mime_type == "application/pdf":
+        yield {"type": "document_url", "document_url": url}
+    else:
+        yield {"type": "image_url", "image_url": url}
+
+
+def ocr_process(client: Any, *, model: str, mime_type: str, include_image_base64: bool,
+                file_path: Optional[str] = None, data: Optional[bytes] = None,
+                file_name: Optional[str] = None, timings: Optional[Dict[str, float]] = None) -> Any:
+    """
+    تجهيز المستند واستدعاء client.ocr.process (دالة متزامنة لتُشغَّل في خيط عامل).
+
+    إذا مُرر القاموس timings تُسجل فيه مدة الترميز (encode) والاستدعاء (api) بالثواني.
+    """
+    started = time.perf_counter()
+    with ocr_document(client, mime_type, file_path=file_path, data=data, file_name=file_name) as document:
+        encoded = time.perf_counter()
+        try:
+            return client.ocr.process(
+                model=model,
+                document=document,
+                include_image_base64=include_image_base64
+            )
+        finally:
+            if timings is not None:
+                timings["encode"] = encoded - started
+                timings["api"] = time.perf_counter() - encoded
@@ -0,0 +1,287 @@
+"""
+مهام OCR غير المتزامنة: مخزن حالة المهام وعمال الخلفية
+
+يُرجع POST /api/jobs معرّف المهمة فوراً، وتُنفَّذ المعالجة في الخلفية بينما
+يستعلم العميل عن الحالة والتقدم ثم يجلب النتيجة.
+
+عمليات JobStore متزامنة (قد تنتظر قفل SQLite حتى 30 ثانية)، فتُستدعى من حلقة
+الأحداث عبر asyncio.to_thread.
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from work_queue import worker_id
+
+logger = logging.getLogger(__name__)
+
+# إعدادات المهام (قابلة للتعديل عبر متغيرات البيئة)
+OCR_JOBS_DB = os.getenv("OCR_JOBS_DB", "")
+OCR_JOB_WORKERS = int(os.getenv("OCR_JOB_WORKERS", "4"))
+OCR_JOBS_MAX_QUEUE = int(os.getenv("OCR_JOBS_MAX_QUEUE", "100"))
+OCR_JOBS_TTL = int(os.getenv("OCR_JOBS_TTL", "3600"))
+
+# حالات المهمة
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+UNFINISHED = (QUEUED, RUNNING)
+
+QUEUE_FULL_MESSAGE = "طابور المهام ممتلئ، يرجى المحاولة لاحقاً"
+
+
+def worker_alive(worker: Optional[str]) -> bool:
+    """
+    هل ما زالت عملية العامل (الجهاز:العملية من worker_id) حية؟ عامل جهاز آخر
+    لا يمكن فحصه فيُعد حياً.
+    """
+    host, _, pid = (worker or "").rpartition(":")
+    if host != socket.gethostname():
+        return bool(host)
+    try:
+        os.kill(int(pid), 0)
+    except (ProcessLookupError, ValueError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueueFull(Exception):
+    """يُرفع عند امتلاء طابور المهام"""
+
+
+class JobStore:
+    """
+    مخزن حالة المهام داخل العملية، أو في ملف SQLite محلي (OCR_JOBS_DB) حتى
+    تبقى النتائج متاحة بعد إعادة التشغيل ولكل عمال الخادم: المهمة تُنفذ في
+    العامل الذي استقبلها، وحالتها تُقرأ من القاعدة في أي عامل.
+    """
+
+    def __init__(self, path: Optional[str] = OCR_JOBS_DB, ttl: int = OCR_JOBS_TTL):
+        self.ttl = ttl
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_jobs ("
+                " id TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " pages_done INTEGER NOT NULL DEFAULT 0,"
+                " updated REAL NOT NULL)"
+            )
+            # عداد الصفحات عمود مستقل: تحديث التقدم لا يعيد كتابة JSON المهمة
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(ocr_jobs)")}
+            if "pages_done" not in columns:
+                self._db.execute("ALTER TABLE ocr_jobs ADD COLUMN pages_done INTEGER NOT NULL DEFAULT 0")
+                self._db.execute("UPDATE ocr_jobs SET pages_done = COALESCE(json_extract(data, '$.pages_done'), 0)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS ocr_jobs_updated ON ocr_jobs(updated)")
+
+    def create(self, filename: str) -> Dict[str, Any]:
+        """إنشاء مهمة جديدة بحالة الانتظار، ينفذها هذا العامل"""
+        now = time.time()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "filename": filename,
+            "worker": worker_id(),
+            "status": QUEUED,
+            "pages_done": 0,
+            "pages_total": None,
+            "error": None,
+            "created": now,
+            "started": None,
+            "finished": None,
+            "result": None,
+        }
+        with self._lock:
+            if self._db is None:
+                self._jobs[job["job_id"]] = job
+            self._persist(job, now)
+        return dict(job)
+
+    def update(self, job_id: str, **fields) -> Optional[Dict[str, Any]]:
+        """تحديث حقول المهمة"""
+        now = time.time()
+        with self._lock:
+            job = self._load(job_id)
+            if job is None:
+                return None
+            job.update(fields)
+            self._persist(job, now)
+            return dict(job)
+
+    def add_pages(self, job_id: str, count: int):
+        """زيادة عدد الصفحات المنجزة (عمود العداد فقط)"""
+        with self._lock:
+            if self._db is None:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job["pages_done"] += count
+            else:
+                self._db.execute("UPDATE ocr_jobs SET pages_done = pages_done + ?, updated = ? WHERE id = ?",
+                                 (count, time.time(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._load(job_id)
+            return dict(job) if job is not None else None
+
+    def recover(self, is_alive: Callable[[Optional[str]], bool] = worker_alive) -> int:
+        """
+        المهام المنتظرة أو الجارية التي توقف عاملها (إعادة تشغيل الخادم) لن
+        ينفذها أحد، فتُعلَّم فاشلة حتى لا يرى العميل "جارية" إلى الأبد. تُرجع عددها.
+        """
+        now = time.time()
+        recovered = 0
+        with self._lock:
+            if self._db is None:
+                jobs = [job for job in self._jobs.values() if job["status"] in UNFINISHED]
+            else:
+                rows = self._db.execute(
+                    "SELECT data, pages_done FROM ocr_jobs WHERE json_extract(data, '$.status') IN (?, ?)",
+                    UNFINISHED).fetchall()
+                jobs = [dict(json.loads(data), pages_done=pages_done) for data, pages_done in rows]
+            for job in jobs:
+                if is_alive(job.get("worker")):
+                    continue
+                job.update(status=FAILED, error="أُعيد تشغيل الخادم قبل اكتمال المهمة، يرجى إعادة إرسالها",
+                           finished=now)
+                self._persist(job, now)
+                recovered += 1
+        return recovered
+
+    def purge(self):
+        """حذف المهام المنتهية التي تجاوزت مدة الاحتفاظ"""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job["finished"] is not None and job["finished"] < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+            if self._db is not None:
+                self._db.execute("DELETE FROM ocr_jobs WHERE updated < ? AND json_extract(data, '$.finished') IS NOT NULL",
+                                 (cutoff,))
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # القاعدة هي المصدر الوحيد عند وجودها، فقد يحدّث المهمة عامل آخر
+        if self._db is None:
+            return self._jobs.get(job_id)
+        row = self._db.execute("SELECT data, pages_done FROM ocr_jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(json.loads(row[0]), pages_done=row[1]) if row is not None else None
+
+    def _persist(self, job: Dict[str, Any], now: float):
+        if self._db is not None:
+            data = {key: value for key, value in job.items() if key != "pages_done"}
+            self._db.execute(
+                "INSERT OR REPLACE INTO ocr_jobs (id, data, pages_done, updated) VALUES (?, ?, ?, ?)",
+                (job["job_id"], json.dumps(data, ensure_ascii=False), job["pages_done"], now),
+            )
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class JobRunner:
+    """
+    عمال خلفية يسحبون المهام من طابور محدود وينفذون دالة المعالجة.
+
+    تستقبل دالة المعالجة (job_id, filename, on_pages) وتُرجع النص المستخرج؛
+    on_pages(total=None, done=0) تُحدّث تقدم الصفحات.
+    """
+
+    def __init__(self, store: JobStore,
+                 handler: Callable[[str, str, Callable[..., None]], Awaitable[str]],
+                 workers: int = OCR_JOB_WORKERS, max_queue: int = OCR_JOBS_MAX_QUEUE):
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, filename: str) -> Dict[str, Any]:
+        """إنشاء مهمة ووضعها في الطابور دون انتظار تنفيذها"""
+        if self._queue.full():
+            raise JobQueueFull(QUEUE_FULL_MESSAGE)
+        job = await asyncio.to_thread(self._create, filename)
+        try:
+            self._queue.put_nowait(job["job_id"])
+        except asyncio.QueueFull:
+            # امتلأ الطابور بطلبات أخرى أثناء إنشاء المهمة
+            await asyncio.to_thread(self.store.update, job["job_id"], status=FAILED,
+                                    error=QUEUE_FULL_MESSAGE, finished=time.time())
+            raise JobQueueFull(QUEUE_FULL_MESSAGE)
+        return job
+
+    def _create(self, filename: str) -> Dict[str, Any]:
+        self.store.purge()
+        return self.store.create(filename)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await asyncio.to_thread(self.store.update, job_id, status=RUNNING, started=time.time())
+        if job is None:
+            return
+
+        # on_pages تُستدعى من حلقة الأحداث: الكتابة في خيط دون انتظارها،
+        # والكتابات المعلقة تُنتظر قبل تسجيل النتيجة
+        writes: Set[asyncio.Future] = set()
+
+        def write(func: Callable[..., Any], *args, **kwargs):
+            future = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+            writes.add(future)
+            future.add_done_callback(writes.discard)
+
+        def on_pages(total: Optional[int] = None, done: int = 0):
+            if total is not None:
+                write(self.store.update, job_id, pages_total=total)
+            if done:
+                write(self.store.add_pages, job_id, done)
+
+        try:
+            result = await self.handler(job_id, job["filename"], on_pages)
+            await asyncio.gather(*writes)
+        except asyncio.CancelledError:
+            # إيقاف الخادم: تسجيل الفشل مباشرة قبل إغلاق المخزن
+            self.store.update(job_id, status=FAILED, error="تم إيقاف الخادم", finished=time.time())
+            raise
+        except Exception as e:
+            logger.error(f"فشلت المهمة {job_id}: {e}")
+            await asyncio.gather(*writes, return_exceptions=True)
+            await asyncio.to_thread(self.store.update, job_id, status=FAILED, error=str(e),
+                                    finished=time.time())
+            return
+
+        current = await asyncio.to_thread(self.store.get, job_id) or {}
+        pages_total = current.get("pages_total")
+        await asyncio.to_thread(
+            self.store.update, job_id, status=COMPLETED, result=result, finished=time.time(),
+            pages_done=pages_total if pages_total is not None else current.get("pages_done", 0))
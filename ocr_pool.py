@@ -0,0 +1,118 @@
+"""
+مجمع عمال محدود لتشغيل استدعاءات Mistral OCR المتزامنة خارج حلقة الأحداث
+"""
+import asyncio
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# إعدادات المجمع (قابلة للتعديل عبر متغيرات البيئة)
+OCR_MAX_CONCURRENCY = int(os.getenv("OCR_MAX_CONCURRENCY", "4"))
+OCR_MAX_QUEUE = int(os.getenv("OCR_MAX_QUEUE", "16"))
+OCR_RETRY_AFTER = int(os.getenv("OCR_RETRY_AFTER", "5"))
+
+
+class OCRPoolFull(Exception):
+    """يُرفع عندما تكون جميع العمال مشغولة وطابور الانتظار ممتلئاً"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("الخادم مشغول حالياً، يرجى المحاولة لاحقاً")
+        self.retry_after = retry_after
+
+
+class OCRWorkerPool:
+    """
+    مجمع عمال بحد أقصى للتزامن وعمق طابور الانتظار.
+
+    تُنفَّذ الاستدعاءات المتزامنة (مثل client.ocr.process) في خيوط منفصلة حتى
+    لا تتوقف حلقة الأحداث، ويُرفض أي طلب يتجاوز السعة فوراً بـ OCRPoolFull
+    بدلاً من تكدسه.
+
+    المستند متعدد المجموعات يُقبل أو يُرفض مرة واحدة (admit)، ثم تنتظر مجموعاته
+    مكاناً في الطابور (run_admitted) حتى لا تضيع المجموعات التي دُفع ثمنها.
+    """
+
+    def __init__(self, max_concurrency: int = OCR_MAX_CONCURRENCY,
+                 max_queue: int = OCR_MAX_QUEUE,
+                 retry_after: int = OCR_RETRY_AFTER):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="ocr-worker"
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._freed = asyncio.Event()
+        self._waiting = 0
+        self._pending = 0
+        self._in_flight = 0
+        self._rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        """السعة الكلية: العمال النشطون + طابور الانتظار"""
+        return self.max_concurrency + self.max_queue
+
+    def admit(self):
+        """
+        قبول عمل جديد أو رفضه فوراً بـ OCRPoolFull إذا كان المجمع ممتلئاً،
+        أو كانت مجموعات مستند مقبول تنتظر مكاناً (لها الأولوية).
+        """
+        if self._pending >= self.capacity or self._waiting:
+            self._rejected += 1
+            logger.warning(
+                f"رفض طلب OCR: المجمع ممتلئ ({self._in_flight} قيد التنفيذ، "
+                f"{self._pending - self._in_flight} في الانتظار)"
+            )
+            raise OCRPoolFull(self.retry_after)
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """تنفيذ دالة متزامنة في المجمع مع احترام حدود التزامن والطابور"""
+        self.admit()
+        return await self._run(func, *args, **kwargs)
+
+    async def run_admitted(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """مثل run لعمل ضمن مستند مقبول: ينتظر مكاناً في الطابور بدلاً من الرفض"""
+        self._waiting += 1
+        try:
+            while self._pending >= self.capacity:
+                self._freed.clear()
+                await self._freed.wait()
+        finally:
+            self._waiting -= 1
+        return await self._run(func, *args, **kwargs)
+
+    async def _run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        self._pending += 1
+        try:
+            async with self._semaphore:
+                self._in_flight += 1
+                try:
+                    loop = asyncio.get_running_loop()
+                    return await loop.run_in_executor(
+                        self._executor, partial(func, *args, **kwargs)
+                    )
+                finally:
+                    self._in_flight -= 1
+        finally:
+            self._pending -= 1
+            self._freed.set()
+
+    def stats(self) -> Dict[str, int]:
+        """إحصائيات المجمع الحالية"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queued": self._pending - self._in_flight,
+            "waiting": self._waiting,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self):
+        """إيقاف الخيوط عند إغلاق التطبيق"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
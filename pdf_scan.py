@@ -0,0 +1,112 @@
+"""
+مسح تزايدي لمجلد ملفات PDF مع كشف التغييرات
+
+يُقارن كل ملف بفهرس المسح السابق (الحجم، وقت التعديل، البصمة):
+- الملفات التي لم يتغير حجمها ووقت تعديلها لا تُقرأ، فتكلفة التجزئة بقدر ما تغير فقط
+- الملفات الجديدة أو المعدلة تُجزأ بـ SHA-256
+- الملف الجديد الذي تطابق بصمته ملفاً اختفى في المسح نفسه يُعد إعادة تسمية/نقلاً
+"""
+import os
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# (الحجم، وقت التعديل بالنانوثانية، البصمة)
+IndexEntry = Tuple[int, int, str]
+
+
+def iter_pdfs(root: str) -> Iterator[Tuple[str, int, int]]:
+    """(المسار النسبي، الحجم، وقت التعديل بالنانوثانية) لكل PDF تحت root باستخدام os.scandir"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith('.pdf') and entry.is_file():
+                        stat = entry.stat()
+                        yield os.path.relpath(entry.path, root), stat.st_size, stat.st_mtime_ns
+        except OSError:
+            # مجلد حُذف أو لا يمكن قراءته أثناء المسح
+            continue
+
+
+class ScanResult:
+    """نتيجة مسح: الفهرس الجديد والتغييرات مقارنة بالفهرس السابق"""
+
+    def __init__(self):
+        self.index: Dict[str, IndexEntry] = {}
+        self.updated: Dict[str, IndexEntry] = {}  # مدخلات الفهرس الجديدة أو المتغيرة
+        self.added: List[str] = []
+        self.modified: List[str] = []
+        self.renamed: List[Tuple[str, str]] = []  # (المسار القديم، المسار الجديد)
+        self.removed: List[str] = []
+        self.unchanged = 0
+        self.hashed = 0
+        self.skipped = 0  # ملفات حديثة جداً قد تكون قيد النسخ
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.modified or self.renamed or self.removed)
+
+    def summary(self) -> str:
+        return (f"{len(self.index)} files: {len(self.added)} new, {len(self.modified)} modified, "
+                f"{len(self.renamed)} renamed, {len(self.removed)} removed, {self.unchanged} unchanged "
+                f"({self.hashed} hashed)")
+
+
+def scan_pdfs(root: str, previous: Dict[str, IndexEntry], hash_func: Callable[[str], str],
+              min_age: float = 0.0, now: Optional[float] = None) -> ScanResult:
+    """
+    مسح root ومقارنته بالفهرس السابق.
+
+    الملفات التي عُدلت قبل أقل من min_age ثانية تُتجاهل في هذا المسح (قد تكون
+    قيد النسخ) وتظهر كجديدة في مسح لاحق.
+    """
+    result = ScanResult()
+    now = now if now is not None else time.time()
+    fresh: List[str] = []
+    for path, size, mtime_ns in iter_pdfs(root):
+        if min_age and now - mtime_ns / 1e9 < min_age:
+            old = previous.get(path)
+            if old is not None:
+                # إبقاء المدخل القديم حتى يستقر الملف، فلا يُعد محذوفاً
+                result.index[path] = old
+            result.skipped += 1
+            continue
+        old = previous.get(path)
+        if old is not None and old[0] == size and old[1] == mtime_ns:
+            result.index[path] = old
+            result.unchanged += 1
+            continue
+        try:
+            sha256 = hash_func(os.path.join(root, path))
+        except OSError:
+            if old is not None:
+                result.index[path] = old
+            continue
+        result.hashed += 1
+        result.index[path] = result.updated[path] = (size, mtime_ns, sha256)
+        if old is None:
+            fresh.append(path)
+        elif old[2] == sha256:
+            # لمس الملف دون تغيير محتواه
+            result.unchanged += 1
+        else:
+            result.modified.append(path)
+
+    gone = {path: entry[2] for path, entry in previous.items() if path not in result.index}
+    by_hash: Dict[str, List[str]] = {}
+    for path, sha256 in gone.items():
+        by_hash.setdefault(sha256, []).append(path)
+    for path in fresh:
+        candidates = by_hash.get(result.index[path][2])
+        if candidates:
+            old_path = candidates.pop()
+            del gone[old_path]
+            result.renamed.append((old_path, path))
+        else:
+            result.added.append(path)
+    result.removed = sorted(gone)
+    return result
@@ -0,0 +1,108 @@
+"""
+تقسيم ملفات PDF الكبيرة إلى مجموعات صفحات لمعالجتها بالتوازي
+"""
+import io
+import os
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# محاولة استيراد pypdf (اختياري: بدونه يُرسل الملف كاملاً في طلب واحد)
+try:
+    from pypdf import PdfReader, PdfWriter
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+# عدد الصفحات في كل مجموعة (0 لتعطيل التقسيم)
+OCR_PDF_CHUNK_PAGES = int(os.getenv("OCR_PDF_CHUNK_PAGES", "25"))
+# عدد المجموعات المعالجة بالتوازي للمستند الواحد
+OCR_PDF_CHUNK_CONCURRENCY = int(os.getenv("OCR_PDF_CHUNK_CONCURRENCY", "4"))
+# عدد مرات إعادة محاولة المجموعة الفاشلة
+OCR_PDF_CHUNK_RETRIES = int(os.getenv("OCR_PDF_CHUNK_RETRIES", "2"))
+# حجم المجموعة عند بث الصفحات (أصغر حتى تصل الصفحات الأولى أسرع)
+OCR_STREAM_CHUNK_PAGES = int(os.getenv("OCR_STREAM_CHUNK_PAGES", "4"))
+
+
+def split_pdf(file_path: str, chunk_pages: int = OCR_PDF_CHUNK_PAGES) -> Optional[List[Tuple[int, bytes]]]:
+    """
+    تقسيم ملف PDF إلى مجموعات من chunk_pages صفحة.
+
+    تُرجع قائمة (رقم أول صفحة، بايتات المجموعة)، أو None إذا كان الملف صغيراً
+    بما يكفي لطلب واحد أو تعذر التقسيم (pypdf غير مثبت أو ملف تالف).
+    """
+    if not PYPDF_AVAILABLE or chunk_pages <= 0:
+        return None
+    try:
+        reader = PdfReader(file_path)
+        total = len(reader.pages)
+        if total <= chunk_pages:
+            return None
+
+        chunks = []
+        for start in range(0, total, chunk_pages):
+            writer = PdfWriter()
+            for page in reader.pages[start:start + chunk_pages]:
+                writer.add_page(page)
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            chunks.append((start, buffer.getvalue()))
+        logger.info(f"تقسيم {file_path} ({total} صفحة) إلى {len(chunks)} مجموعة")
+        return chunks
+    except Exception as e:
+        logger.warning(f"تعذر تقسيم {file_path}، سيُرسل كاملاً: {e}")
+        return None
+
+
+def split_pdf_pages(file_path: str, page_indices: List[int],
+                    chunk_pages: int = OCR_PDF_CHUNK_PAGES) -> List[Tuple[int, bytes]]:
+    """
+    استخراج صفحات محددة فقط إلى مجموعات (رقم أول صفحة، بايتات المجموعة).
+
+    كل مجموعة صفحات متتالية في المستند الأصلي، فيبقى offset_pages صحيحاً؛
+    والمتتاليات الطويلة تُقسم إلى chunk_pages صفحة على الأكثر.
+    """
+    reader = PdfReader(file_path)
+    chunk_pages = chunk_pages if chunk_pages > 0 else len(reader.pages)
+    runs: List[List[int]] = []
+    for index in sorted(page_indices):
+        if runs and index == runs[-1][-1] + 1 and len(runs[-1]) < chunk_pages:
+            runs[-1].append(index)
+        else:
+            runs.append([index])
+
+    chunks = []
+    for run in runs:
+        writer = PdfWriter()
+        for index in run:
+            writer.add_page(reader.pages[index])
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        chunks.append((run[0], buffer.getvalue()))
+    return chunks
+
+
+def offset_pages(response: Any, first_page: int) -> List[Dict[str, Any]]:
+    """تحويل صفحات استجابة مجموعة إلى قائمة صفحات بأرقامها في المستند الأصلي"""
+    return [
+        {"index": first_page + page.index, "markdown": page.markdown}
+        for page in response.pages
+    ]
+
+
+def merge_pages(chunk_pages: Iterable[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """دمج صفحات المجموعات بترتيب الصفحات الأصلي"""
+    pages = [page for chunk in chunk_pages for page in chunk]
+    pages.sort(key=lambda page: page["index"])
+    return pages
+
+
+def count_pdf_pages(file_path: str) -> Optional[int]:
+    """عدد صفحات ملف PDF، أو None إذا تعذر حسابه"""
+    if not PYPDF_AVAILABLE:
+        return None
+    try:
+        return len(PdfReader(file_path).pages)
+    except Exception:
+        return None
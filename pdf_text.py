@@ -0,0 +1,104 @@
+"""
+استخراج طبقة النص المضمنة في صفحات PDF (المستندات الرقمية) دون OCR
+
+كل صفحة تُفحص قبل قبول نصها:
+- عدد أحرف كافٍ (الصفحات الممسوحة أو المصورة بلا نص تذهب إلى OCR)
+- لا رموز تالفة (U+FFFD، أحرف الاستخدام الخاص، (cid:N)) ولا نسبة رموز غير حرفية عالية
+- النص العربي: أشكال العرض (Presentation Forms) تُحوَّل إلى الحروف الأساسية، ويُرفض
+  النص المقطع إلى حروف منفصلة أو المخزن بالترتيب المرئي (معكوساً)
+
+الصفحات المرفوضة تُرسل إلى OCR، ثم تُدمج كل الصفحات بترتيب المستند.
+"""
+import os
+import re
+import logging
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+from pdf_split import PYPDF_AVAILABLE
+
+if PYPDF_AVAILABLE:
+    from pypdf import PdfReader
+
+logger = logging.getLogger(__name__)
+
+# تفعيل المسار السريع للنص المضمن
+OCR_NATIVE_TEXT = os.getenv("OCR_NATIVE_TEXT", "true").lower() in ("1", "true", "yes")
+# أقل عدد أحرف (غير المسافات) لقبول نص الصفحة
+OCR_NATIVE_MIN_CHARS = int(os.getenv("OCR_NATIVE_MIN_CHARS", "80"))
+# مصدر صفحات PDF في مفتاح التخزين المؤقت (OCRCache.make_key): نتيجة المسار السريع
+# (نص مضمن + OCR) لا تُخلط بنتيجة OCR الكاملة للملف نفسه أو بحد أحرف مختلف
+PDF_PAGE_SOURCE = f"text{OCR_NATIVE_MIN_CHARS}+ocr" if OCR_NATIVE_TEXT else "ocr"
+
+_PRESENTATION_FORMS = re.compile("[\uFB50-\uFDFF\uFE70-\uFEFF]")
+_GARBAGE = re.compile("[\uFFFD\uE000-\uF8FF]|\\(cid:\\d+\\)")
+_ARABIC_WORD = re.compile("[\u0621-\u064A]+")
+# حروف لا تأتي إلا في آخر الكلمة (التاء المربوطة والألف المقصورة)
+_FINAL_ONLY = "ةى"
+
+
+def normalize_text(text: str) -> str:
+    """تحويل أشكال العرض العربية إلى الحروف الأساسية وحذف المسافات الزائدة في نهاية الأسطر"""
+    if _PRESENTATION_FORMS.search(text):
+        text = unicodedata.normalize("NFKC", text)
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+
+def text_problem(text: str, min_chars: int = OCR_NATIVE_MIN_CHARS) -> Optional[str]:
+    """سبب رفض نص الصفحة، أو None إذا كان صالحاً للاستخدام دون OCR"""
+    chars = [c for c in text if not c.isspace()]
+    if len(chars) < min_chars:
+        return "empty"
+    if len(_GARBAGE.findall(text)) > 0.02 * len(chars):
+        return "garbled"
+    if sum(c.isalnum() for c in chars) < 0.6 * len(chars):
+        return "garbled"
+
+    words = _ARABIC_WORD.findall(text)
+    if len(words) >= 5:
+        # حروف منفصلة بمسافات: تشكيل الحروف تعطل عند الاستخراج
+        if sum(len(word) == 1 for word in words) > 0.3 * len(words):
+            return "broken_shaping"
+        # الترتيب المرئي (من اليسار لليمين) يعكس الكلمات: "ة" في أولها و"لا" في آخرها
+        forward = sum(word[-1] in _FINAL_ONLY for word in words) + \
+            sum(len(word) > 3 and word.startswith("ال") for word in words)
+        backward = sum(word[0] in _FINAL_ONLY for word in words) + \
+            sum(len(word) > 3 and word.endswith("لا") for word in words)
+        if backward >= 3 and backward > forward:
+            return "reversed_rtl"
+    return None
+
+
+def split_text_layer(file_path: str, min_chars: int = OCR_NATIVE_MIN_CHARS
+                     ) -> Optional[Tuple[List[Dict[str, Any]], List[int], Dict[str, int]]]:
+    """
+    فصل صفحات PDF ذات النص المضمن الصالح عن الصفحات التي تحتاج OCR.
+
+    تُرجع (الصفحات المستخرجة {"index", "markdown"}، أرقام الصفحات المتبقية
+    لـ OCR، عدد الصفحات المرفوضة لكل سبب)، أو None إذا تعذرت القراءة (pypdf غير مثبت أو ملف تالف)، فيُرسل
+    الملف كاملاً إلى OCR كما في السابق.
+    """
+    if not PYPDF_AVAILABLE:
+        return None
+    try:
+        reader = PdfReader(file_path)
+        native: List[Dict[str, Any]] = []
+        scanned: List[int] = []
+        rejected: Dict[str, int] = {}
+        for index, page in enumerate(reader.pages):
+            try:
+                text = normalize_text(page.extract_text() or "")
+            except Exception:
+                text = ""
+            problem = text_problem(text, min_chars)
+            if problem is None:
+                native.append({"index": index, "markdown": text})
+            else:
+                scanned.append(index)
+                rejected[problem] = rejected.get(problem, 0) + 1
+        logger.info(f"طبقة النص في {file_path}: {len(native)} صفحة مستخرجة، "
+                    f"{len(scanned)} صفحة إلى OCR {rejected or ''}")
+        return native, scanned, rejected
+    except Exception as e:
+        logger.warning(f"تعذر قراءة طبقة النص في {file_path}، سيُعالج بـ OCR كاملاً: {e}")
+        return None
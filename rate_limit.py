@@ -0,0 +1,193 @@
+"""
+أدوات التحكم في معدل الطلبات إلى Mistral API
+
+- TokenBucket: دلو رموز لعدد الطلبات في الثانية
+- RateLimiter: دلو رموز + حد للطلبات المتزامنة + تكيّف تلقائي مع ردود 429
+- retry_delay: سياسة إعادة المحاولة المشتركة (main و BatchPdfConv و SDK في mistral_client)
+"""
+import re
+import time
+import random
+import threading
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+# تأخير إعادة المحاولة: أُسّي من RETRY_INITIAL_SECONDS حتى RETRY_MAX_SECONDS
+RETRY_INITIAL_SECONDS = 0.5
+RETRY_MAX_SECONDS = 30.0
+
+
+def error_status_code(error: Exception) -> Optional[int]:
+    """استخراج رمز حالة HTTP من خطأ SDK إن وُجد"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "raw_response", None), "status_code", None)
+    if status is None:
+        match = re.search(r"\bStatus (\d{3})\b", str(error))
+        if match:
+            status = int(match.group(1))
+    return status
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """هل الخطأ ناتج عن تجاوز حد المعدل (429)؟"""
+    return error_status_code(error) == 429 or "rate limit" in str(error).lower()
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """قراءة ترويسة Retry-After (ثوانٍ أو تاريخ HTTP) من خطأ SDK"""
+    headers = getattr(error, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(error, "raw_response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """خطأ المصادقة (401) لا تصلحه إعادة المحاولة"""
+    return error_status_code(error) != 401
+
+
+def retry_delay(attempt: int, error: Optional[Exception] = None) -> float:
+    """
+    مدة الانتظار قبل المحاولة attempt + 1: تأخير أُسّي محدود بتذبذب عشوائي (حتى لا
+    تعود المحاولات المتزامنة معاً)، ولا يقل عن Retry-After عند رد 429.
+    """
+    delay = min(RETRY_MAX_SECONDS, RETRY_INITIAL_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.5)
+    if error is not None and is_rate_limited(error):
+        delay = max(delay, retry_after_seconds(error) or 0)
+    return delay
+
+
+class TokenBucket:
+    """دلو رموز آمن للخيوط: rate رمز في الثانية بسعة capacity"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """محاولة أخذ رموز؛ تُرجع 0 عند النجاح أو مدة الانتظار اللازمة بالثواني"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            if self.rate <= 0:
+                return float("inf")
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0):
+        """الانتظار حتى تتوفر الرموز"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return
+            time.sleep(min(wait, 1.0))
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+
+class RateLimiter:
+    """
+    محدد معدل متكيف للطلبات المتزامنة.
+
+    يجمع بين دلو رموز (طلبات في الثانية) وحد للطلبات قيد التنفيذ. عند ورود
+    429 يتوقف جميع العمال حتى انقضاء Retry-After ويُخفَّض المعدل إلى النصف،
+    ثم يرتفع تدريجياً مع كل نجاح حتى يعود إلى الحد الأقصى (AIMD).
+    """
+
+    def __init__(self, rate: float, max_in_flight: int = 1,
+                 min_rate: Optional[float] = None, initial_backoff: float = 1.0,
+                 max_backoff: float = 60.0):
+        self.max_rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.bucket = TokenBucket(rate)
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._backoff = initial_backoff
+        self.rate_limited_count = 0
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def pause_remaining(self) -> float:
+        with self._lock:
+            return max(0.0, self._paused_until - time.monotonic())
+
+    def acquire(self):
+        """الانتظار حتى انتهاء أي توقف مؤقت ثم أخذ رمز ومقعد تنفيذ"""
+        self._slots.acquire()
+        try:
+            while True:
+                pause = self.pause_remaining()
+                if pause > 0:
+                    time.sleep(min(pause, 1.0))
+                    continue
+                wait = self.bucket.try_acquire()
+                if wait == 0:
+                    return
+                time.sleep(min(wait, 1.0))
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self):
+        self._slots.release()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_success(self):
+        """زيادة المعدل تدريجياً بعد كل طلب ناجح"""
+        with self._lock:
+            self._backoff = self.initial_backoff
+            rate = self.bucket.rate
+        if rate < self.max_rate:
+            self.bucket.set_rate(min(self.max_rate, rate + self.max_rate / 10))
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> float:
+        """تسجيل رد 429: إيقاف الجميع مؤقتاً وخفض المعدل. تُرجع مدة التوقف"""
+        with self._lock:
+            self.rate_limited_count += 1
+            if retry_after is None:
+                delay = self._backoff
+                self._backoff = min(self.max_backoff, self._backoff * 2)
+            else:
+                delay = retry_after
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            rate = self.bucket.rate
+        self.bucket.set_rate(max(self.min_rate, rate / 2))
+        return delay
@@ -0,0 +1,152 @@
+"""
+بث نتائج OCR صفحة بصفحة (Markdown أو NDJSON) مع ضغط gzip/br اختياري
+
+النتيجة لا تُجمع في نص واحد: كل صفحة تُرمَّز وتُضغط وتُرسل فور وصول دورها في
+الترتيب، فيبقى استهلاك الذاكرة ثابتاً تقريباً مهما كان حجم المستند.
+"""
+import json
+import zlib
+import heapq
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+# محاولة استيراد brotli (اختياري: بدونه يُستخدم gzip فقط)
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+MEDIA_TYPES = {
+    "markdown": "text/markdown; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# مستوى ضغط متوسط: البث يفضل السرعة على أقصى نسبة ضغط
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def join_pages(pages: Iterable[Dict[str, Any]]) -> str:
+    """دمج نصوص الصفحات بنسخة واحدة (بدلاً من += ثم strip)"""
+    return "\n\n".join(text for text in (page["markdown"].strip() for page in pages) if text)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """اختيار ترميز الضغط من ترويسة Accept-Encoding (br ثم gzip)"""
+    accepted = set()
+    for part in (accept_encoding or "").lower().split(","):
+        name, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            accepted.add(name)
+    if BROTLI_AVAILABLE and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class StreamCompressor:
+    """ضغط تزايدي: كل دفعة تُفرَّغ فوراً (sync flush) حتى يستلمها العميل دون انتظار النهاية"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31: ترويسة وذيل gzip
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+async def ordered_pages(pages: AsyncIterator[Dict[str, Any]], first_index: int = 0
+                        ) -> AsyncIterator[Dict[str, Any]]:
+    """
+    إعادة ترتيب الصفحات الواصلة بأي ترتيب (مجموعات متوازية) حسب رقمها.
+
+    تُحتجز فقط الصفحات التي وصلت قبل دورها؛ ما بقي عند النهاية (أرقام ناقصة)
+    يُرسل مرتباً.
+    """
+    expected = first_index
+    waiting: List[Tuple[int, int, Dict[str, Any]]] = []
+    counter = 0
+    async for page in pages:
+        counter += 1
+        heapq.heappush(waiting, (page["index"], counter, page))
+        while waiting and waiting[0][0] <= expected:
+            page = heapq.heappop(waiting)[2]
+            expected = page["index"] + 1
+            yield page
+    while waiting:
+        yield heapq.heappop(waiting)[2]
+
+
+def format_page(page: Dict[str, Any], output_format: str, first: bool) -> bytes:
+    """ترميز صفحة واحدة: سطر JSON في NDJSON، أو نص الصفحة مسبوقاً بفاصل في Markdown"""
+    if output_format == "ndjson":
+        return (json.dumps({"index": page["index"], "markdown": page["markdown"]}, ensure_ascii=False) + "\n").encode("utf-8")
+    text = page["markdown"].strip()
+    if not text:
+        return b""
+    return (text if first else "\n\n" + text).encode("utf-8")
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """تنسيق حدث Server-Sent Events (json.dumps يضمن بقاء البيانات في سطر واحد)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def encode_pages(pages: AsyncIterator[Dict[str, Any]], output_format: str,
+                       encoding: Optional[str] = None, stats: Optional[Dict[str, int]] = None
+                       ) -> AsyncIterator[bytes]:
+    """
+    تحويل الصفحات المرتبة إلى دفعات بايتات مضغوطة (أو غير مضغوطة) للبث.
+    stats تُحدَّث بعدد الصفحات والبايتات قبل الضغط.
+
+    في NDJSON يُضاف سطر {"error": ...} إذا فشلت المعالجة بعد إرسال صفحات.
+    """
+    compressor = StreamCompressor(encoding) if encoding else None
+    stats = stats if stats is not None else {}
+    stats.setdefault("pages", 0)
+    stats.setdefault("bytes", 0)
+    first = True
+    try:
+        async for page in pages:
+            data = format_page(page, output_format, first)
+            stats["pages"] += 1
+            if not data:
+                continue
+            first = False
+            stats["bytes"] += len(data)
+            if compressor is not None:
+                data = compressor.compress(data)
+            if data:
+                yield data
+    except Exception as e:
+        # في NDJSON يُبلَّغ عن الخطأ بعد بدء البث بسطر أخير؛ قبل أول صفحة يُرفع الخطأ
+        # ليُرد عليه بحالة HTTP مناسبة
+        if output_format != "ndjson" or stats["pages"] == 0:
+            raise
+        error: Dict[str, Any] = {"error": str(e)}
+        if hasattr(e, "retry_after"):
+            error["retry_after"] = e.retry_after
+        data = (json.dumps(error, ensure_ascii=False) + "\n").encode("utf-8")
+        yield compressor.compress(data) if compressor is not None else data
+    if compressor is not None:
+        yield compressor.finish()
@@ -0,0 +1,308 @@
+"""
+فهرس بحث نصي كامل (SQLite FTS5) لنتائج OCR في docs_exports
+
+- كل صفحة سجل مستقل: (مسار ملف Markdown نسبةً إلى مجلد التصدير، رقم الصفحة)
+- النص يُطبَّع قبل الفهرسة وعند الاستعلام: حذف التشكيل والتطويل، وتوحيد أشكال
+  الألف (أ إ آ ٱ ← ا) والياء (ى ← ي) والتاء المربوطة (ة ← ه)، وتحويل أشكال العرض
+  إلى الحروف الأساسية؛ فتُطابق "مَدْرَسَة" و"مدرسه" الكلمة نفسها
+- يُحدَّث من BatchPdfConv عند كتابة كل ملف، أو بمزامنة تزايدية للمجلد (الحجم
+  ووقت التعديل) للملفات المكتوبة قبل وجود الفهرس
+- المقتطف يُعرض من النص الأصلي (بتشكيله) مع تمييز الكلمات المطابقة
+
+الاستخدام من سطر الأوامر:
+    python search_index.py sync
+    python search_index.py search "كلمة أخرى*"
+"""
+import os
+import re
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+import unicodedata
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# ملف الفهرس (فارغ لتعطيل الفهرسة)
+OCR_SEARCH_DB = os.getenv("OCR_SEARCH_DB", "search_index.sqlite3")
+# مجلد ملفات Markdown المفهرسة (نفس EXPORT_DIR في BatchPdfConv)
+OCR_SEARCH_DIR = os.getenv("OCR_SEARCH_DIR", "docs_exports")
+SEARCH_MAX_LIMIT = 100
+# عدد الأحرف حول أول كلمة مطابقة في المقتطف
+SNIPPET_CHARS = 80
+
+# التشكيل وعلامات القرآن والألف الخنجرية، والتطويل
+_DROPPED = set(chr(c) for c in list(range(0x064B, 0x0660)) + [0x0670] + list(range(0x06D6, 0x06EE)) + [0x0640])
+_FOLDED = {"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه"}
+_PRESENTATION_FORM = re.compile("[\uFB50-\uFDFF\uFE70-\uFEFC]")
+_TRANSLATION = str.maketrans({**{c: None for c in _DROPPED}, **_FOLDED})
+_QUERY_TERM = re.compile(r"(\w+)(\*?)")
+_PAGE_HEADING = re.compile(r"^## Page (\d+)[ \t]*$", re.MULTILINE)
+
+
+def normalize_char(char: str) -> str:
+    if char in _DROPPED:
+        return ""
+    if _PRESENTATION_FORM.match(char):
+        decomposed = unicodedata.normalize("NFKC", char)
+        if decomposed != char:
+            return "".join(normalize_char(c) for c in decomposed)
+    return _FOLDED.get(char, char)
+
+
+def normalize_arabic(text: str) -> str:
+    """تطبيع النص العربي للفهرسة والاستعلام"""
+    if _PRESENTATION_FORM.search(text):
+        return "".join(normalize_char(c) for c in text)
+    return text.translate(_TRANSLATION)
+
+
+def normalize_with_positions(text: str) -> Tuple[str, List[int]]:
+    """النص المطبّع مع موضع كل حرف منه في النص الأصلي (لعرض المقتطف من الأصل)"""
+    chars: List[str] = []
+    positions: List[int] = []
+    for i, char in enumerate(text):
+        for folded in normalize_char(char):
+            chars.append(folded)
+            positions.append(i)
+    return "".join(chars), positions
+
+
+def parse_query(query: str) -> Tuple[str, List[str]]:
+    """
+    تحويل الاستعلام إلى تعبير FTS5 (كل الكلمات مطلوبة، و* في آخر الكلمة
+    للبحث بالبادئة) وقائمة كلماته المطبّعة. رموز FTS5 الأخرى تُتجاهل.
+    """
+    terms = _QUERY_TERM.findall(normalize_arabic(query))
+    expression = " ".join(f'"{term}"' + ("*" if prefix else "") for term, prefix in terms)
+    return expression, [term for term, _ in terms]
+
+
+def make_snippet(text: str, terms: List[str], width: int = SNIPPET_CHARS) -> str:
+    """مقتطف من النص الأصلي حول أول كلمة مطابقة، والمطابقات فيه بين **"""
+    normalized, positions = normalize_with_positions(text)
+    pattern = re.compile("|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    matches = list(pattern.finditer(normalized)) if terms else []
+    if not matches:
+        return " ".join(text[:2 * width].split())
+
+    def span(match) -> Tuple[int, int]:
+        start, end = positions[match.start()], positions[match.end() - 1] + 1
+        # التشكيل بعد آخر حرف مطابق جزء من الكلمة
+        while end < len(text) and text[end] in _DROPPED:
+            end += 1
+        return start, end
+
+    first_start, first_end = span(matches[0])
+    start = max(0, first_start - width)
+    end = min(len(text), first_end + width)
+    parts = ["…"] if start > 0 else []
+    cursor = start
+    for match in matches:
+        match_start, match_end = span(match)
+        if match_start < cursor:
+            continue
+        if match_end > end:
+            break
+        parts += [text[cursor:match_start], "**", text[match_start:match_end], "**"]
+        cursor = match_end
+    parts.append(text[cursor:end])
+    if end < len(text):
+        parts.append("…")
+    return " ".join("".join(parts).split())
+
+
+def parse_markdown_pages(text: str) -> List[Dict[str, Any]]:
+    """صفحات ملف Markdown كتبه BatchPdfConv (عناوين "## Page N")؛ بدونها الملف صفحة واحدة"""
+    headings = list(_PAGE_HEADING.finditer(text))
+    if not headings:
+        return [{"index": 0, "markdown": text}]
+    pages = []
+    for i, heading in enumerate(headings):
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+        pages.append({"index": int(heading.group(1)) - 1, "markdown": text[heading.end():end].strip()})
+    return pages
+
+
+def iter_markdown(root: str) -> Iterator[Tuple[str, int, int]]:
+    """(المسار النسبي، الحجم، وقت التعديل بالنانوثانية) لكل ملف .md تحت root"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(".md") and entry.is_file():
+                        stat = entry.stat()
+                        yield os.path.relpath(entry.path, root), stat.st_size, stat.st_mtime_ns
+        except OSError:
+            continue
+
+
+class SearchIndex:
+    """فهرس صفحات OCR في ملف SQLite (وضع WAL، آمن لعدة خيوط وعمليات)"""
+
+    def __init__(self, path: str = OCR_SEARCH_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER,"
+            " mtime_ns INTEGER,"
+            " pages INTEGER NOT NULL,"
+            " indexed REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " id INTEGER PRIMARY KEY,"
+            " path TEXT NOT NULL,"
+            " page INTEGER NOT NULL,"
+            " text TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_path ON pages(path)")
+        # rowid في pages_fts هو id في pages؛ النص المخزن هنا مطبّع، والأصل في pages
+        self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(body, tokenize='unicode61')")
+
+    def index_document(self, path: str, pages: Iterable[Dict[str, Any]],
+                       stat_key: Optional[Tuple[int, int]] = None):
+        """فهرسة صفحات ملف (تستبدل فهرسته السابقة)؛ stat_key = (الحجم، وقت التعديل) للمزامنة"""
+        rows = [(page["index"] + 1, page["markdown"]) for page in pages]
+        size, mtime_ns = stat_key if stat_key is not None else (None, None)
+        with self._transaction() as db:
+            self._delete(db, path)
+            for page, text in rows:
+                page_id = db.execute("INSERT INTO pages (path, page, text) VALUES (?, ?, ?)",
+                                     (path, page, text)).lastrowid
+                db.execute("INSERT INTO pages_fts (rowid, body) VALUES (?, ?)", (page_id, normalize_arabic(text)))
+            db.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, pages, indexed) VALUES (?, ?, ?, ?, ?)",
+                       (path, size, mtime_ns, len(rows), time.time()))
+
+    def index_file(self, root: str, path: str):
+        """فهرسة ملف Markdown من القرص (المسار نسبةً إلى root)"""
+        full_path = os.path.join(root, path)
+        stat = os.stat(full_path)
+        with open(full_path, encoding="utf-8") as f:
+            pages = parse_markdown_pages(f.read())
+        self.index_document(path, pages, (stat.st_size, stat.st_mtime_ns))
+
+    def move(self, old_path: str, new_path: str):
+        """نقل فهرسة ملف أُعيدت تسميته دون إعادة فهرسته"""
+        with self._transaction() as db:
+            self._delete(db, new_path)
+            db.execute("UPDATE pages SET path = ? WHERE path = ?", (new_path, old_path))
+            db.execute("UPDATE files SET path = ? WHERE path = ?", (new_path, old_path))
+
+    def remove(self, path: str):
+        with self._transaction() as db:
+            self._delete(db, path)
+
+    def sync(self, root: str = OCR_SEARCH_DIR) -> Dict[str, int]:
+        """
+        مزامنة تزايدية مع مجلد Markdown: فهرسة الملفات الجديدة أو المعدلة فقط
+        (حسب الحجم ووقت التعديل)، وحذف فهرسة الملفات التي اختفت.
+        """
+        with self._lock:
+            known = {path: (size, mtime_ns) for path, size, mtime_ns in
+                     self._db.execute("SELECT path, size, mtime_ns FROM files")}
+        counts = {"indexed": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        for path, size, mtime_ns in iter_markdown(root):
+            if known.pop(path, None) == (size, mtime_ns):
+                counts["unchanged"] += 1
+                continue
+            try:
+                self.index_file(root, path)
+                counts["indexed"] += 1
+            except (OSError, UnicodeDecodeError):
+                counts["failed"] += 1
+        for path in known:
+            self.remove(path)
+            counts["removed"] += 1
+        return counts
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """الصفحات المطابقة مرتبة حسب الصلة (bm25): المسار ورقم الصفحة والمقتطف"""
+        expression, terms = parse_query(query)
+        if not expression:
+            return []
+        limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT pages.path, pages.page, pages.text, pages_fts.rank FROM pages_fts"
+                " JOIN pages ON pages.id = pages_fts.rowid"
+                " WHERE pages_fts MATCH ? ORDER BY pages_fts.rank LIMIT ? OFFSET ?",
+                (expression, limit, max(0, offset))).fetchall()
+        return [{"path": path, "page": page, "snippet": make_snippet(text, terms), "score": round(-rank, 4)}
+                for path, page, text, rank in rows]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            files, pages = self._db.execute("SELECT COUNT(*), COALESCE(SUM(pages), 0) FROM files").fetchone()
+        return {"files": files, "pages": pages}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _delete(self, db: sqlite3.Connection, path: str):
+        db.execute("DELETE FROM pages_fts WHERE rowid IN (SELECT id FROM pages WHERE path = ?)", (path,))
+        db.execute("DELETE FROM pages WHERE path = ?", (path,))
+        db.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """معاملة BEGIN IMMEDIATE محمية بقفل الخيوط"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="فهرس البحث في نتائج OCR")
+    parser.add_argument("--db", default=OCR_SEARCH_DB or "search_index.sqlite3", help="ملف الفهرس")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sync = commands.add_parser("sync", help="فهرسة ملفات Markdown الجديدة أو المعدلة")
+    sync.add_argument("--dir", default=OCR_SEARCH_DIR, help="مجلد ملفات Markdown")
+    search = commands.add_parser("search", help="البحث في الفهرس")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--offset", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    index = SearchIndex(args.db)
+    try:
+        if args.command == "sync":
+            started = time.perf_counter()
+            counts = index.sync(args.dir)
+            stats = index.stats()
+            print(f"فهرسة {counts['indexed']}، دون تغيير {counts['unchanged']}، حذف {counts['removed']}، "
+                  f"فشل {counts['failed']} ({time.perf_counter() - started:.1f} ثانية). "
+                  f"الفهرس: {stats['files']} ملف، {stats['pages']} صفحة.")
+            return 0
+        started = time.perf_counter()
+        results = index.search(args.query, args.limit, args.offset)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for result in results:
+            print(f"{result['path']} (صفحة {result['page']}): {result['snippet']}")
+        print(f"{len(results)} نتيجة في {elapsed_ms:.1f} ملي ثانية")
+        return 0 if results else 1
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+حالة مشتركة بين عمال الخادم (uvicorn --workers N) في ملف SQLite (وضع WAL)
+
+- أقفال OCR لكل بصمة محتوى: عامل واحد فقط يستدعي API لنفس الملف، والبقية
+  تنتظر تحرير القفل ثم تقرأ النتيجة من التخزين المؤقت المشترك (OCR_CACHE_PATH)
+- عدد الرفعات غير المعالجة لكل ملف مرفوع (قد يُرفع على عامل ويُعالج على آخر)
+- دلاء رموز مفاتيح Mistral API وحالة استبعادها، فميزانية المفتاح واحدة لكل العمال
+
+يُفعل بتحديد OCR_SHARED_DB؛ بدونه تبقى هذه الحالة داخل العملية كما في وضع العامل الواحد.
+القفل الذي لم يُحرَّر (توقف العامل فجأة) ينتهي بعد OCR_FLIGHT_TTL ثانية؛ الأقفال
+المحجوزة يجددها خيط (start_keeper) ما دامت العملية حية، فلا تنتهي أثناء OCR طويل.
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+OCR_SHARED_DB = os.getenv("OCR_SHARED_DB", "")
+OCR_FLIGHT_TTL = float(os.getenv("OCR_FLIGHT_TTL", "900"))
+
+
+class SharedState:
+    """حالة مشتركة بين العمليات في ملف SQLite واحد"""
+
+    def __init__(self, path: str = OCR_SHARED_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        # الأقفال التي تحجزها هذه العملية (المفتاح، المالك) ليجددها الخيط
+        self._held: Set[Tuple[str, str]] = set()
+        self._stop = threading.Event()
+        self._keeper: Optional[threading.Thread] = None
+        # timeout: انتظار قفل الكتابة الذي يحجزه عامل آخر بدلاً من الفشل فوراً
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS flights ("
+            " key TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " expires REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS upload_refs ("
+            " name TEXT PRIMARY KEY,"
+            " refs INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS key_budgets ("
+            " key TEXT PRIMARY KEY,"
+            " tokens REAL NOT NULL,"
+            " updated REAL NOT NULL,"
+            " ejected_until REAL NOT NULL DEFAULT 0,"
+            " reason TEXT NOT NULL DEFAULT '')"
+        )
+
+    def claim(self, key: str, owner: str, ttl: float = OCR_FLIGHT_TTL) -> bool:
+        """حجز قفل OCR للمفتاح؛ False إذا كان محجوزاً لعامل آخر ولم تنته مدته"""
+        now = time.time()
+        with self._transaction():
+            row = self._db.execute("SELECT owner, expires FROM flights WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                return False
+            self._db.execute("INSERT OR REPLACE INTO flights (key, owner, expires) VALUES (?, ?, ?)",
+                             (key, owner, now + ttl))
+            self._held.add((key, owner))
+            return True
+
+    def claimed(self, key: str) -> bool:
+        """هل يحجز عامل ما قفل OCR لهذا المفتاح (ولم تنته مدته)؟"""
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM flights WHERE key = ? AND expires > ?",
+                                   (key, time.time())).fetchone()
+        return row is not None
+
+    def release(self, key: str, owner: str):
+        with self._transaction():
+            self._db.execute("DELETE FROM flights WHERE key = ? AND owner = ?", (key, owner))
+            self._held.discard((key, owner))
+
+    def renew(self, ttl: float = OCR_FLIGHT_TTL) -> int:
+        """تمديد كل أقفال OCR التي تحجزها هذه العملية؛ تُرجع عدد الأقفال التي ما زالت لها"""
+        expires = time.time() + ttl
+        renewed = 0
+        with self._transaction():
+            for key, owner in self._held:
+                cursor = self._db.execute("UPDATE flights SET expires = ? WHERE key = ? AND owner = ?",
+                                          (expires, key, owner))
+                renewed += cursor.rowcount
+        return renewed
+
+    def start_keeper(self, interval: Optional[float] = None):
+        """خيط يجدد أقفال هذه العملية كل ثلث OCR_FLIGHT_TTL"""
+        if self._keeper is not None:
+            return
+        interval = interval or OCR_FLIGHT_TTL / 3
+
+        def keep():
+            while not self._stop.wait(interval):
+                try:
+                    self.renew()
+                except sqlite3.Error as e:
+                    logger.warning(f"تعذر تجديد أقفال OCR: {e}")
+
+        self._keeper = threading.Thread(target=keep, name="flight-keeper", daemon=True)
+        self._keeper.start()
+
+    def add_upload_ref(self, name: str) -> int:
+        """زيادة عدد الرفعات المنتظرة للملف؛ تُرجع العدد الجديد"""
+        with self._transaction():
+            self._db.execute(
+                "INSERT INTO upload_refs (name, refs) VALUES (?, 1)"
+                " ON CONFLICT(name) DO UPDATE SET refs = refs + 1", (name,))
+            return self._db.execute("SELECT refs FROM upload_refs WHERE name = ?", (name,)).fetchone()[0]
+
+    def drop_upload_ref(self, name: str) -> int:
+        """إنقاص عدد الرفعات المنتظرة؛ تُرجع المتبقي (0 يعني أن الملف يمكن حذفه)"""
+        with self._transaction():
+            row = self._db.execute("SELECT refs FROM upload_refs WHERE name = ?", (name,)).fetchone()
+            refs = (row[0] if row is not None else 0) - 1
+            if refs > 0:
+                self._db.execute("UPDATE upload_refs SET refs = ? WHERE name = ?", (refs, name))
+                return refs
+            self._db.execute("DELETE FROM upload_refs WHERE name = ?", (name,))
+            return 0
+
+    def clear_upload_ref(self, name: str):
+        """نسيان رفعات ملف حُذف (انتهت مدة الاحتفاظ به)"""
+        with self._transaction():
+            self._db.execute("DELETE FROM upload_refs WHERE name = ?", (name,))
+
+    def take_token(self, key: str, rate: float, capacity: float) -> float:
+        """
+        أخذ رمز من دلو المفتاح المشترك؛ تُرجع 0 عند النجاح أو مدة الانتظار
+        اللازمة بالثواني (نفس سلوك TokenBucket.try_acquire).
+        """
+        now = time.time()
+        with self._transaction():
+            row = self._db.execute("SELECT tokens, updated FROM key_budgets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate if rate > 0 else float("inf")
+            self._db.execute(
+                "INSERT INTO key_budgets (key, tokens, updated) VALUES (?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now))
+            return wait
+
+    def eject_key(self, key: str, seconds: float, reason: str):
+        """استبعاد المفتاح لكل العمال حتى تنتهي المدة"""
+        now = time.time()
+        with self._transaction():
+            self._db.execute(
+                "INSERT INTO key_budgets (key, tokens, updated, ejected_until, reason) VALUES (?, 0, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET ejected_until = excluded.ejected_until, reason = excluded.reason",
+                (key, now, now + seconds, reason))
+
+    def key_ejections(self) -> Dict[str, Tuple[float, str]]:
+        """المفاتيح المستبعدة حالياً: المفتاح -> (الثواني المتبقية، السبب)"""
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, ejected_until, reason FROM key_budgets WHERE ejected_until > ?", (now,)).fetchall()
+        return {key: (until - now, reason) for key, until, reason in rows}
+
+    def close(self):
+        self._stop.set()
+        if self._keeper is not None:
+            self._keeper.join()
+            self._keeper = None
+        with self._lock:
+            self._db.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """معاملة BEGIN IMMEDIATE (تحجز قفل الكتابة فوراً) محمية بقفل الخيوط"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
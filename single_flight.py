@@ -0,0 +1,73 @@
+"""
+دمج الطلبات المتزامنة لنفس المحتوى في عملية واحدة (single-flight)
+
+أول طلب لمفتاح (بصمة الملف) يبدأ العملية، والطلبات التي تصل أثناء تنفيذها
+تنتظر النتيجة نفسها بدلاً من تكرار استدعاء API المدفوع. بعد انتهاء العملية
+يُحذف المفتاح، فالطلبات اللاحقة تُخدم من التخزين المؤقت.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class SingleFlight:
+    """عمليات جارية حسب المفتاح (لحلقة أحداث واحدة)"""
+
+    def __init__(self):
+        self._flights: Dict[str, asyncio.Future] = {}
+        self.started = 0
+        self.joined = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def get(self, key: str) -> Optional[asyncio.Future]:
+        """العملية الجارية لهذا المفتاح إن وجدت"""
+        return self._flights.get(key)
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        تنفيذ func() أو الانضمام إلى تنفيذها الجاري لنفس المفتاح.
+
+        العملية محمية بـ shield: إلغاء أحد المنتظرين (انقطاع العميل) لا يلغيها
+        للبقية، وتكتمل نتيجتها في التخزين المؤقت.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(func())
+            self._register(key, flight)
+        else:
+            self.joined += 1
+        return await asyncio.shield(flight)
+
+    def spawn(self, key: str, func: Callable[[], Awaitable[Any]]) -> Optional[asyncio.Task]:
+        """
+        بدء func() مهمةً مستقلة لهذا المفتاح دون انتظارها، لمستدعٍ يتابع تقدمها
+        بنفسه (مثل البث صفحة بصفحة). المهمة لا تتبع عمر المستدعي: انقطاعه لا
+        يلغيها، وتكتمل نتيجتها للمنتظرين. تُرجع None إذا كانت هناك عملية جارية.
+        """
+        if key in self._flights:
+            return None
+        task = asyncio.ensure_future(func())
+        self._register(key, task)
+        return task
+
+    async def join(self, key: str) -> Any:
+        """انتظار نتيجة العملية الجارية لهذا المفتاح"""
+        self.joined += 1
+        return await asyncio.shield(self._flights[key])
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._flights), "started": self.started, "joined": self.joined}
+
+    def _register(self, key: str, flight: asyncio.Future):
+        self.started += 1
+        self._flights[key] = flight
+
+        def done(_):
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            # الخطأ يُقرأ هنا حتى لا يُسجَّل "never retrieved" إذا لم ينتظره أحد
+            if not flight.cancelled():
+                flight.exception()
+
+        flight.add_done_callback(done)
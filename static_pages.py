@@ -0,0 +1,165 @@
+"""
+تقديم الصفحات الثابتة من الذاكرة مع نسخ مضغوطة مسبقاً و ETag
+
+- الملفات تُقرأ مرة واحدة عند التشغيل، وتُحسب لها نسخ gzip و br (إن توفر brotli)
+- ETag من بصمة المحتوى، والطلبات بـ If-None-Match المطابقة تُرد بـ 304 دون جسم
+- الأصول ذات الإصدار (مثل الشعارات) تُقدم بـ ?v=<بصمة> وتُخزن لدى المتصفح سنة كاملة؛
+  روابطها داخل صفحات HTML تُعاد كتابتها تلقائياً لتحمل البصمة الحالية
+- الصفحات نفسها تُعاد مصادقتها في كل زيارة (no-cache)، فيصل التعديل فوراً
+- تغيير ملف على القرص (الحجم أو وقت التعديل) يعيد تحميله، يُفحص كل
+  STATIC_CHECK_INTERVAL ثانية على الأكثر
+"""
+import os
+import gzip
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+
+from response_stream import BROTLI_AVAILABLE, negotiate_encoding
+
+if BROTLI_AVAILABLE:
+    import brotli
+
+logger = logging.getLogger(__name__)
+
+# أقل مدة بين فحصين لتغير الملفات على القرص بالثواني (0 لتعطيل إعادة التحميل)
+STATIC_CHECK_INTERVAL = float(os.getenv("STATIC_CHECK_INTERVAL", "2"))
+
+REVALIDATE = "no-cache"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class StaticFile:
+    """ملف محمل في الذاكرة مع نسخه المضغوطة"""
+
+    def __init__(self, url: str, path: str, media_type: str, versioned: bool):
+        self.url = url
+        self.path = path
+        self.media_type = media_type
+        self.versioned = versioned
+        self.stat_key: Optional[Tuple[int, int]] = None
+        self.source = b""
+        self.version = ""
+        self.variants: Dict[Optional[str], Tuple[bytes, str]] = {}
+
+    def read(self) -> bool:
+        """قراءة الملف إذا تغير منذ آخر قراءة؛ تُرجع True عند التغيير"""
+        stat = os.stat(self.path)
+        stat_key = (stat.st_size, stat.st_mtime_ns)
+        if stat_key == self.stat_key:
+            return False
+        with open(self.path, "rb") as f:
+            self.source = f.read()
+        self.stat_key = stat_key
+        self.version = hashlib.sha256(self.source).hexdigest()[:16]
+        return True
+
+    def build(self, body: bytes):
+        """حساب ETag والنسخ المضغوطة للمحتوى النهائي (بعد إعادة كتابة الروابط)"""
+        tag = hashlib.sha256(body).hexdigest()[:20]
+        self.variants = {None: (body, f'"{tag}"')}
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(compressed) < len(body):
+            self.variants["gzip"] = (compressed, f'"{tag}-gz"')
+        if BROTLI_AVAILABLE:
+            compressed = brotli.compress(body, quality=11)
+            if len(compressed) < len(body):
+                self.variants["br"] = (compressed, f'"{tag}-br"')
+
+
+class StaticPages:
+    """مجموعة الصفحات والأصول المقدمة من الذاكرة"""
+
+    def __init__(self, directory: str, check_interval: float = STATIC_CHECK_INTERVAL):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.files: Dict[str, StaticFile] = {}
+        self._lock = threading.Lock()
+        self._checked = 0.0
+
+    def add(self, url: str, filename: str, media_type: str, versioned: bool = False):
+        """تسجيل ملف يُقدم على url؛ versioned للأصول التي تُربط بـ ?v=<بصمة>"""
+        self.files[url] = StaticFile(url, os.path.join(self.directory, filename), media_type, versioned)
+
+    def load(self):
+        """تحميل كل الملفات المسجلة (عند التشغيل)"""
+        with self._lock:
+            self._reload(force=True)
+            self._checked = time.monotonic()
+
+    def asset_url(self, url: str) -> str:
+        """رابط الأصل مع بصمة محتواه الحالية"""
+        return f"{url}?v={self.files[url].version}"
+
+    def response(self, url: str, request: Request) -> Response:
+        """الرد بالنسخة المناسبة لـ Accept-Encoding، أو 304 إذا كانت لدى العميل"""
+        self._maybe_reload()
+        static_file = self.files[url]
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        if encoding not in static_file.variants:
+            encoding = None
+        body, etag = static_file.variants[encoding]
+
+        if static_file.versioned and request.query_params.get("v") == static_file.version:
+            cache_control = IMMUTABLE
+        else:
+            cache_control = REVALIDATE
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+
+        if self._not_modified(request.headers.get("if-none-match"), static_file):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=static_file.media_type, headers=headers)
+
+    def _not_modified(self, if_none_match: Optional[str], static_file: StaticFile) -> bool:
+        if not if_none_match:
+            return False
+        current = {etag for _, etag in static_file.variants.values()}
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            if candidate == "*" or candidate.removeprefix("W/") in current:
+                return True
+        return False
+
+    def _maybe_reload(self):
+        if self.check_interval <= 0 or time.monotonic() - self._checked < self.check_interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked < self.check_interval:
+                return
+            try:
+                self._reload()
+            except OSError as e:
+                logger.warning(f"تعذر إعادة تحميل الملفات الثابتة: {e}")
+            self._checked = time.monotonic()
+
+    def _reload(self, force: bool = False):
+        changed: List[StaticFile] = [f for f in self.files.values() if f.read()]
+        if not changed and not force:
+            return
+        assets = [f for f in self.files.values() if f.versioned]
+        asset_changed = force or any(f.versioned for f in changed)
+        for static_file in self.files.values():
+            # الصفحات تُعاد كتابتها إذا تغيرت هي أو أي أصل تربط به
+            if static_file in changed or (asset_changed and static_file.media_type.startswith("text/html")):
+                static_file.build(self._render(static_file, assets))
+        if not force:
+            logger.info(f"أُعيد تحميل الملفات الثابتة: {', '.join(f.url for f in changed)}")
+
+    def _render(self, static_file: StaticFile, assets: List[StaticFile]) -> bytes:
+        """إضافة ?v=<بصمة> إلى روابط الأصول ذات الإصدار داخل صفحات HTML"""
+        body = static_file.source
+        if not static_file.media_type.startswith("text/html"):
+            return body
+        for asset in assets:
+            name = asset.url.lstrip("/").encode()
+            versioned = f"{asset.url.lstrip('/')}?v={asset.version}".encode()
+            for quote in (b'"', b"'"):
+                body = body.replace(b"=" + quote + name + quote, b"=" + quote + versioned + quote)
+                body = body.replace(b"=" + quote + b"/" + name + quote, b"=" + quote + b"/" + versioned + quote)
+        return body
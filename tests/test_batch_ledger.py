@@ -0,0 +1,72 @@
+"""
+سجل معالجة الدفعات: الاستئناف بعد إعادة التشغيل يتخطى الملفات المكتملة فقط،
+والملف المعدّل (بصمة جديدة) يُعالج من جديد.
+"""
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from batch_ledger import BatchLedger, ERROR, FAILED, SUCCESS  # noqa: E402
+
+
+def test_resume_after_restart(tmp_path):
+    path = str(tmp_path / "ledger.sqlite3")
+    ledger = BatchLedger(path, flush_interval=60)
+    ledger.record("a.pdf", "h-a", SUCCESS, pages=3, output_path="out/a.md")
+    ledger.record("b.pdf", "h-b", ERROR, error="timeout")
+    ledger.record("c.pdf", "h-c", ERROR, error="timeout")
+    ledger.record("c.pdf", "h-c", FAILED, error="timeout")
+    # close() يكتب السجلات المنتظرة قبل الإغلاق
+    ledger.close()
+
+    resumed = BatchLedger(path)
+    try:
+        assert resumed.completed() == {("a.pdf", "h-a")}
+        assert resumed.failed() == {("c.pdf", "h-c")}
+        assert resumed.counts() == {SUCCESS: 1, ERROR: 1, FAILED: 1}
+        (entry,) = resumed.get("c.pdf")
+        assert (entry["attempts"], entry["error"]) == (2, "timeout")
+
+        # محتوى جديد للمسار نفسه سجل مستقل لا يرث النجاح السابق
+        resumed.record("a.pdf", "h-a2", SUCCESS, pages=4)
+        resumed.flush()
+        assert resumed.completed() == {("a.pdf", "h-a"), ("a.pdf", "h-a2")}
+        assert [entry["sha256"] for entry in resumed.get("a.pdf")] == ["h-a", "h-a2"]
+    finally:
+        resumed.close()
+
+
+def test_success_keeps_earlier_output_details(tmp_path):
+    ledger = BatchLedger(str(tmp_path / "ledger.sqlite3"))
+    try:
+        ledger.record("a.pdf", "h", ERROR, error="boom", started=10.0, finished=11.0)
+        ledger.record("a.pdf", "h", SUCCESS, pages=2, output_path="out/a.md", started=20.0, finished=25.0)
+        ledger.flush()
+        (entry,) = ledger.get("a.pdf")
+        assert (entry["status"], entry["attempts"], entry["error"]) == (SUCCESS, 2, "")
+        assert (entry["pages"], entry["output_path"]) == (2, "out/a.md")
+        # بداية أول محاولة تبقى
+        assert entry["started"] == 10.0 and entry["duration"] == 5.0
+    finally:
+        ledger.close()
+
+
+def test_import_csv_keeps_last_status(tmp_path):
+    csv_path = tmp_path / "processed_files.csv"
+    csv_path.write_text("filename,status,error\n"
+                        "a.pdf,error,timeout\n"
+                        "a.pdf,success,\n"
+                        "gone.pdf,error,boom\n", encoding="utf-8")
+    ledger = BatchLedger(str(tmp_path / "ledger.sqlite3"))
+    try:
+        hashes = {"a.pdf": "h-a"}
+        assert ledger.import_csv(str(csv_path), hashes.get) == 2
+        assert ledger.completed() == {("a.pdf", "h-a")}
+        (entry,) = ledger.get("a.pdf")
+        assert entry["attempts"] == 2
+        (gone,) = ledger.get("gone.pdf")
+        assert (gone["sha256"], gone["status"]) == ("", ERROR)
+    finally:
+        ledger.close()
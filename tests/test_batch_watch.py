@@ -0,0 +1,84 @@
+"""
+وضع المراقبة في BatchPdfConv: الملف الذي استُنفدت محاولاته لا يعود إلى الطابور
+في كل مسح، بل فقط عندما يتغير محتواه.
+"""
+import os
+import sys
+import importlib
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    """BatchPdfConv مستورد داخل مجلد مؤقت (السجل والتخزين المؤقت وملف السجلات فيه)"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MISTRAL_API_KEY", "test-key")
+    monkeypatch.setenv("OCR_CACHE_PATH", "")
+    monkeypatch.setenv("OCR_SEARCH_DB", "")
+    sys.modules.pop("BatchPdfConv", None)
+    module = importlib.import_module("BatchPdfConv")
+    os.makedirs(module.DOC_DIR)
+    ledger = module.open_ledger()
+    yield module, ledger
+    ledger.close()
+    sys.modules.pop("BatchPdfConv", None)
+
+
+def write_pdf(module, name: str, content: bytes):
+    path = os.path.join(module.DOC_DIR, name)
+    with open(path, "wb") as f:
+        f.write(content)
+    # بعد مهلة الاستقرار حتى لا يُعد الملف قيد النسخ
+    os.utime(path, (1_000_000_000, 1_000_000_000))
+
+
+def drain(work):
+    """سحب كل ما في الطابور المفتوح دون انتظار"""
+    items = []
+    while work._heap:
+        item, _ = work.get()
+        items.append(item)
+    return items
+
+
+def test_failed_file_is_not_requeued_until_it_changes(batch):
+    module, ledger = batch
+    write_pdf(module, "broken.pdf", b"%PDF-1.4 broken")
+    work = module.RetryQueue([], closed=False)
+
+    _, added = module.watch_scan(work, ledger, settle=0)
+    assert added == 1
+    (item,) = drain(work)
+
+    # استُنفدت المحاولات: يُسجل FAILED ويُزال من الطابور كما يفعل worker
+    path, file_hash = item
+    ledger.record(path, file_hash, module.FAILED, error="conversion failed")
+    work.done(item)
+
+    for _ in range(3):
+        _, added = module.watch_scan(work, ledger, settle=0)
+        assert added == 0
+    assert drain(work) == []
+
+    # محتوى جديد (بصمة مختلفة) يُعالج من جديد
+    write_pdf(module, "broken.pdf", b"%PDF-1.4 fixed")
+    _, added = module.watch_scan(work, ledger, settle=0)
+    assert added == 1
+    assert [p for p, _ in drain(work)] == ["broken.pdf"]
+
+
+def test_fresh_run_retries_failed_files(batch):
+    module, ledger = batch
+    write_pdf(module, "broken.pdf", b"%PDF-1.4 broken")
+    scan = module.scan_pdf_files(ledger)
+    (item,) = module.pending_files(scan, ledger.completed())
+    ledger.record(*item, module.FAILED, error="conversion failed")
+    ledger.flush()
+
+    # المسح الأول في تشغيل جديد يعيد محاولة الملفات الفاشلة مرة أخرى
+    scan = module.scan_pdf_files(ledger)
+    assert module.pending_files(scan, ledger.completed()) == [item]
@@ -0,0 +1,70 @@
+"""
+عمال BatchPdfConv: الملف الذي أُعيدت تسميته أو حُذف بعد وضعه في الطابور يُتخطى
+من أول محاولة بدلاً من استنفاد كل المحاولات.
+"""
+import os
+import sys
+import threading
+import importlib
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MISTRAL_API_KEY", "test-key")
+    monkeypatch.setenv("OCR_CACHE_PATH", "")
+    monkeypatch.setenv("OCR_SEARCH_DB", "")
+    sys.modules.pop("BatchPdfConv", None)
+    module = importlib.import_module("BatchPdfConv")
+    os.makedirs(module.DOC_DIR)
+    ledger = module.open_ledger()
+    calls = []
+
+    def convert(pdf, limiter=None, file_hash=None, commit=None):
+        calls.append(pdf)
+        with open(os.path.join(module.DOC_DIR, pdf), "rb"):
+            pass
+
+    monkeypatch.setattr(module, "convert_pdf_to_markdown", convert)
+    yield module, ledger, calls
+    ledger.close()
+    sys.modules.pop("BatchPdfConv", None)
+
+
+def statuses(ledger, path):
+    ledger.flush()
+    return [(entry["status"], entry["attempts"]) for entry in ledger.get(path)]
+
+
+def test_missing_file_is_skipped_on_first_attempt(batch):
+    module, ledger, calls = batch
+    work = module.RetryQueue([("renamed.pdf", "h1")])
+    progress = module.Progress(1)
+
+    module.worker(work, module.RateLimiter(100), progress, ledger)
+
+    assert calls == ["renamed.pdf"]
+    assert statuses(ledger, "renamed.pdf") == [(module.SKIPPED, 1)]
+    assert (progress.total, progress.failed) == (0, 0)
+
+
+def test_queue_worker_skips_missing_file(batch, tmp_path):
+    module, ledger, calls = batch
+    from work_queue import WorkQueue, FAILED
+
+    queue = WorkQueue(str(tmp_path / "queue.sqlite3"))
+    queue.enqueue([("renamed.pdf", "h1")])
+    stop = threading.Event()
+
+    module.queue_worker(queue, "worker-a", module.RateLimiter(100), module.Progress(0), ledger,
+                        False, stop)
+
+    assert calls == ["renamed.pdf"]
+    assert statuses(ledger, "renamed.pdf") == [(module.SKIPPED, 1)]
+    assert queue.counts()[FAILED] == 1
+    queue.close()
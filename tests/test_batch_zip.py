@@ -0,0 +1,47 @@
+"""
+أرشيف نتائج الدفعة: ZipStream يُخرج أرشيفاً صالحاً تزايدياً وفي آخره البيان،
+ومسارات النتائج آمنة وفريدة.
+"""
+import io
+import os
+import sys
+import json
+import zipfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from batch_zip import MANIFEST_NAME, ZipStream, export_markdown, markdown_path, safe_entry_path  # noqa: E402
+
+
+def test_zip_stream_output_and_manifest():
+    archive = ZipStream()
+    pages = [{"index": 0, "markdown": "الصفحة الأولى"}, {"index": 1, "markdown": "الثانية"}]
+    first = archive.add("docs/a.md", export_markdown(pages))
+    # كل مستند يُرسل فور إضافته
+    assert first.startswith(b"PK\x03\x04")
+    manifest = [{"path": "docs/a.pdf", "output": "docs/a.md", "status": "completed", "pages": 2},
+                {"path": "notes.txt", "output": None, "status": "skipped", "pages": None}]
+    data = first + archive.finish(manifest)
+
+    with zipfile.ZipFile(io.BytesIO(data)) as result:
+        assert result.testzip() is None
+        assert result.namelist() == ["docs/a.md", MANIFEST_NAME]
+        assert result.read("docs/a.md").decode("utf-8") == (
+            "## Page 1\n\nالصفحة الأولى\n\n## Page 2\n\nالثانية\n\n")
+        assert json.loads(result.read(MANIFEST_NAME)) == {"files": manifest}
+
+
+def test_markdown_paths_are_unique():
+    used = set()
+    assert markdown_path("a/report.pdf", used) == "a/report.md"
+    assert markdown_path("a/report.png", used) == "a/report-2.md"
+    assert markdown_path("a/report.jpg", used) == "a/report-3.md"
+
+
+def test_safe_entry_path():
+    assert safe_entry_path("../../etc/passwd.pdf") == "etc/passwd.pdf"
+    assert safe_entry_path("C:\\docs\\a.pdf") == "C:/docs/a.pdf"
+    assert safe_entry_path("docs/") is None
+    assert safe_entry_path("__MACOSX/docs/._a.pdf") is None
+    assert safe_entry_path("docs/.hidden.pdf") is None
@@ -0,0 +1,121 @@
+"""
+مجمع مفاتيح Mistral: التحويل إلى مفتاح آخر عند 401/429، ومدة استبعاد المفتاح
+ثم عودته، ورفض الطلب عند استبعاد كل المفاتيح.
+"""
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import key_pool as key_pool_module  # noqa: E402
+from key_pool import ApiKey, KeyPool, KeyPoolExhausted, parse_keys  # noqa: E402
+
+
+class APIError(Exception):
+    def __init__(self, status_code: int, headers=None):
+        super().__init__(f"Status {status_code}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(key_pool_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_pool(*names: str, max_in_flight: int = 8) -> KeyPool:
+    keys = []
+    for name in names:
+        key = ApiKey(f"secret-key-{name}", rps=100, max_in_flight=max_in_flight)
+        key._client = name  # لا عميل حقيقي: func تستقبل اسم المفتاح
+        keys.append(key)
+    return KeyPool(keys, wait_timeout=0)
+
+
+def by_label(pool: KeyPool):
+    return {entry["key"]: entry for entry in pool.stats()}
+
+
+def test_rate_limited_key_fails_over_and_cools_down(clock):
+    pool = make_pool("a", "b")
+    calls = []
+
+    def call(client):
+        calls.append(client)
+        if client == "a":
+            raise APIError(429, {"retry-after": "5"})
+        return f"result from {client}"
+
+    assert pool.run(call) == "result from b"
+    assert calls == ["a", "b"]
+    assert by_label(pool)["...ey-a"]["ejected_seconds"] == 5
+    a = pool.keys[0]
+    assert (a.ejected_reason, a.ejected_until, a.counters["rate_limited"]) == ("429", 1005.0, 1)
+
+    # أثناء الاستبعاد يُوجَّه كل شيء إلى b
+    calls.clear()
+    assert pool.run(call) == "result from b" and calls == ["b"]
+
+    clock[0] += 5
+    stats = by_label(pool)
+    assert stats["...ey-a"]["ejected_seconds"] == 0 and stats["...ey-a"]["ejected_reason"] == ""
+    assert stats["...ey-b"]["requests"] == 2 and stats["...ey-b"]["in_flight"] == 0
+
+
+def test_key_returns_after_cooldown(clock):
+    pool = make_pool("a", "b")
+    first = pool.acquire()
+    pool.release(first, APIError(429))  # بلا Retry-After: backoff يبدأ بثانية
+    assert pool.acquire() is not first
+
+    clock[0] += 1
+    # الأقل حملاً والأقدم استخداماً: المفتاح العائد
+    assert pool.acquire() is first
+
+
+def test_unauthorized_key_is_ejected_for_long(clock):
+    pool = make_pool("a", "b")
+
+    def call(client):
+        if client == "a":
+            raise APIError(401)
+        return client
+
+    assert pool.run(call) == "b"
+    a = pool.keys[0]
+    assert a.ejected_reason == "401"
+    assert a.ejected_until == 1000.0 + key_pool_module.MISTRAL_KEY_UNAUTHORIZED_EJECT
+
+
+def test_all_keys_ejected_raises_with_retry_after(clock):
+    pool = make_pool("a", "b")
+
+    def call(client):
+        raise APIError(429, {"retry-after": "3"})
+
+    # مرة لكل مفتاح ثم يُرفع الخطأ
+    with pytest.raises(APIError):
+        pool.run(call)
+    with pytest.raises(KeyPoolExhausted) as error:
+        pool.acquire()
+    assert error.value.retry_after == 3
+
+
+def test_busy_keys_raise_when_wait_times_out(clock):
+    pool = make_pool("a", max_in_flight=1)
+    key = pool.acquire()
+    with pytest.raises(KeyPoolExhausted):
+        pool.acquire(timeout=0)
+    pool.release(key)
+    assert pool.acquire(timeout=0) is key
+
+
+def test_parse_keys():
+    keys = parse_keys("k1-abcdefgh:5:8, k2-abcdefgh:2,your_mistral_api_key_here,,")
+    assert [(key.key, key.rps, key.max_in_flight) for key in keys] == [
+        ("k1-abcdefgh", 5.0, 8), ("k2-abcdefgh", 2.0, key_pool_module.MISTRAL_KEY_MAX_IN_FLIGHT)]
@@ -0,0 +1,40 @@
+"""
+دالة OCR في Netlify: طلب JSON بحقول من نوع خاطئ يُرفض بـ 400 بدلاً من خطأ داخلي.
+"""
+import os
+import sys
+import json
+import base64
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from netlify_ocr import RequestError, read_upload  # noqa: E402
+
+
+def json_event(body) -> dict:
+    return {"httpMethod": "POST", "headers": {"Content-Type": "application/json"}, "body": json.dumps(body)}
+
+
+@pytest.mark.parametrize("body", [
+    {"file": 123},
+    {"file": ["data:application/pdf;base64,JVBERi0="]},
+    {"file": {"data": "JVBERi0="}},
+    {"file": "JVBERi0xLjQ=", "filename": 5},
+    {"file": "JVBERi0xLjQ=", "mime_type": ["application/pdf"]},
+    [],
+    None,
+])
+def test_json_body_with_wrong_types_is_rejected(body):
+    with pytest.raises(RequestError) as error:
+        read_upload(json_event(body))
+    assert error.value.status == 400
+
+
+def test_json_data_url_is_read():
+    encoded = base64.b64encode(b"%PDF-1.4 test").decode()
+    filename, mime_type, data = read_upload(json_event(
+        {"file": f"data:application/pdf;base64,{encoded}", "filename": "a.pdf"}))
+    assert (filename, mime_type, data) == ("a.pdf", "application/pdf", b"%PDF-1.4 test")
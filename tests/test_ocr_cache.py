@@ -0,0 +1,124 @@
+"""
+التخزين المؤقت لنتائج OCR: مدة الصلاحية، والإخراج حسب الحجم، والمجموع الذي
+تحفظه المشغلات، ومفتاح مصدر الصفحات، وبقاء النتيجة عند قفل القاعدة.
+"""
+import os
+import sys
+import json
+import sqlite3
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import ocr_cache as ocr_cache_module  # noqa: E402
+from ocr_cache import OCRCache  # noqa: E402
+
+
+def pages(text: str):
+    return [{"index": 0, "markdown": text}]
+
+
+def entry_size(value) -> int:
+    return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(ocr_cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = OCRCache(str(tmp_path / "cache.sqlite3"), ttl=60)
+    cache.set("a", pages("نص"))
+    clock[0] += 59
+    assert cache.get("a") == pages("نص")
+
+    clock[0] += 2
+    assert cache.get("a") is None
+    # منتهي الصلاحية على القرص أيضاً (مخزن جديد بلا ذاكرة)
+    cache.close()
+    reopened = OCRCache(str(tmp_path / "cache.sqlite3"), ttl=60)
+    assert reopened.get("a") is None
+    reopened.close()
+
+
+def test_disk_evicts_least_recently_used(tmp_path, clock):
+    size = entry_size(pages("x" * 100))
+    cache = OCRCache(str(tmp_path / "cache.sqlite3"), memory_bytes=0, max_disk_bytes=size * 2)
+    for key in ("a", "b"):
+        cache.set(key, pages("x" * 100))
+        clock[0] += 1
+    assert cache.get("a") is not None  # "b" أصبح الأقدم استخداماً
+    clock[0] += 1
+    cache.set("c", pages("x" * 100))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    stats = cache.stats()
+    assert (stats["disk_items"], stats["disk_bytes"]) == (2, size * 2)
+    cache.close()
+
+
+def test_memory_layer_respects_its_budget(clock):
+    size = entry_size(pages("y" * 50))
+    cache = OCRCache("", memory_bytes=size * 2)
+    for key in ("a", "b", "c"):
+        cache.set(key, pages("y" * 50))
+    assert cache.get("a") is None
+    assert cache.stats()["memory_bytes"] == size * 2
+
+
+def test_running_total_matches_table(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = OCRCache(path, ttl=10)
+    cache.set("a", pages("قصير"))
+    cache.set("a", pages("نص أطول بكثير من السابق"))  # استبدال بحجم مختلف
+    cache.set("b", pages("ب"))
+    clock[0] += 11
+    cache.set("c", pages("ج"))  # يحذف المنتهي
+
+    actual = cache._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()
+    stats = cache.stats()
+    assert (stats["disk_items"], stats["disk_bytes"]) == actual == (1, entry_size(pages("ج")))
+    cache.close()
+
+
+def test_total_is_computed_for_existing_database(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE ocr_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+               " created REAL NOT NULL, accessed REAL NOT NULL)")
+    db.execute("INSERT INTO ocr_cache VALUES ('old', '[]', 2, 0, 0)")
+    db.commit()
+    db.close()
+
+    cache = OCRCache(path, ttl=10 ** 12)
+    assert (cache.stats()["disk_items"], cache.stats()["disk_bytes"]) == (1, 2)
+    cache.close()
+
+
+def test_page_source_is_part_of_the_key():
+    ocr_only = OCRCache.make_key("h", "model", False)
+    assert ocr_only == "h:model:0"
+    assert OCRCache.make_key("h", "model", False, "ocr") == ocr_only
+    assert OCRCache.make_key("h", "model", False, "text80+ocr") != ocr_only
+
+
+def test_locked_database_keeps_result_in_memory(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = OCRCache(path)
+    cache._db.close()
+    cache._db = sqlite3.connect(path, timeout=0, check_same_thread=False, isolation_level=None)
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        cache.set("paid", pages("نتيجة مدفوعة"))
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+    assert cache.get("paid") == pages("نتيجة مدفوعة")
+    cache.close()
@@ -0,0 +1,98 @@
+"""
+مهام OCR غير المتزامنة: عداد الصفحات، واستعادة المهام التي توقف عاملها،
+وتنفيذ JobRunner للمهمة حتى اكتمالها.
+"""
+import os
+import sys
+import asyncio
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from ocr_jobs import JobStore, JobRunner, COMPLETED, FAILED, QUEUED, RUNNING, worker_alive  # noqa: E402
+from work_queue import worker_id  # noqa: E402
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3") if request.param == "sqlite" else "")
+    yield store
+    store.close()
+
+
+def test_add_pages_updates_counter_only(store):
+    job = store.create("a.pdf")
+    store.update(job["job_id"], pages_total=5)
+    store.add_pages(job["job_id"], 2)
+    store.add_pages(job["job_id"], 1)
+    current = store.get(job["job_id"])
+    assert (current["pages_done"], current["pages_total"]) == (3, 5)
+    if store._db is not None:
+        (data,) = store._db.execute("SELECT data FROM ocr_jobs WHERE id = ?", (job["job_id"],)).fetchone()
+        assert "pages_done" not in data
+
+
+def test_recover_fails_jobs_of_stopped_workers(store):
+    queued = store.create("queued.pdf")
+    running = store.create("running.pdf")
+    store.update(running["job_id"], status=RUNNING)
+    done = store.create("done.pdf")
+    store.update(done["job_id"], status=COMPLETED, result="نص")
+    alive = store.create("alive.pdf")
+    store.update(alive["job_id"], worker="another-host:1")
+
+    # عامل هذه الاختبارات يُعامل كأنه توقف (إعادة تشغيل)
+    assert store.recover(lambda worker: worker != worker_id()) == 2
+
+    for job in (queued, running):
+        current = store.get(job["job_id"])
+        assert current["status"] == FAILED
+        assert current["error"] and current["finished"] is not None
+    assert store.get(done["job_id"])["status"] == COMPLETED
+    assert store.get(alive["job_id"])["status"] == QUEUED
+
+
+def test_recover_after_restart_reads_persisted_rows(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    before = JobStore(path)
+    job = before.create("a.pdf")
+    before.update(job["job_id"], status=RUNNING, worker="localhost-gone:0")
+    before.close()
+
+    after = JobStore(path)
+    try:
+        assert after.recover(lambda worker: False) == 1
+        assert after.get(job["job_id"])["status"] == FAILED
+    finally:
+        after.close()
+
+
+def test_worker_alive():
+    assert worker_alive(worker_id())
+    assert not worker_alive(None)
+    # جهاز آخر لا يمكن فحصه
+    assert worker_alive("another-host:1")
+
+
+def test_runner_completes_job_with_progress(store):
+    async def handler(job_id, filename, on_pages):
+        on_pages(total=3)
+        for _ in range(3):
+            await asyncio.sleep(0)
+            on_pages(done=1)
+        return f"نص {filename}"
+
+    async def run():
+        runner = JobRunner(store, handler, workers=1)
+        runner.start()
+        job = await runner.submit("a.pdf")
+        await runner._queue.join()
+        await runner.stop()
+        return store.get(job["job_id"])
+
+    job = asyncio.run(run())
+    assert job["status"] == COMPLETED
+    assert job["result"] == "نص a.pdf"
+    assert (job["pages_done"], job["pages_total"]) == (3, 3)
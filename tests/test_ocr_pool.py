@@ -0,0 +1,79 @@
+"""
+مجمع عمال OCR: القبول حتى السعة (التزامن + الطابور) ثم الرفض فوراً بـ
+OCRPoolFull، وأولوية مجموعات المستند المقبول على الطلبات الجديدة.
+"""
+import os
+import sys
+import asyncio
+import threading
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from ocr_pool import OCRPoolFull, OCRWorkerPool  # noqa: E402
+
+
+def test_rejects_beyond_capacity_and_recovers():
+    release = threading.Event()
+
+    async def scenario():
+        pool = OCRWorkerPool(max_concurrency=2, max_queue=1, retry_after=7)
+        try:
+            tasks = [asyncio.create_task(pool.run(release.wait)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            assert pool.stats()["in_flight"] == 2 and pool.stats()["queued"] == 1
+
+            with pytest.raises(OCRPoolFull) as error:
+                await pool.run(release.wait)
+            assert error.value.retry_after == 7
+            assert pool.stats()["rejected"] == 1
+
+            release.set()
+            assert await asyncio.gather(*tasks) == [True] * 3
+            # تحررت السعة فيُقبل العمل الجديد
+            assert await pool.run(lambda: "ok") == "ok"
+        finally:
+            pool.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_admitted_chunks_wait_and_block_new_documents():
+    release = threading.Event()
+
+    async def scenario():
+        pool = OCRWorkerPool(max_concurrency=1, max_queue=0)
+        try:
+            first = asyncio.create_task(pool.run(release.wait))
+            await asyncio.sleep(0.05)
+            # مجموعة من مستند مقبول تنتظر بدلاً من الرفض
+            chunk = asyncio.create_task(pool.run_admitted(lambda: "chunk"))
+            await asyncio.sleep(0.05)
+            assert pool.stats()["waiting"] == 1
+            with pytest.raises(OCRPoolFull):
+                pool.admit()
+
+            release.set()
+            assert await first is True
+            assert await chunk == "chunk"
+            pool.admit()
+        finally:
+            pool.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_errors_free_the_slot():
+    async def scenario():
+        pool = OCRWorkerPool(max_concurrency=1, max_queue=0)
+        try:
+            with pytest.raises(ZeroDivisionError):
+                await pool.run(lambda: 1 / 0)
+            assert pool.stats()["in_flight"] == pool.stats()["queued"] == 0
+            assert await pool.run(lambda: 2) == 2
+        finally:
+            pool.shutdown()
+
+    asyncio.run(scenario())
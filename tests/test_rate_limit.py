@@ -0,0 +1,88 @@
+"""
+سياسة إعادة المحاولة المشتركة (rate_limit.retry_delay) واستخدامها في إعادة
+محاولة مجموعات الصفحات في BatchPdfConv.
+"""
+import os
+import sys
+import importlib
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from rate_limit import (RETRY_INITIAL_SECONDS, RETRY_MAX_SECONDS, is_retryable,  # noqa: E402
+                        retry_delay)
+
+
+class APIError(Exception):
+    def __init__(self, status_code: int, headers=None):
+        super().__init__(f"Status {status_code}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def test_retry_delay_is_capped_and_jittered():
+    for attempt in range(12):
+        base = min(RETRY_MAX_SECONDS, RETRY_INITIAL_SECONDS * 2 ** attempt)
+        delays = {retry_delay(attempt) for _ in range(20)}
+        assert all(base * 0.5 <= delay <= base * 1.5 for delay in delays)
+        assert len(delays) > 1
+
+
+def test_retry_delay_honours_retry_after():
+    assert retry_delay(0, APIError(429, {"retry-after": "7"})) >= 7
+    # Retry-After لا يُقرأ لغير 429
+    assert retry_delay(0, APIError(503, {"retry-after": "7"})) < 7
+
+
+def test_authentication_errors_are_not_retried():
+    assert not is_retryable(APIError(401))
+    assert is_retryable(APIError(429))
+    assert is_retryable(ConnectionError("reset"))
+
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MISTRAL_API_KEY", "test-key")
+    monkeypatch.setenv("OCR_CACHE_PATH", "")
+    monkeypatch.setenv("OCR_SEARCH_DB", "")
+    sys.modules.pop("BatchPdfConv", None)
+    module = importlib.import_module("BatchPdfConv")
+    sleeps = []
+    monkeypatch.setattr(module.time, "sleep", sleeps.append)
+    yield module, sleeps
+    sys.modules.pop("BatchPdfConv", None)
+
+
+def test_chunk_retry_waits_for_retry_after(batch, monkeypatch):
+    module, sleeps = batch
+    calls = []
+
+    def ocr_chunk(first_page, pdf_bytes, limiter=None):
+        calls.append(first_page)
+        if first_page == 2 and calls.count(2) == 1:
+            raise APIError(429, {"retry-after": "9"})
+        return [{"index": first_page, "markdown": f"p{first_page}"}]
+
+    monkeypatch.setattr(module, "ocr_chunk", ocr_chunk)
+    pages = module.ocr_pdf_chunks([(0, b"a"), (2, b"b")])
+    assert [page["index"] for page in pages] == [0, 2]
+    # المجموعة الناجحة لا تُعاد
+    assert sorted(calls) == [0, 2, 2]
+    assert len(sleeps) == 1 and sleeps[0] >= 9
+
+
+def test_chunk_retry_stops_on_authentication_error(batch, monkeypatch):
+    module, sleeps = batch
+    calls = []
+
+    def ocr_chunk(first_page, pdf_bytes, limiter=None):
+        calls.append(first_page)
+        raise APIError(401)
+
+    monkeypatch.setattr(module, "ocr_chunk", ocr_chunk)
+    with pytest.raises(APIError):
+        module.ocr_pdf_chunks([(0, b"a")])
+    assert calls == [0] and sleeps == []
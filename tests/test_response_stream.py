@@ -0,0 +1,92 @@
+"""
+بث النتائج: ordered_pages تعيد ترتيب الصفحات وترسل كل صفحة فور دورها،
+و encode_pages تضغط تزايدياً وتبلغ عن الخطأ بعد بدء البث في NDJSON.
+"""
+import os
+import sys
+import json
+import zlib
+import asyncio
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from response_stream import encode_pages, negotiate_encoding, ordered_pages, sse_event  # noqa: E402
+
+
+def page(index: int) -> dict:
+    return {"index": index, "markdown": f"صفحة {index + 1}"}
+
+
+async def arrive(indexes, log=None, error=None):
+    for index in indexes:
+        if log is not None:
+            log.append(("in", index))
+        yield page(index)
+    if error is not None:
+        raise error
+
+
+async def collect(iterator, log=None):
+    result = []
+    async for item in iterator:
+        if log is not None:
+            log.append(("out", item["index"]))
+        result.append(item)
+    return result
+
+
+def test_ordered_pages_reorders_and_yields_each_page_on_its_turn():
+    log = []
+    pages = asyncio.run(collect(ordered_pages(arrive([2, 0, 1, 4, 3], log)), log))
+    assert [item["index"] for item in pages] == [0, 1, 2, 3, 4]
+    # الصفحة 0 تُرسل فور وصولها دون انتظار الصفحة 1
+    assert log == [("in", 2), ("in", 0), ("out", 0), ("in", 1), ("out", 1), ("out", 2),
+                   ("in", 4), ("in", 3), ("out", 3), ("out", 4)]
+
+
+def test_ordered_pages_flushes_pages_after_a_gap():
+    pages = asyncio.run(collect(ordered_pages(arrive([3, 0, 5]))))
+    assert [item["index"] for item in pages] == [0, 3, 5]
+
+
+def test_ordered_pages_first_index():
+    pages = asyncio.run(collect(ordered_pages(arrive([11, 10]), first_index=10)))
+    assert [item["index"] for item in pages] == [10, 11]
+
+
+async def encoded(indexes, output_format, encoding=None, error=None):
+    stats = {}
+    chunks = [chunk async for chunk in encode_pages(arrive(indexes, error=error), output_format, encoding, stats)]
+    return chunks, stats
+
+
+def test_encode_pages_gzip_stream():
+    chunks, stats = asyncio.run(encoded([0, 1], "markdown", "gzip"))
+    # كل صفحة تُرسل في دفعة مستقلة قبل ذيل gzip
+    assert len(chunks) == 3
+    text = zlib.decompress(b"".join(chunks), 31).decode("utf-8")
+    assert text == "صفحة 1\n\nصفحة 2"
+    assert stats == {"pages": 2, "bytes": len(text.encode("utf-8"))}
+
+
+def test_ndjson_reports_error_after_first_page():
+    chunks, _ = asyncio.run(encoded([0], "ndjson", error=RuntimeError("انقطع")))
+    lines = [json.loads(line) for line in b"".join(chunks).decode("utf-8").splitlines()]
+    assert lines == [{"index": 0, "markdown": "صفحة 1"}, {"error": "انقطع"}]
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(encoded([], "ndjson", error=RuntimeError("قبل البدء")))
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip;q=0, deflate") is None
+    assert negotiate_encoding("deflate, gzip") == "gzip"
+    assert negotiate_encoding(None) is None
+
+
+def test_sse_event_keeps_data_on_one_line():
+    event = sse_event("page", {"markdown": "سطر\nسطر"})
+    assert event == 'event: page\ndata: {"markdown": "سطر\\nسطر"}\n\n'
@@ -0,0 +1,69 @@
+"""
+فهرس البحث: تطبيع النص العربي (التشكيل، التطويل، الهمزات، الألف المقصورة، التاء
+المربوطة، أشكال العرض) في الفهرسة والاستعلام، والمقتطف من النص الأصلي.
+"""
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from search_index import (SearchIndex, make_snippet, normalize_arabic, parse_markdown_pages,  # noqa: E402
+                          parse_query)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("المَدْرَسَةُ", "المدرسه"),      # تشكيل وتاء مربوطة
+    ("العـــربية", "العربيه"),         # تطويل
+    ("أحمد إلى آخر", "احمد الي اخر"),  # همزات وألف مقصورة
+    ("ﻻ", "لا"),                       # شكل عرض (لام ألف)
+    ("ﺍﻟﻌﺮﺑﻴﺔ", "العربيه"),
+    ("Page 1", "Page 1"),
+])
+def test_normalize_arabic(text, expected):
+    assert normalize_arabic(text) == expected
+
+
+def test_parse_query_normalizes_terms_and_drops_fts_syntax():
+    expression, terms = parse_query('المَدرسة إلى* OR "x" -')
+    assert terms == ["المدرسه", "الي", "OR", "x"]
+    assert expression == '"المدرسه" "الي"* "OR" "x"'
+    assert parse_query("- ( )") == ("", [])
+
+
+def test_snippet_marks_match_in_original_text():
+    text = "ذهب الطالبُ إلى المَدْرَسَةِ صباحاً"
+    assert make_snippet(text, ["المدرسه"]) == "ذهب الطالبُ إلى **المَدْرَسَةِ** صباحاً"
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.sqlite3"))
+    yield index
+    index.close()
+
+
+def test_search_matches_across_spellings(index):
+    pages = parse_markdown_pages("## Page 1\n\nقرأتُ في المَكتبةِ\n\n## Page 2\n\nذهبنا إلى المدرسة\n\n")
+    index.index_document("docs/a.md", pages)
+
+    (hit,) = index.search("المكتبه")
+    assert (hit["path"], hit["page"]) == ("docs/a.md", 1)
+    assert "**المَكتبةِ**" in hit["snippet"]
+
+    (hit,) = index.search("الى المدرسةِ")
+    assert hit["page"] == 2
+    assert [hit["page"] for hit in index.search("المد*")] == [2]
+    assert index.search("غير موجود") == []
+
+
+def test_reindex_replaces_and_move_keeps_pages(index):
+    index.index_document("a.md", [{"index": 0, "markdown": "نص قديم"}])
+    index.index_document("a.md", [{"index": 0, "markdown": "نص جديد"}])
+    assert index.search("قديم") == []
+    index.move("a.md", "b.md")
+    assert [hit["path"] for hit in index.search("جديد")] == ["b.md"]
+    index.remove("b.md")
+    assert index.stats() == {"files": 0, "pages": 0}
@@ -0,0 +1,62 @@
+"""
+أقفال OCR في SharedState: القفل المحجوز يُجدد ما دام صاحبه يعمل، فلا يأخذه
+عامل آخر أثناء OCR أطول من مدته.
+"""
+import os
+import sys
+import time
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from shared_state import SharedState  # noqa: E402
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = SharedState(str(tmp_path / "shared.sqlite3"))
+    yield state
+    state.close()
+
+
+def expires(state, key):
+    return state._db.execute("SELECT expires FROM flights WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_renew_extends_held_claims_only(state):
+    assert state.claim("doc", "worker-a", ttl=1)
+    before = expires(state, "doc")
+    assert state.renew(ttl=60) == 1
+    assert expires(state, "doc") > before + 30
+
+    state.release("doc", "worker-a")
+    assert state.renew(ttl=60) == 0
+    assert state.claim("doc", "worker-b")
+
+
+def test_keeper_keeps_claim_past_its_ttl(tmp_path, state):
+    other = SharedState(str(tmp_path / "shared.sqlite3"))
+    try:
+        assert state.claim("doc", "worker-a", ttl=0.3)
+        state.start_keeper(interval=0.05)
+        time.sleep(0.6)
+        assert not other.claim("doc", "worker-b")
+    finally:
+        other.close()
+
+
+def test_claimed_sees_other_workers_claims(tmp_path, state):
+    other = SharedState(str(tmp_path / "shared.sqlite3"))
+    try:
+        assert not other.claimed("doc")
+        assert state.claim("doc", "worker-a")
+        assert other.claimed("doc")
+        state.release("doc", "worker-a")
+        assert not other.claimed("doc")
+        # القفل المنتهي لا يحمي الملف
+        assert state.claim("doc", "worker-a", ttl=-1)
+        assert not other.claimed("doc")
+    finally:
+        other.close()
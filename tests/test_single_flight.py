@@ -0,0 +1,104 @@
+"""
+دمج الطلبات المتزامنة (SingleFlight): تنفيذ واحد لكل مفتاح، والخطأ يصل إلى كل
+المنتظرين، وإلغاء أحدهم لا يلغي العملية للبقية.
+"""
+import os
+import sys
+import asyncio
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from single_flight import SingleFlight  # noqa: E402
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+        release = asyncio.Event()
+
+        async def ocr():
+            calls.append(1)
+            await release.wait()
+            return "نص"
+
+        waiters = [asyncio.create_task(flights.run("hash", ocr)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert len(flights) == 1
+        release.set()
+        assert await asyncio.gather(*waiters) == ["نص"] * 5
+        assert calls == [1]
+        assert flights.stats() == {"in_flight": 0, "started": 1, "joined": 4}
+
+        # بعد الانتهاء يبدأ تنفيذ جديد
+        assert await flights.run("hash", ocr) == "نص"
+        assert calls == [1, 1]
+
+    asyncio.run(scenario())
+
+
+def test_error_reaches_every_waiter_and_clears_the_key():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def failing():
+            await release.wait()
+            raise RuntimeError("فشل OCR")
+
+        waiters = [asyncio.create_task(flights.run("hash", failing)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        assert [str(result) for result in results] == ["فشل OCR"] * 3
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert flights.get("hash") is None
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_the_flight():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def ocr():
+            await release.wait()
+            return "نص"
+
+        first = asyncio.create_task(flights.run("hash", ocr))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flights.run("hash", ocr))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        release.set()
+        assert await second == "نص"
+
+    asyncio.run(scenario())
+
+
+def test_spawn_and_join():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def producer():
+            await release.wait()
+            return 3
+
+        task = flights.spawn("hash", producer)
+        assert task is not None
+        # عملية جارية: لا تبدأ ثانية
+        assert flights.spawn("hash", producer) is None
+        joiner = asyncio.create_task(flights.join("hash"))
+        await asyncio.sleep(0)
+        release.set()
+        assert await joiner == 3 and await task == 3
+        assert flights.stats() == {"in_flight": 0, "started": 1, "joined": 1}
+
+    asyncio.run(scenario())
@@ -0,0 +1,46 @@
+"""
+تخزين الملفات المرفوعة: رفعات متزامنة للمحتوى نفسه تُحفظ نسخة واحدة وتُحسب
+مساحتها مرة واحدة.
+"""
+import os
+import sys
+import threading
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from upload_store import UploadStore  # noqa: E402
+
+
+def upload(store: UploadStore, content: bytes) -> str:
+    temp_path = store.reserve(len(content))
+    with open(temp_path, "wb") as f:
+        f.write(content)
+    return temp_path
+
+
+def test_concurrent_uploads_of_same_content_count_once(tmp_path):
+    store = UploadStore(root=str(tmp_path / "uploads"), ram_root="")
+    content = b"%PDF-1.4 same content"
+    name = "ab" + "0" * 62 + ".pdf"
+
+    for _ in range(20):
+        temps = [upload(store, content) for _ in range(8)]
+        barrier = threading.Barrier(len(temps))
+        paths = []
+
+        def commit(temp_path):
+            barrier.wait()
+            paths.append(store.commit(temp_path, name, len(content), len(content)))
+
+        threads = [threading.Thread(target=commit, args=(temp,)) for temp in temps]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(set(paths)) == 1
+        assert store.stats()["disk_bytes"] == len(content)
+        assert [path for path, _ in store.disk.iter_files()] == paths[:1]
+        store.remove(paths[0])
+        assert store.stats()["disk_bytes"] == 0
@@ -0,0 +1,101 @@
+"""
+طابور العمل المشترك: انتهاء العقد يعيد الملف إلى الطابور، والاعتماد (complete)
+لا ينجح إلا لصاحب العقد الحالي ومرة واحدة فقط.
+"""
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import work_queue as work_queue_module  # noqa: E402
+from work_queue import DONE, FAILED, LEASED, PENDING, WorkQueue  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(work_queue_module.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite3"), lease_seconds=60)
+    yield queue
+    queue.close()
+
+
+def test_enqueue_ignores_duplicates(queue):
+    assert queue.enqueue([("a.pdf", "h1"), ("b.pdf", "h2")]) == 2
+    assert queue.enqueue([("a.pdf", "h1"), ("a.pdf", "h3")]) == 1
+    assert queue.counts()[PENDING] == 3
+
+
+def test_expired_lease_returns_file_to_queue(queue, clock):
+    queue.enqueue([("a.pdf", "h1")])
+    assert queue.lease("worker-a") == ("a.pdf", "h1", 1)
+    assert queue.lease("worker-b") is None
+    assert queue.counts()[LEASED] == 1
+
+    clock[0] += 61
+    assert queue.counts()[PENDING] == 1
+    assert queue.lease("worker-b") == ("a.pdf", "h1", 2)
+
+    # العامل الأول فقد العقد: لا يعتمد ولا يُنشر ملفه
+    published = []
+    assert not queue.complete("a.pdf", "h1", "worker-a", publish=lambda: published.append("a"))
+    assert queue.complete("a.pdf", "h1", "worker-b", pages=3, output_path="out/a.md",
+                          publish=lambda: published.append("b"))
+    assert published == ["b"]
+    assert queue.counts()[DONE] == 1
+    assert queue.progress()["pages"] == 3
+    # الاعتماد مرة واحدة
+    assert not queue.complete("a.pdf", "h1", "worker-b")
+    assert queue.drained()
+
+
+def test_renew_keeps_lease(queue, clock):
+    queue.enqueue([("a.pdf", "h1")])
+    queue.lease("worker-a")
+    clock[0] += 50
+    assert queue.renew() == 1
+    clock[0] += 50
+    assert queue.lease("worker-b") is None
+    assert queue.complete("a.pdf", "h1", "worker-a")
+    assert queue.renew() == 0
+
+
+def test_failed_publish_keeps_file_leased(queue, clock):
+    queue.enqueue([("a.pdf", "h1")])
+    queue.lease("worker-a")
+
+    def publish():
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        queue.complete("a.pdf", "h1", "worker-a", publish=publish)
+    assert queue.counts()[LEASED] == 1
+    clock[0] += 61
+    assert queue.lease("worker-b") == ("a.pdf", "h1", 2)
+
+
+def test_fail_retries_after_delay_or_gives_up(queue, clock):
+    queue.enqueue([("a.pdf", "h1")])
+    queue.lease("worker-a")
+    assert queue.fail("a.pdf", "h1", "worker-a", "timeout", retry_in=30)
+    assert queue.lease("worker-a") is None
+    clock[0] += 31
+    assert queue.lease("worker-a") == ("a.pdf", "h1", 2)
+    assert queue.fail("a.pdf", "h1", "worker-a", "timeout")
+    assert queue.counts()[FAILED] == 1
+    assert queue.drained()
+
+
+def test_release_all_returns_attempt(queue):
+    queue.enqueue([("a.pdf", "h1")])
+    queue.lease("worker-a")
+    queue.release_all()
+    assert queue.lease("worker-b") == ("a.pdf", "h1", 1)
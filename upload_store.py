@@ -0,0 +1,234 @@
+"""
+تخزين الملفات المرفوعة: توزيع على مجلدات فرعية، حصة مساحة، ذاكرة مؤقتة، وتنظيف دوري
+
+- الملف <sha256>.<ext> يُحفظ في <الجذر>/<أول حرفين>/<الحرفين التاليين>/، فيبقى
+  عدد الملفات في كل مجلد صغيراً مهما زاد حجم التخزين
+- حصة كلية (UPLOAD_QUOTA_MB): الرفع الذي يتجاوزها يُرفض بـ 503 و Retry-After
+  حتى يحرر التنظيف مساحة
+- الملفات الأصغر من UPLOAD_RAM_MAX_MB تُكتب في UPLOAD_RAM_DIR إن حُدد (مثل
+  /dev/shm على tmpfs) ضمن حصة خاصة به، والبقية على القرص
+- عامل التنظيف يحذف كل UPLOAD_JANITOR_INTERVAL ثانية الملفات التي لم تُستخدم منذ
+  UPLOAD_TTL ثانية (رفعات لم تُعالج أبداً، ملفات .part من رفع انقطع) ويعيد حساب
+  المساحة المستخدمة
+
+مع تعدد العمال يحسب كل عامل المساحة بنفسه بين عمليتي تنظيف، فالحصة تقريبية
+بمقدار ما يُرفع خلال الفترة.
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# إعدادات التخزين (قابلة للتعديل عبر متغيرات البيئة)
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_TTL = float(os.getenv("UPLOAD_TTL", "3600"))
+UPLOAD_QUOTA_MB = float(os.getenv("UPLOAD_QUOTA_MB", "2048"))
+UPLOAD_RAM_DIR = os.getenv("UPLOAD_RAM_DIR", "")
+UPLOAD_RAM_MAX_MB = float(os.getenv("UPLOAD_RAM_MAX_MB", "8"))
+UPLOAD_RAM_QUOTA_MB = float(os.getenv("UPLOAD_RAM_QUOTA_MB", "256"))
+UPLOAD_JANITOR_INTERVAL = float(os.getenv("UPLOAD_JANITOR_INTERVAL", "60"))
+
+MB = 1024 * 1024
+PART_SUFFIX = ".part"
+
+
+class UploadQuotaExceeded(Exception):
+    """يُرفع عندما يتجاوز الرفع حصة المساحة المتاحة"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class UploadTier:
+    """مجلد تخزين (القرص أو tmpfs) مع حصته والمساحة المستخدمة فيه"""
+
+    def __init__(self, root: str, quota_bytes: int):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.used = 0
+        os.makedirs(root, exist_ok=True)
+
+    def fits(self, size: int) -> bool:
+        return self.quota_bytes <= 0 or self.used + size <= self.quota_bytes
+
+    def path_for(self, name: str) -> str:
+        return os.path.join(self.root, name[:2], name[2:4], name)
+
+    def iter_files(self) -> Iterator[Tuple[str, os.stat_result]]:
+        """(المسار، stat) لكل ملف تحت الجذر باستخدام os.scandir"""
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry.path, entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+
+
+class UploadStore:
+    """الملفات المرفوعة حسب اسمها المشتق من بصمتها"""
+
+    def __init__(self, root: str = UPLOAD_DIR, ram_root: str = UPLOAD_RAM_DIR,
+                 quota_bytes: int = int(UPLOAD_QUOTA_MB * MB),
+                 ram_max_bytes: int = int(UPLOAD_RAM_MAX_MB * MB),
+                 ram_quota_bytes: int = int(UPLOAD_RAM_QUOTA_MB * MB),
+                 ttl: float = UPLOAD_TTL, janitor_interval: float = UPLOAD_JANITOR_INTERVAL):
+        self.disk = UploadTier(root, quota_bytes)
+        self.ram = UploadTier(ram_root, ram_quota_bytes) if ram_root else None
+        self.ram_max_bytes = ram_max_bytes
+        self.ttl = ttl
+        self.janitor_interval = janitor_interval
+        self._lock = threading.Lock()
+        self._counters = {"reaped": 0, "reaped_bytes": 0, "rejected": 0}
+        self.scan()
+
+    def path_for(self, name: str) -> Optional[str]:
+        """مسار الملف المرفوع إن وُجد (في الذاكرة أو على القرص)"""
+        for tier in self._tiers():
+            path = tier.path_for(name)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def reserve(self, expected_size: Optional[int]) -> str:
+        """
+        مسار ملف مؤقت للرفع في المجلد المناسب لحجمه المتوقع (Content-Length).
+        يُرفع UploadQuotaExceeded إذا لم تتسع له الحصة.
+        """
+        size = expected_size or 0
+        with self._lock:
+            tier = self.disk
+            if (self.ram is not None and expected_size is not None
+                    and expected_size <= self.ram_max_bytes and self.ram.fits(size)):
+                tier = self.ram
+            elif not self.disk.fits(size):
+                self._counters["rejected"] += 1
+                raise UploadQuotaExceeded("مساحة الملفات المرفوعة ممتلئة، يرجى المحاولة لاحقاً",
+                                          max(1, int(self.janitor_interval)))
+            tier.used += size
+        return os.path.join(tier.root, f".{uuid.uuid4().hex}{PART_SUFFIX}")
+
+    def commit(self, temp_path: str, name: str, expected_size: Optional[int], size: int) -> str:
+        """نقل الملف المؤقت إلى مكانه الدائم وتصحيح الحجز بالحجم الفعلي؛ تُرجع المسار"""
+        tier = self._tier_of(temp_path)
+        # الفحص والنقل والحساب تحت القفل نفسه: رفعان متزامنان للمحتوى نفسه
+        # لا يُحسب حجمهما مرتين
+        with self._lock:
+            tier.used -= expected_size or 0
+            existing = self.path_for(name)
+            if existing is None:
+                path = tier.path_for(name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+                tier.used += size
+                return path
+        # المحتوى نفسه مرفوع من قبل: نسخة واحدة تكفي
+        os.remove(temp_path)
+        os.utime(existing)
+        return existing
+
+    def discard(self, temp_path: str, expected_size: Optional[int]):
+        """إلغاء رفع فشل (حذف الملف المؤقت إن وُجد وتحرير الحجز)"""
+        tier = self._tier_of(temp_path)
+        with self._lock:
+            tier.used -= expected_size or 0
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+    def remove(self, path: str):
+        """حذف ملف مرفوع بعد معالجته"""
+        size = os.path.getsize(path)
+        os.remove(path)
+        with self._lock:
+            self._tier_of(path).used -= size
+
+    def touch(self, path: str):
+        """تجديد وقت الاستخدام حتى لا يحذفه التنظيف أثناء المعالجة"""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def first_file(self, suffixes: Tuple[str, ...]) -> Optional[str]:
+        """أول ملف مرفوع بأحد الامتدادات (دون سرد المجلد كاملاً)"""
+        for tier in self._tiers():
+            for path, _ in tier.iter_files():
+                if path.lower().endswith(suffixes) and not path.endswith(PART_SUFFIX):
+                    return path
+        return None
+
+    def scan(self):
+        """إعادة حساب المساحة المستخدمة من القرص"""
+        for tier in self._tiers():
+            used = sum(stat.st_size for _, stat in tier.iter_files())
+            with self._lock:
+                tier.used = used
+
+    def reap(self, is_active: Callable[[str], bool] = lambda name: False,
+             on_reap: Callable[[str], None] = lambda name: None) -> int:
+        """
+        حذف الملفات التي لم تُستخدم منذ ttl ثانية (عدا ما تعالجه is_active)،
+        ثم إعادة حساب المساحة. تُرجع عدد الملفات المحذوفة.
+        """
+        cutoff = time.time() - self.ttl
+        reaped = 0
+        for tier in self._tiers():
+            used = 0
+            for path, stat in tier.iter_files():
+                name = os.path.basename(path)
+                if stat.st_mtime >= cutoff or is_active(name):
+                    used += stat.st_size
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    used += stat.st_size
+                    continue
+                reaped += 1
+                self._counters["reaped_bytes"] += stat.st_size
+                if not name.endswith(PART_SUFFIX):
+                    on_reap(name)
+            with self._lock:
+                tier.used = used
+        self._counters["reaped"] += reaped
+        if reaped:
+            logger.info(f"حذف التنظيف {reaped} ملفاً مرفوعاً غير مستخدم")
+        return reaped
+
+    async def run_janitor(self, is_active: Callable[[str], bool] = lambda name: False,
+                          on_reap: Callable[[str], None] = lambda name: None):
+        """التنظيف الدوري (مهمة خلفية حتى الإلغاء)"""
+        while True:
+            await asyncio.sleep(self.janitor_interval)
+            try:
+                await asyncio.to_thread(self.reap, is_active, on_reap)
+            except Exception as e:
+                logger.warning(f"فشل تنظيف الملفات المرفوعة: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["disk_bytes"] = self.disk.used
+            stats["ram_bytes"] = self.ram.used if self.ram is not None else 0
+        return stats
+
+    def _tiers(self):
+        return [self.ram, self.disk] if self.ram is not None else [self.disk]
+
+    def _tier_of(self, path: str) -> UploadTier:
+        if self.ram is not None and os.path.abspath(path).startswith(os.path.abspath(self.ram.root) + os.sep):
+            return self.ram
+        return self.disk
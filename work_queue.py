@@ -0,0 +1,261 @@
+"""
+طابور عمل مشترك في SQLite لتوزيع تحويل ملفات PDF على عدة عمليات أو أجهزة
+
+- المنسق يضيف الملفات (المسار، البصمة) إلى الطابور؛ الإضافة المكررة تُتجاهل
+- كل عامل يحجز ملفاً بعقد إيجار (lease) محدد المدة ويجدده أثناء العمل؛ إذا
+  توقف العامل تنتهي مدة العقد ويعود الملف إلى الطابور تلقائياً
+- الاعتماد (commit) يتم داخل معاملة تحجز قفل الكتابة: يُتحقق من أن العقد ما زال
+  لهذا العامل، ثم يُنقل الملف الناتج إلى مكانه النهائي، ثم يُعلَّم السجل منتهياً؛
+  فلا يعتمد الملف نفسه عاملان
+
+يجب أن يكون ملف الطابور على نظام ملفات يدعم أقفال POSIX بشكل صحيح (قرص محلي
+أو مشترك موثوق)؛ أقفال SQLite على NFS غير موثوقة.
+"""
+import os
+import time
+import socket
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# حالات الملف في الطابور
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_LEASE_SECONDS = 300
+
+
+def worker_id(suffix: Any = "") -> str:
+    """معرّف فريد للعامل: الجهاز والعملية (ورقم الخيط إن وُجد)"""
+    base = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{base}:{suffix}" if suffix != "" else base
+
+
+class WorkQueue:
+    """طابور ملفات مشترك بين العمليات مع عقود إيجار واعتماد لمرة واحدة"""
+
+    def __init__(self, path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._held: Set[Tuple[str, str, str]] = set()
+        self._keeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # timeout: انتظار قفل الكتابة الذي تحجزه عملية أخرى بدلاً من الفشل فوراً
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS work_queue ("
+            " path TEXT NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " lease_owner TEXT,"
+            " lease_expires REAL,"
+            " ready_at REAL NOT NULL DEFAULT 0,"
+            " error TEXT NOT NULL DEFAULT '',"
+            " pages INTEGER,"
+            " output_path TEXT,"
+            " enqueued REAL NOT NULL,"
+            " finished REAL,"
+            " PRIMARY KEY (path, sha256))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS work_queue_ready ON work_queue(status, ready_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS work_queue_lease ON work_queue(status, lease_expires)")
+
+    def enqueue(self, items: List[Tuple[str, str]]) -> int:
+        """إضافة أزواج (المسار، البصمة)؛ تُرجع عدد الملفات الجديدة فعلاً"""
+        now = time.time()
+        with self._transaction():
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO work_queue (path, sha256, status, enqueued) VALUES (?, ?, ?, ?)",
+                [(path, sha256, PENDING, now) for path, sha256 in items])
+            return self._db.total_changes - before
+
+    def lease(self, owner: str) -> Optional[Tuple[str, str, int]]:
+        """
+        حجز ملف جاهز (أو ملف انتهى عقد عامل آخر عليه). تُرجع
+        (المسار، البصمة، رقم المحاولة) أو None إذا لم يوجد ملف جاهز.
+        """
+        now = time.time()
+        with self._transaction():
+            row = self._db.execute(
+                "SELECT path, sha256, attempts FROM work_queue"
+                " WHERE (status = ? AND ready_at <= ?) OR (status = ? AND lease_expires < ?)"
+                " ORDER BY ready_at, enqueued LIMIT 1",
+                (PENDING, now, LEASED, now)).fetchone()
+            if row is None:
+                return None
+            path, sha256, attempts = row
+            self._db.execute(
+                "UPDATE work_queue SET status = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1"
+                " WHERE path = ? AND sha256 = ?",
+                (LEASED, owner, now + self.lease_seconds, path, sha256))
+        with self._lock:
+            self._held.add((path, sha256, owner))
+        return path, sha256, attempts + 1
+
+    def renew(self) -> int:
+        """تجديد كل العقود التي تملكها هذه العملية؛ تُرجع عدد العقود التي ما زالت صالحة"""
+        with self._lock:
+            held = list(self._held)
+        if not held:
+            return 0
+        expires = time.time() + self.lease_seconds
+        renewed = 0
+        with self._transaction():
+            for path, sha256, owner in held:
+                cursor = self._db.execute(
+                    "UPDATE work_queue SET lease_expires = ?"
+                    " WHERE path = ? AND sha256 = ? AND status = ? AND lease_owner = ?",
+                    (expires, path, sha256, LEASED, owner))
+                renewed += cursor.rowcount
+        return renewed
+
+    def complete(self, path: str, sha256: str, owner: str, pages: Optional[int] = None,
+                 output_path: Optional[str] = None, publish: Optional[Callable[[], None]] = None) -> bool:
+        """
+        اعتماد الملف إذا كان العقد ما زال لهذا العامل. تُستدعى publish (مثل
+        os.replace للملف المؤقت) داخل المعاملة نفسها؛ إذا فشلت يبقى الملف محجوزاً
+        ويعود إلى الطابور بعد انتهاء العقد. تُرجع False إذا فقد العامل العقد.
+        """
+        try:
+            with self._transaction():
+                if not self._owns(path, sha256, owner):
+                    return False
+                if publish is not None:
+                    publish()
+                self._db.execute(
+                    "UPDATE work_queue SET status = ?, lease_owner = NULL, lease_expires = NULL, error = '',"
+                    " pages = ?, output_path = ?, finished = ? WHERE path = ? AND sha256 = ?",
+                    (DONE, pages, output_path, time.time(), path, sha256))
+                return True
+        finally:
+            self._forget(path, sha256, owner)
+
+    def fail(self, path: str, sha256: str, owner: str, error: str, retry_in: Optional[float] = None) -> bool:
+        """
+        تسجيل فشل المحاولة. إذا أُعطي retry_in يعود الملف إلى الطابور بعد هذه
+        المدة، وإلا يُعلَّم فاشلاً نهائياً.
+        """
+        now = time.time()
+        try:
+            with self._transaction():
+                if not self._owns(path, sha256, owner):
+                    return False
+                if retry_in is None:
+                    self._db.execute(
+                        "UPDATE work_queue SET status = ?, lease_owner = NULL, lease_expires = NULL, error = ?,"
+                        " finished = ? WHERE path = ? AND sha256 = ?",
+                        (FAILED, error, now, path, sha256))
+                else:
+                    self._db.execute(
+                        "UPDATE work_queue SET status = ?, lease_owner = NULL, lease_expires = NULL, error = ?,"
+                        " ready_at = ? WHERE path = ? AND sha256 = ?",
+                        (PENDING, error, now + retry_in, path, sha256))
+                return True
+        finally:
+            self._forget(path, sha256, owner)
+
+    def release_all(self):
+        """إعادة كل الملفات المحجوزة لهذه العملية إلى الطابور (عند الإيقاف المنظم)"""
+        with self._lock:
+            held = list(self._held)
+            self._held.clear()
+        if held:
+            with self._transaction():
+                self._db.executemany(
+                    "UPDATE work_queue SET status = ?, lease_owner = NULL, lease_expires = NULL, attempts = attempts - 1"
+                    " WHERE path = ? AND sha256 = ? AND status = ? AND lease_owner = ?",
+                    [(PENDING, path, sha256, LEASED, owner) for path, sha256, owner in held])
+
+    def counts(self) -> Dict[str, int]:
+        """عدد الملفات لكل حالة (العقود المنتهية تُحسب ضمن pending)"""
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT CASE WHEN status = ? AND lease_expires < ? THEN ? ELSE status END, COUNT(*)"
+                " FROM work_queue GROUP BY 1", (LEASED, now, PENDING)).fetchall()
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def drained(self) -> bool:
+        """لا ملفات بانتظار المعالجة ولا عقود سارية"""
+        counts = self.counts()
+        return counts[PENDING] == 0 and counts[LEASED] == 0
+
+    def progress(self, window: float = 300) -> Dict[str, Any]:
+        """تقدم مجمع لكل العمال: العد حسب الحالة، الصفحات، العقود لكل عامل، والإنتاجية الأخيرة"""
+        now = time.time()
+        with self._lock:
+            pages = self._db.execute(
+                "SELECT COALESCE(SUM(pages), 0) FROM work_queue WHERE status = ?", (DONE,)).fetchone()[0]
+            recent = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(pages), 0) FROM work_queue WHERE status = ? AND finished >= ?",
+                (DONE, now - window)).fetchone()
+            owners = self._db.execute(
+                "SELECT lease_owner, COUNT(*) FROM work_queue WHERE status = ? AND lease_expires >= ?"
+                " GROUP BY lease_owner ORDER BY lease_owner", (LEASED, now)).fetchall()
+        return {
+            "counts": self.counts(),
+            "pages": pages,
+            "files_per_second": recent[0] / window,
+            "pages_per_second": recent[1] / window,
+            "leases": dict(owners),
+        }
+
+    def start_keeper(self, interval: Optional[float] = None):
+        """خيط يجدد عقود هذه العملية كل ثلث مدة العقد"""
+        if self._keeper is not None:
+            return
+        interval = interval or self.lease_seconds / 3
+
+        def keep():
+            while not self._stop.wait(interval):
+                try:
+                    self.renew()
+                except sqlite3.Error as e:
+                    logger.warning(f"تعذر تجديد عقود الطابور: {e}")
+
+        self._keeper = threading.Thread(target=keep, name="lease-keeper", daemon=True)
+        self._keeper.start()
+
+    def close(self):
+        self._stop.set()
+        if self._keeper is not None:
+            self._keeper.join()
+            self._keeper = None
+        self.release_all()
+        with self._lock:
+            self._db.close()
+
+    def _owns(self, path: str, sha256: str, owner: str) -> bool:
+        row = self._db.execute(
+            "SELECT 1 FROM work_queue WHERE path = ? AND sha256 = ? AND status = ? AND lease_owner = ?",
+            (path, sha256, LEASED, owner)).fetchone()
+        return row is not None
+
+    def _forget(self, path: str, sha256: str, owner: str):
+        with self._lock:
+            self._held.discard((path, sha256, owner))
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """معاملة BEGIN IMMEDIATE (تحجز قفل الكتابة فوراً) محمية بقفل الخيوط"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")